@@ -0,0 +1,96 @@
+"""
+System checks of the process model. Several gunicorn workers
+(``WEB_CONCURRENCY``) need a shared events broker and a shared cache;
+``run_startup_checks`` makes the ASGI/WSGI entry points refuse to start
+otherwise, since ``manage.py check`` never runs under gunicorn. A cache
+too small for one availability request only gets a warning.
+"""
+
+import os
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+
+IN_PROCESS_BROKER = "booking.utils.events.InProcessBroker"
+IN_PROCESS_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+# Backendy z limitem wpisów (OPTIONS["MAX_ENTRIES"], domyślnie 300)
+CULLING_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.db.DatabaseCache",
+    "django.core.cache.backends.filebased.FileBasedCache",
+)
+
+
+def worker_count():
+    try:
+        return int(os.getenv("WEB_CONCURRENCY", "1"))
+    except ValueError:
+        return 1
+
+
+@checks.register("booking")
+def check_shared_backends(app_configs=None, **kwargs):
+    workers = worker_count()
+    if workers <= 1:
+        return []
+    errors = []
+    broker = getattr(settings, "BOOKING_EVENTS_BROKER", IN_PROCESS_BROKER)
+    if broker == IN_PROCESS_BROKER:
+        errors.append(
+            checks.Error(
+                f"WEB_CONCURRENCY={workers} with the in-process events broker: "
+                "live availability updates would reach only one worker.",
+                hint="Set BOOKING_EVENTS_BROKER="
+                "booking.utils.events.PostgresBroker or run one worker.",
+                id="booking.E001",
+            )
+        )
+    if settings.CACHES["default"]["BACKEND"] in IN_PROCESS_CACHES:
+        errors.append(
+            checks.Error(
+                f"WEB_CONCURRENCY={workers} with a per-process cache: "
+                "availability, catalog and roles would diverge "
+                "between workers.",
+                hint="Use a shared cache (DatabaseCache, Redis) or run one worker.",
+                id="booking.E002",
+            )
+        )
+    return errors
+
+
+def availability_cache_entries():
+    """Cache entries of one largest ``api/availability/`` request."""
+    from booking.views import AVAILABILITY_MAX_DAYS, AVAILABILITY_MAX_SERVICES
+
+    # wersja dnia i indeks dnia na każdą parę (usługa, dzień) + wersja usługi
+    return AVAILABILITY_MAX_SERVICES * (2 * AVAILABILITY_MAX_DAYS + 1)
+
+
+@checks.register("booking")
+def check_cache_size(app_configs=None, **kwargs):
+    config = settings.CACHES["default"]
+    if config["BACKEND"] not in CULLING_CACHES:
+        return []
+    max_entries = int(config.get("OPTIONS", {}).get("MAX_ENTRIES", 300))
+    needed = availability_cache_entries()
+    if max_entries >= needed:
+        return []
+    return [
+        checks.Warning(
+            f"Cache MAX_ENTRIES={max_entries} is below the {needed} entries of "
+            "one full availability request: indexes, versions and metrics "
+            "would be culled and rebuilt on every request.",
+            hint="Raise DJANGO_CACHE_MAX_ENTRIES or use Redis/Memcached.",
+            id="booking.W001",
+        )
+    ]
+
+
+def run_startup_checks():
+    errors = [e for e in check_shared_backends() if e.is_serious()]
+    if errors:
+        raise ImproperlyConfigured("\n".join(str(e) for e in errors))
@@ -0,0 +1,7 @@
+from .utils.permissions import ADMIN_GROUP, get_roles
+
+
+def roles(request):
+    """``user_roles`` and ``is_admin`` for templates (memoised per request)."""
+    user_roles = get_roles(request.user)
+    return {"user_roles": user_roles, "is_admin": ADMIN_GROUP in user_roles}
@@ -1,14 +1,15 @@
-from django import forms
-from django.contrib.auth.forms import UserCreationForm
-from django.contrib.auth.models import User
-from .models import Reservation, Service, TimeSlot
-
+from datetime import datetime, timedelta
 
 from django import forms
-from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth import get_user_model
+from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
+from django.db.models import Q
 from django.utils import timezone
 
+from .models import Reservation, ScheduleTemplate, Service, TimeSlot
+from .utils.availability import day_start
+from .utils.intervals import IntervalSet
+
 User = get_user_model()
 
 
@@ -81,11 +82,18 @@ class ReservationForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         service = kwargs.pop("service", None)
         super().__init__(*args, **kwargs)
+        self.service = service
 
         if service:
+            # Zajętość rozstrzyga dopiero zapis z blokadą slotu
+            # (utils.reservations), nie formularz
             self.fields["slot"].queryset = TimeSlot.objects.filter(
                 service=service, is_active=True
-            ).exclude(reservation__isnull=False)
+            )
+
+    def validate_unique(self):
+        # unikalność slotu sprawdza zapis z blokadą (utils.reservations)
+        pass
 
 
 class ServiceAdminForm(forms.ModelForm):
@@ -113,10 +121,6 @@ class ServiceAdminForm(forms.ModelForm):
         }
 
 
-from datetime import datetime, timedelta
-from django.utils import timezone
-
-
 class SlotAdminForm(forms.ModelForm):
     slot_date = forms.DateField(
         label="Data",
@@ -212,6 +216,22 @@ class SlotAdminForm(forms.ModelForm):
             if TimeSlot.objects.filter(service=service, start=start, end=end).exists():
                 raise forms.ValidationError("Ten slot już istnieje dla tej usługi.")
 
+            # ... i nie nachodzi na inny aktywny slot tego dnia
+            if cleaned_data.get("is_active"):
+                occupied = IntervalSet(
+                    TimeSlot.objects.filter(
+                        service=service,
+                        start__date=timezone.localdate(start),
+                        is_active=True,
+                    )
+                    .exclude(pk=self.instance.pk)
+                    .values_list("start", "end")
+                )
+                if occupied.overlaps(start, end):
+                    raise forms.ValidationError(
+                        "Ten slot nachodzi na inny termin tej usługi."
+                    )
+
             cleaned_data["start"] = start
             cleaned_data["end"] = end
 
@@ -227,3 +247,236 @@ class SlotAdminForm(forms.ModelForm):
         if commit:
             instance.save()
         return instance
+
+
+class ScheduleTemplateForm(forms.ModelForm):
+    weekdays = forms.TypedMultipleChoiceField(
+        label="Dni tygodnia",
+        choices=ScheduleTemplate.WEEKDAYS,
+        coerce=int,
+        widget=forms.CheckboxSelectMultiple,
+    )
+
+    class Meta:
+        model = ScheduleTemplate
+        fields = [
+            "service",
+            "weekdays",
+            "start_time",
+            "end_time",
+            "slot_duration",
+            "valid_from",
+            "valid_until",
+            "exceptions",
+        ]
+        widgets = {
+            "service": forms.Select(attrs={"class": "form-select"}),
+            "start_time": forms.TimeInput(
+                attrs={"class": "form-control", "type": "time"}
+            ),
+            "end_time": forms.TimeInput(
+                attrs={"class": "form-control", "type": "time"}
+            ),
+            "slot_duration": forms.NumberInput(
+                attrs={"class": "form-control", "min": "5", "step": "5"}
+            ),
+            "valid_from": forms.DateInput(
+                attrs={"class": "form-control", "type": "date"}
+            ),
+            "valid_until": forms.DateInput(
+                attrs={"class": "form-control", "type": "date"}
+            ),
+            "exceptions": forms.Textarea(
+                attrs={
+                    "class": "form-control",
+                    "rows": 3,
+                    "placeholder": "2025-12-24\n2025-12-25",
+                }
+            ),
+        }
+        labels = {
+            "service": "Usługa",
+            "start_time": "Od godziny",
+            "end_time": "Do godziny",
+            "slot_duration": "Długość slotu (minuty, puste = z usługi)",
+            "valid_from": "Obowiązuje od",
+            "valid_until": "Obowiązuje do",
+            "exceptions": "Wyjątki (daty bez terminów)",
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial["weekdays"] = sorted(self.instance.weekday_numbers())
+
+    def clean_weekdays(self):
+        return "".join(str(d) for d in sorted(set(self.cleaned_data["weekdays"])))
+
+    def clean_exceptions(self):
+        raw = self.cleaned_data["exceptions"]
+        try:
+            dates = ScheduleTemplate(exceptions=raw).exception_dates()
+        except ValueError:
+            raise forms.ValidationError("Podaj daty w formacie RRRR-MM-DD.")
+        return "\n".join(d.isoformat() for d in sorted(dates))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_time = cleaned_data.get("start_time")
+        end_time = cleaned_data.get("end_time")
+        valid_from = cleaned_data.get("valid_from")
+        valid_until = cleaned_data.get("valid_until")
+
+        if start_time and end_time and end_time <= start_time:
+            raise forms.ValidationError("Godzina końca musi być po godzinie startu.")
+        if valid_from and valid_until and valid_until < valid_from:
+            raise forms.ValidationError("Koniec okresu musi być po jego początku.")
+        return cleaned_data
+
+
+class SlotFilterForm(forms.Form):
+    service = forms.ModelChoiceField(
+        label="Usługa",
+        queryset=Service.objects.only("id", "name").order_by("name"),
+        required=False,
+        empty_label="Wszystkie",
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    date_from = forms.DateField(
+        label="Od",
+        required=False,
+        widget=forms.DateInput(attrs={"class": "form-control", "type": "date"}),
+    )
+    date_to = forms.DateField(
+        label="Do",
+        required=False,
+        widget=forms.DateInput(attrs={"class": "form-control", "type": "date"}),
+    )
+    active = forms.ChoiceField(
+        label="Aktywny",
+        choices=[("", "Wszystkie"), ("1", "Tak"), ("0", "Nie")],
+        required=False,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+
+    def filter(self, queryset):
+        """Apply the valid filters to a ``TimeSlot`` queryset."""
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data["service"]:
+            queryset = queryset.filter(service=data["service"])
+        if data["date_from"]:
+            queryset = queryset.filter(start__gte=day_start(data["date_from"]))
+        if data["date_to"]:
+            queryset = queryset.filter(
+                start__lt=day_start(data["date_to"] + timedelta(days=1))
+            )
+        if data["active"]:
+            queryset = queryset.filter(is_active=data["active"] == "1")
+        return queryset
+
+
+class SlotImportForm(forms.Form):
+    file = forms.FileField(
+        label="Plik CSV",
+        help_text="Kolumny: service (id lub nazwa), start, end.",
+        widget=forms.ClearableFileInput(
+            attrs={"class": "form-control", "accept": ".csv"}
+        ),
+    )
+    dry_run = forms.BooleanField(
+        label="Tylko sprawdź (bez zapisu)",
+        required=False,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+
+
+class ReservationFilterForm(forms.Form):
+    status = forms.ChoiceField(
+        label="Status",
+        choices=[("", "Wszystkie")] + Reservation.Status.choices,
+        required=False,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    service = forms.ModelChoiceField(
+        label="Usługa",
+        queryset=Service.objects.only("id", "name").order_by("name"),
+        required=False,
+        empty_label="Wszystkie",
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    user = forms.CharField(
+        label="Użytkownik",
+        required=False,
+        widget=forms.TextInput(
+            attrs={"class": "form-control", "placeholder": "Nazwa użytkownika"}
+        ),
+    )
+    date_from = forms.DateField(
+        label="Termin od",
+        required=False,
+        widget=forms.DateInput(attrs={"class": "form-control", "type": "date"}),
+    )
+    date_to = forms.DateField(
+        label="Termin do",
+        required=False,
+        widget=forms.DateInput(attrs={"class": "form-control", "type": "date"}),
+    )
+
+    archived = forms.BooleanField(
+        label="Archiwum",
+        required=False,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+
+    def show_archived(self):
+        return self.is_valid() and self.cleaned_data["archived"]
+
+    def _filter_common(self, queryset):
+        data = self.cleaned_data
+        if data["status"]:
+            queryset = queryset.filter(status=data["status"])
+        if data["service"]:
+            queryset = queryset.filter(service=data["service"])
+        if data["user"]:
+            # dokładna nazwa – unikalny indeks zamiast skanu po LIKE
+            queryset = queryset.filter(user__username=data["user"].strip())
+        return queryset
+
+    def _date_bounds(self):
+        data = self.cleaned_data
+        bounds = {}
+        if data["date_from"]:
+            bounds["gte"] = day_start(data["date_from"])
+        if data["date_to"]:
+            bounds["lt"] = day_start(data["date_to"] + timedelta(days=1))
+        return bounds
+
+    def filter(self, queryset):
+        """Apply the valid filters to a ``Reservation`` queryset."""
+        if not self.is_valid():
+            return queryset
+        queryset = self._filter_common(queryset)
+
+        # anulowane/odrzucone nie mają slotu – ich termin jest w archived_*
+        bounds = self._date_bounds()
+        if bounds:
+            on_slot = Q(**{f"slot__start__{op}": v for op, v in bounds.items()})
+            archived = Q(slot=None) & Q(
+                **{f"archived_start__{op}": v for op, v in bounds.items()}
+            )
+            queryset = queryset.filter(on_slot | archived)
+        return queryset
+
+    def filter_archived(self, queryset):
+        """Apply the valid filters to an ``ArchivedReservation`` queryset."""
+        if not self.is_valid():
+            return queryset
+        queryset = self._filter_common(queryset)
+        bounds = self._date_bounds()
+        if bounds:
+            queryset = queryset.filter(
+                **{f"start__{op}": v for op, v in bounds.items()}
+            )
+        return queryset
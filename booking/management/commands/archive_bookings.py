@@ -0,0 +1,74 @@
+import time as clock
+
+from django.core.management.base import BaseCommand
+
+from booking.utils.retention import (
+    BATCH_SIZE,
+    RETENTION_DAYS,
+    archivable_reservations,
+    archivable_slots,
+    archive,
+    retention_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move closed reservations and past slots older than the retention "
+        "period to the archive tables, in batches. Safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=RETENTION_DAYS,
+            help=f"Keep this many days of history live (default: {RETENTION_DAYS}).",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--max-batches", type=int, help="Stop after this many batches."
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Pause between batches in seconds (eases load on the database).",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only count what would move."
+        )
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options["days"])
+        self.stdout.write(f"cutoff: {cutoff:%Y-%m-%d %H:%M}")
+
+        if options["dry_run"]:
+            reservations = archivable_reservations(cutoff).count()
+            # sloty zwolnione dopiero przez archiwizację rezerwacji też się liczą
+            slots = archivable_slots(cutoff).count() + (
+                archivable_reservations(cutoff).filter(slot__isnull=False).count()
+            )
+            self.stdout.write(f"reservations: {reservations}\nslots: {slots}")
+            return
+
+        def on_batch(kind, count):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {kind}: +{count}")
+            if options["sleep"]:
+                clock.sleep(options["sleep"])
+
+        started = clock.perf_counter()
+        reservations, slots = archive(
+            cutoff,
+            batch_size=options["batch_size"],
+            max_batches=options["max_batches"],
+            on_batch=on_batch,
+        )
+        elapsed = clock.perf_counter() - started
+        rate = (reservations + slots) / elapsed if elapsed else 0
+        self.stdout.write(
+            f"reservations archived: {reservations}\n"
+            f"slots archived: {slots}\n"
+            f"time: {elapsed:.2f} s ({rate:,.0f} rows/s)"
+        )
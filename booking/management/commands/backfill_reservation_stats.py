@@ -0,0 +1,33 @@
+import time as clock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from booking.utils.rollup import backfill
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily reservation rollup from the reservations table "
+        "(all days, or only --from/--to)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="YYYY-MM-DD")
+        parser.add_argument("--to", dest="date_to", help="YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        dates = {}
+        for name in ("date_from", "date_to"):
+            value = options[name]
+            if value:
+                dates[name] = parse_date(value)
+                if dates[name] is None:
+                    raise CommandError(f"Invalid date: {value}")
+
+        started = clock.perf_counter()
+        rows = backfill(**dates)
+        elapsed = clock.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Rollup rows written: {rows} ({elapsed:.2f} s)")
+        )
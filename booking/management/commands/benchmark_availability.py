@@ -0,0 +1,139 @@
+import random
+import time as clock
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from booking.models import Reservation, Service, TimeSlot
+from booking.utils.availability import (
+    ACTIVE_STATUSES,
+    _version_key,
+    day_start,
+    days_between,
+    get_day_indexes,
+    get_free_slots_in_range,
+)
+from booking.utils.slot_index import CLOSE_HOUR, OPEN_HOUR
+from booking.utils.versions import bump_version
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the bitmap availability index with the ORM queries it replaced. "
+        "Seeds a synthetic service inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=28)
+        parser.add_argument("--step", type=int, default=15, help="slot_duration")
+        parser.add_argument(
+            "--reserved", type=float, default=0.3, help="Share of reserved slots."
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, days, step, reserved):
+        from django.contrib.auth import get_user_model
+
+        user, _ = get_user_model().objects.get_or_create(username="__benchmark__")
+        service = Service.objects.create(
+            name="__benchmark__", price=0, slot_duration=step
+        )
+        first_day = timezone.localdate() + timedelta(days=1)
+        slots = []
+        for d in range(days):
+            origin = day_start(first_day + timedelta(days=d)) + timedelta(
+                hours=OPEN_HOUR
+            )
+            for i in range((CLOSE_HOUR - OPEN_HOUR) * 60 // step):
+                start = origin + timedelta(minutes=i * step)
+                slots.append(
+                    TimeSlot(
+                        service=service,
+                        start=start,
+                        end=start + timedelta(minutes=step),
+                    )
+                )
+        slots = TimeSlot.objects.bulk_create(slots)
+        taken = random.sample(slots, int(len(slots) * reserved))
+        Reservation.objects.bulk_create(
+            Reservation(user=user, service=service, slot=s) for s in taken
+        )
+        window = (day_start(first_day), day_start(first_day + timedelta(days=days)))
+        return service, window, len(slots)
+
+    def timeit(self, label, fn, repeat):
+        started = clock.perf_counter()
+        for _ in range(repeat):
+            result = fn()
+        elapsed = (clock.perf_counter() - started) / repeat
+        self.stdout.write(f"{label:<42} {elapsed * 1000:9.2f} ms")
+        return result
+
+    def run(self, days, step, reserved, repeat, **options):
+        service, (start, end), total = self.seed(days, step, reserved)
+        self.stdout.write(f"{total} slots over {days} days, step {step} min\n")
+
+        def legacy_api():
+            qs = TimeSlot.objects.filter(
+                service=service, is_active=True, start__gte=start, start__lt=end
+            ).exclude(reservation__status__in=ACTIVE_STATUSES)
+            return [(s.id, s.start, s.end) for s in qs]
+
+        keys = [_version_key(service.pk, d) for d in days_between(start, end)]
+
+        def invalidate():
+            # nowe wersje dni – zbudowane indeksy stają się nieosiągalne
+            for key in keys:
+                bump_version(key)
+
+        def index_cold():
+            invalidate()
+            return get_free_slots_in_range(service, start, end)
+
+        def index_warm():
+            return get_free_slots_in_range(service, start, end)
+
+        legacy = self.timeit("free slots: ORM anti-join", legacy_api, repeat)
+        cold = self.timeit("free slots: index built from DB", index_cold, repeat)
+        warm = self.timeit("free slots: index from cache", index_warm, repeat)
+        assert legacy == cold == warm, "index disagrees with the ORM query"
+
+        day = timezone.localdate(start)
+
+        def legacy_generator():
+            occupied = list(
+                TimeSlot.objects.filter(
+                    service=service, start__date=day, is_active=True
+                ).values_list("start", "end")
+            )
+            current = day_start(day) + timedelta(hours=OPEN_HOUR)
+            close = day_start(day) + timedelta(hours=CLOSE_HOUR)
+            free = []
+            while current + timedelta(minutes=step) <= close:
+                slot_end = current + timedelta(minutes=step)
+                if not any(s <= current < e or s < slot_end <= e for s, e in occupied):
+                    free.append(current)
+                current = slot_end
+            return free
+
+        def index_generator():
+            index = get_day_indexes(service, [day])[day]
+            return [cell_start for cell_start, _ in index.free_grid()]
+
+        self.timeit("admin generator: any() over slots", legacy_generator, repeat)
+        self.timeit("admin generator: index", index_generator, repeat)
+        invalidate()
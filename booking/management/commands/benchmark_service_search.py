@@ -0,0 +1,94 @@
+import random
+import time as clock
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from booking.models import Service
+from booking.utils.search import is_supported, rebuild_index, search_services
+
+WORDS = (
+    "masaż strzyżenie koloryzacja manicure pedicure fizjoterapia konsultacja "
+    "dietetyk trening rehabilitacja peeling relaksacyjny sportowy leczniczy "
+    "klasyczny hybrydowy damskie męskie dziecięce express premium twarzy "
+    "ciała stóp dłoni pleców kręgosłupa gorącymi kamieniami aromaterapia"
+).split()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the full-text service search with the icontains filter it "
+        "replaced. Seeds a synthetic catalog inside a transaction that is "
+        "rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--services", type=int, default=20000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            self.stderr.write(f"No full-text backend for {connection.vendor}.")
+            return
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        rnd = random.Random(7)
+        Service.objects.bulk_create(
+            (
+                Service(
+                    name=" ".join(rnd.sample(WORDS, 3)).capitalize(),
+                    description=" ".join(rnd.choices(WORDS, k=25)),
+                    price=rnd.randint(50, 400),
+                )
+                for _ in range(count)
+            ),
+            batch_size=2000,
+        )
+        # bulk_create pomija sygnały – indeks budujemy sami
+        rebuild_index()
+
+    def timeit(self, label, fn, repeat):
+        started = clock.perf_counter()
+        for _ in range(repeat):
+            result = fn()
+        elapsed = (clock.perf_counter() - started) / repeat
+        self.stdout.write(f"{label:<42} {elapsed * 1000:9.2f} ms")
+        return result
+
+    def run(self, services, repeat, **options):
+        self.seed(services)
+        self.stdout.write(f"{Service.objects.count()} services ({connection.vendor})\n")
+
+        for query in ("masaż", "koloryzacja damskie", "rehab"):
+            self.stdout.write(f"q={query!r}")
+
+            def icontains():
+                return list(
+                    Service.objects.filter(
+                        Q(name__icontains=query) | Q(description__icontains=query)
+                    )
+                )
+
+            def full_text():
+                return [s.pk for s in search_services(query)]
+
+            def typeahead():
+                return search_services(query[:4], limit=8)
+
+            legacy = self.timeit("  icontains (unranked, all rows)", icontains, repeat)
+            ranked = self.timeit("  full-text (ranked, top 200)", full_text, repeat)
+            self.timeit("  typeahead (prefix, top 8)", typeahead, repeat)
+            self.stdout.write(
+                f"  matches: icontains {len(legacy)}, full-text {len(ranked)}\n"
+            )
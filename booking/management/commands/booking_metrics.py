@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from booking.utils import metrics
+
+
+class Command(BaseCommand):
+    help = "Show booking counters (availability cache hits/misses, slot holds)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Zero the counters after printing."
+        )
+
+    def handle(self, *args, **options):
+        counters = metrics.get_counters()
+        for name, value in counters.items():
+            self.stdout.write(f"{name}: {value}")
+
+        hits = counters.get("availability_cache_hit", 0)
+        misses = counters.get("availability_cache_miss", 0)
+        if hits + misses:
+            self.stdout.write(
+                f"availability_cache_hit_ratio: {hits / (hits + misses):.2%}"
+            )
+
+        granted = counters.get("hold_granted", 0)
+        if granted:
+            converted = counters.get("hold_converted", 0)
+            self.stdout.write(f"hold_conversion_ratio: {converted / granted:.2%}")
+
+        if options["reset"]:
+            metrics.reset_counters()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
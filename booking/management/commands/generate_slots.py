@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from booking.models import ScheduleTemplate
+from booking.utils.schedule import BATCH_SIZE, generate_slots
+
+
+class Command(BaseCommand):
+    help = "Expand schedule templates into time slots (skipping colliding ones)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "templates", nargs="*", type=int, help="Template ids (default: all)."
+        )
+        parser.add_argument("--service", type=int, help="Only templates of a service.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Count slots without saving."
+        )
+
+    def handle(self, *args, **options):
+        templates = ScheduleTemplate.objects.select_related("service")
+        if options["templates"]:
+            templates = templates.filter(pk__in=options["templates"])
+        if options["service"]:
+            templates = templates.filter(service_id=options["service"])
+        if not templates.exists():
+            raise CommandError("No schedule templates match.")
+
+        result = generate_slots(
+            templates, batch_size=options["batch_size"], dry_run=options["dry_run"]
+        )
+        rate = result.candidates / result.seconds if result.seconds else 0
+        self.stdout.write(
+            f"candidates: {result.candidates}\n"
+            f"created: {result.created}{' (dry run)' if options['dry_run'] else ''}\n"
+            f"skipped: {result.skipped}\n"
+            f"time: {result.seconds * 1000:.1f} ms ({rate:,.0f} slots/s)"
+        )
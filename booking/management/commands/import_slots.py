@@ -0,0 +1,66 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from booking.utils.slot_import import (
+    BATCH_SIZE,
+    CHUNK_SIZE,
+    ImportFileError,
+    import_slots,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import time slots from a CSV file with a service,start,end header "
+        "(service is an id or a name)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file ('-' for stdin).")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Validate without saving."
+        )
+        parser.add_argument(
+            "--show-rejected",
+            type=int,
+            default=20,
+            help="How many rejected rows to list (default: 20).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            if path == "-":
+                result = self._import(sys.stdin, options)
+            else:
+                with open(path, newline="", encoding="utf-8-sig") as f:
+                    result = self._import(f, options)
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+        except ImportFileError as exc:
+            raise CommandError(str(exc))
+
+        for line, reason in result.rejected[: options["show_rejected"]]:
+            self.stderr.write(f"line {line}: {reason}")
+        hidden = len(result.rejected) - options["show_rejected"]
+        if hidden > 0:
+            self.stderr.write(f"... and {hidden} more rejected rows")
+
+        rate = result.rows / result.seconds if result.seconds else 0
+        self.stdout.write(
+            f"rows: {result.rows}\n"
+            f"created: {result.created}{' (dry run)' if options['dry_run'] else ''}\n"
+            f"rejected: {len(result.rejected)}\n"
+            f"time: {result.seconds * 1000:.1f} ms ({rate:,.0f} rows/s)"
+        )
+
+    def _import(self, lines, options):
+        return import_slots(
+            lines,
+            chunk_size=options["chunk_size"],
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from booking.utils.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Re-index all services for full-text search (after bulk changes)."
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Service search index rebuilt."))
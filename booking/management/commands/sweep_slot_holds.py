@@ -0,0 +1,32 @@
+import time as clock
+
+from django.core.management.base import BaseCommand
+
+from booking.utils.holds import SWEEP_BATCH_SIZE, sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired slot holds and announce their slots as free again. "
+        "Run from cron, or with --every to keep sweeping."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SWEEP_BATCH_SIZE)
+        parser.add_argument(
+            "--every",
+            type=int,
+            default=0,
+            help="Repeat every N seconds instead of a single pass.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = clock.perf_counter()
+            swept = sweep_expired_holds(batch_size=options["batch_size"])
+            elapsed = (clock.perf_counter() - started) * 1000
+            if swept or not options["every"]:
+                self.stdout.write(f"Expired holds removed: {swept} ({elapsed:.1f} ms)")
+            if not options["every"]:
+                break
+            clock.sleep(options["every"])
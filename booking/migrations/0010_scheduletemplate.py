@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0009_waitlistentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduleTemplate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("weekdays", models.CharField(max_length=7)),
+                ("start_time", models.TimeField()),
+                ("end_time", models.TimeField()),
+                ("slot_duration", models.PositiveIntegerField(blank=True, null=True)),
+                ("valid_from", models.DateField()),
+                ("valid_until", models.DateField()),
+                ("exceptions", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "service",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="schedules",
+                        to="booking.service",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["service__name", "valid_from", "start_time"],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0010_scheduletemplate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReservationDailyStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Oczekująca"),
+                            ("approved", "Zatwierdzona"),
+                            ("cancelled", "Anulowana"),
+                            ("rejected", "Odrzucona"),
+                        ],
+                        max_length=12,
+                    ),
+                ),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "service",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="booking.service",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["day", "status"], name="booking_res_day_1b5f86_idx"
+                    )
+                ],
+                "unique_together": {("day", "service", "status")},
+            },
+        ),
+    ]
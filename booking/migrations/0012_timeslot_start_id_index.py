@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0011_reservationdailystat"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="timeslot",
+            index=models.Index(
+                fields=["start", "id"], name="booking_tim_start_8d8a80_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+PG_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "ALTER TABLE booking_service ADD COLUMN search_vector tsvector"
+        )
+        schema_editor.execute(f"UPDATE booking_service SET search_vector = {PG_VECTOR}")
+        schema_editor.execute(
+            "CREATE INDEX booking_service_search_gin "
+            "ON booking_service USING GIN (search_vector)"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE booking_service_fts "
+            "USING fts5(name, description, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO booking_service_fts (rowid, name, description) "
+            "SELECT id, name, description FROM booking_service"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS booking_service_search_gin")
+        schema_editor.execute(
+            "ALTER TABLE booking_service DROP COLUMN IF EXISTS search_vector"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS booking_service_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0013_reservation_list_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0016_archive_tables"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="archivedreservation",
+            index=models.Index(
+                fields=["created_at", "id"], name="booking_arc_created_1d5952_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedreservation",
+            index=models.Index(
+                fields=["status", "created_at", "id"],
+                name="booking_arc_status_b2fa5a_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedreservation",
+            index=models.Index(
+                fields=["service", "created_at", "id"],
+                name="booking_arc_service_1a733d_idx",
+            ),
+        ),
+    ]
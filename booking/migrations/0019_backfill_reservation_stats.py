@@ -0,0 +1,45 @@
+from collections import Counter
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_stats(apps, schema_editor):
+    """
+    Fill the daily rollup from the reservations that existed before it –
+    the same counting as ``booking.utils.rollup.backfill``, on historical
+    models.
+    """
+    ReservationDailyStat = apps.get_model("booking", "ReservationDailyStat")
+    counts = Counter()
+    for name in ("Reservation", "ArchivedReservation"):
+        rows = (
+            apps.get_model("booking", name)
+            .objects.annotate(day=TruncDate("created_at"))
+            .values("day", "service_id", "status")
+            .annotate(n=Count("id"))
+            .order_by()
+        )
+        for row in rows.iterator():
+            counts[(row["day"], row["service_id"], row["status"])] += row["n"]
+
+    ReservationDailyStat.objects.all().delete()
+    ReservationDailyStat.objects.bulk_create(
+        (
+            ReservationDailyStat(day=day, service_id=service_id, status=status, count=n)
+            for (day, service_id, status), n in counts.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0018_archived_reservation_list_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
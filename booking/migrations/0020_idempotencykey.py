@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0019_backfill_reservation_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdempotencyKey",
+            fields=[
+                (
+                    "digest",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("fingerprint", models.CharField(max_length=64)),
+                ("status", models.PositiveSmallIntegerField(blank=True, null=True)),
+                ("headers", models.JSONField(default=list)),
+                ("content", models.BinaryField(default=b"")),
+                ("expires_at", models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
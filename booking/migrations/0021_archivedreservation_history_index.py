@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0020_idempotencykey"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="archivedreservation",
+            name="booking_arc_user_id_6454e7_idx",
+        ),
+        migrations.AddIndex(
+            model_name="archivedreservation",
+            index=models.Index(
+                fields=["user", "created_at", "id"],
+                name="booking_arc_user_id_3b9984_idx",
+            ),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import datetime
+
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
@@ -24,6 +26,12 @@ class TimeSlot(models.Model):
     class Meta:
         ordering = ["start"]
         unique_together = ("service", "start", "end")
+        indexes = [
+            # stronicowanie kursorem listy terminów w panelu admina
+            models.Index(fields=["start", "id"]),
+            # wolne terminy usługi, indeks dostępności, licznik aktywnych
+            models.Index(fields=["service", "is_active", "start"]),
+        ]
 
     def clean(self):
         # Validate only after both start and end are set
@@ -71,6 +79,24 @@ class Reservation(models.Model):
 
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        # lista rezerwacji w panelu admina: kursor (created_at, id) + filtry
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["status", "created_at", "id"]),
+            models.Index(fields=["service", "created_at", "id"]),
+            models.Index(fields=["user", "created_at", "id"]),
+            models.Index(fields=["archived_start"]),
+            # "moje rezerwacje" z filtrem statusu
+            models.Index(fields=["user", "status"]),
+            # tylko rezerwacje zajmujące termin – anty-join wolnych terminów
+            models.Index(
+                fields=["slot"],
+                condition=models.Q(status__in=["pending", "approved"]),
+                name="booking_res_active_slot_idx",
+            ),
+        ]
+
     def __str__(self):
         if self.slot:
             dt = self.slot.start
@@ -84,3 +110,193 @@ class Reservation(models.Model):
             dt_str = "brak daty"
 
         return f"{self.user} -> {self.service} @ {dt_str} ({self.status})"
+
+
+class SlotHold(models.Model):
+    """
+    Short-lived claim on a slot while its user fills in the booking form.
+    At most one hold per slot; expired rows are ignored and removed lazily
+    or by ``manage.py sweep_slot_holds``.
+    """
+
+    slot = models.OneToOneField(
+        TimeSlot, on_delete=models.CASCADE, primary_key=True, related_name="hold"
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def is_active(self, now=None):
+        return self.expires_at > (now or timezone.now())
+
+    def __str__(self):
+        return f"{self.user} -> {self.slot_id} do {self.expires_at:%H:%M:%S}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response stored for an idempotency key (see ``utils.idempotency``).
+    ``status`` is empty while the first request is in progress; expired
+    rows are taken over by the next request with the key or deleted lazily.
+    """
+
+    # sha256 z użytkownika, ścieżki i klucza
+    digest = models.CharField(max_length=64, primary_key=True)
+    # sha256 treści żądania – ten sam klucz z innymi danymi to błąd
+    fingerprint = models.CharField(max_length=64)
+    status = models.PositiveSmallIntegerField(null=True, blank=True)
+    headers = models.JSONField(default=list)
+    content = models.BinaryField(default=b"")
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.digest[:12]} ({self.status or 'w trakcie'})"
+
+
+class WaitlistEntry(models.Model):
+    """
+    A user queued for a taken slot. When the slot is freed, the oldest
+    entry (FIFO by ``created_at``, ``id``) is turned into a pending
+    reservation – see ``utils.waitlist.promote_waitlist``.
+    """
+
+    slot = models.ForeignKey(
+        TimeSlot, on_delete=models.CASCADE, related_name="waitlist"
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        unique_together = ("slot", "user")
+        indexes = [models.Index(fields=["slot", "created_at", "id"])]
+
+    def __str__(self):
+        return f"{self.user} czeka na {self.slot_id}"
+
+
+class ScheduleTemplate(models.Model):
+    """
+    Recurring opening hours of a service, expanded into ``TimeSlot`` rows by
+    ``utils.schedule.generate_slots`` (admin panel or
+    ``manage.py generate_slots``).
+    """
+
+    WEEKDAYS = [
+        (0, "Poniedziałek"),
+        (1, "Wtorek"),
+        (2, "Środa"),
+        (3, "Czwartek"),
+        (4, "Piątek"),
+        (5, "Sobota"),
+        (6, "Niedziela"),
+    ]
+
+    service = models.ForeignKey(
+        Service, on_delete=models.CASCADE, related_name="schedules"
+    )
+    # Numery dni tygodnia (0 = poniedziałek), np. "01234" dla dni roboczych
+    weekdays = models.CharField(max_length=7)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    # Puste = długość slotu z usługi
+    slot_duration = models.PositiveIntegerField(null=True, blank=True)
+    valid_from = models.DateField()
+    valid_until = models.DateField()
+    # Daty bez terminów (święta, urlopy) – RRRR-MM-DD, jedna na linię
+    exceptions = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["service__name", "valid_from", "start_time"]
+
+    def weekday_numbers(self):
+        return {int(d) for d in self.weekdays}
+
+    def exception_dates(self):
+        dates = set()
+        for token in self.exceptions.replace(",", " ").split():
+            dates.add(datetime.date.fromisoformat(token))
+        return dates
+
+    def get_slot_duration(self):
+        return self.slot_duration or self.service.slot_duration
+
+    def get_weekdays_display(self):
+        names = dict(self.WEEKDAYS)
+        return ", ".join(names[d] for d in sorted(self.weekday_numbers()))
+
+    def __str__(self):
+        return (
+            f"{self.service.name} | {self.get_weekdays_display()} "
+            f"{self.start_time:%H:%M}-{self.end_time:%H:%M}"
+        )
+
+
+class ReservationDailyStat(models.Model):
+    """
+    Number of reservations created on ``day`` (local date) for a service,
+    per current status. Kept up to date by ``utils.rollup``; rebuilt with
+    ``manage.py backfill_reservation_stats``.
+    """
+
+    day = models.DateField()
+    service = models.ForeignKey(Service, on_delete=models.CASCADE)
+    status = models.CharField(max_length=12, choices=Reservation.Status.choices)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("day", "service", "status")
+        indexes = [models.Index(fields=["day", "status"])]
+
+    def __str__(self):
+        return f"{self.day} {self.service_id} {self.status}: {self.count}"
+
+
+class ArchivedTimeSlot(models.Model):
+    """
+    A past slot moved out of ``TimeSlot`` by ``manage.py archive_bookings``;
+    keeps the original id.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    service = models.ForeignKey(Service, on_delete=models.CASCADE)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    is_active = models.BooleanField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["service", "start"])]
+
+    def __str__(self):
+        return f"{self.service_id} | {self.start:%Y-%m-%d %H:%M} (archiwum)"
+
+
+class ArchivedReservation(models.Model):
+    """
+    A closed reservation (cancelled/rejected, or with its slot in the past)
+    moved out of ``Reservation``; keeps the original id and the slot times.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    service = models.ForeignKey(Service, on_delete=models.PROTECT)
+    status = models.CharField(max_length=12, choices=Reservation.Status.choices)
+    start = models.DateTimeField(null=True, blank=True)
+    end = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # historia użytkownika w "Moje rezerwacje" (stronicowana kursorem)
+            models.Index(fields=["user", "created_at", "id"]),
+            # lista archiwum w panelu admina i eksport (jak w Reservation)
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["status", "created_at", "id"]),
+            models.Index(fields=["service", "created_at", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.service_id} ({self.status}, archiwum)"
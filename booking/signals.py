@@ -0,0 +1,148 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Reservation, Service, TimeSlot
+from .utils.catalog import bump_service_version
+from .utils.dashboard import invalidate_dashboard_stats
+from .utils.events import publish_slots
+from .utils.permissions import invalidate_roles
+from .utils.search import index_service, unindex_service
+from .utils.rollup import apply_deltas, record
+from .utils.availability import (
+    ACTIVE_STATUSES,
+    invalidate_availability,
+    local_day,
+    set_slots_free,
+    slot_added,
+)
+
+
+@receiver(post_save, sender=Service)
+def service_saved(sender, instance, **kwargs):
+    index_service(instance)
+    bump_service_version(instance.pk)
+
+
+@receiver(post_delete, sender=Service)
+def service_deleted(sender, instance, **kwargs):
+    unindex_service(instance.pk)
+    bump_service_version(instance.pk)
+
+
+@receiver(pre_save, sender=TimeSlot)
+def timeslot_pre_save(sender, instance, **kwargs):
+    instance._availability_before = None
+    if not instance._state.adding:
+        instance._availability_before = (
+            TimeSlot.objects.filter(pk=instance.pk)
+            .values_list("service_id", "start")
+            .first()
+        )
+
+
+@receiver(post_save, sender=TimeSlot)
+def timeslot_saved(sender, instance, created, **kwargs):
+    if created:
+        slot_added(instance)
+        return
+    # edycja terminu – przeliczamy oba dni od nowa
+    targets = {(instance.service_id, local_day(instance.start))}
+    before = getattr(instance, "_availability_before", None)
+    if before:
+        targets.add((before[0], local_day(before[1])))
+    invalidate_availability(targets)
+
+
+@receiver(post_delete, sender=TimeSlot)
+def timeslot_deleted(sender, instance, **kwargs):
+    invalidate_availability([(instance.service_id, local_day(instance.start))])
+
+
+def _holds_slot(slot_id, status):
+    return bool(slot_id) and status in ACTIVE_STATUSES
+
+
+@receiver(pre_save, sender=Reservation)
+def reservation_pre_save(sender, instance, **kwargs):
+    instance._availability_before = None
+    if not instance._state.adding:
+        instance._availability_before = (
+            Reservation.objects.filter(pk=instance.pk)
+            .values_list("slot_id", "status", "service_id")
+            .first()
+        )
+
+
+def _update_rollup(instance, created, before_status, before_service):
+    if created:
+        record(instance.created_at, instance.service_id, instance.status)
+    elif before_status and (before_status, before_service) != (
+        instance.status,
+        instance.service_id,
+    ):
+        day = timezone.localdate(instance.created_at)
+        apply_deltas(
+            {
+                (day, before_service, before_status): -1,
+                (day, instance.service_id, instance.status): 1,
+            }
+        )
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, created, **kwargs):
+    invalidate_dashboard_stats()
+    before_slot, before_status, before_service = instance._availability_before or (
+        None,
+        None,
+        None,
+    )
+    _update_rollup(instance, created, before_status, before_service)
+    held_before = _holds_slot(before_slot, before_status)
+    held_after = _holds_slot(instance.slot_id, instance.status)
+    # np. zatwierdzenie rezerwacji nie zmienia dostępności terminu
+    if (before_slot, held_before) == (instance.slot_id, held_after):
+        return
+    if held_before:
+        publish_slots(set_slots_free([before_slot], True), "freed")
+    if held_after:
+        publish_slots(set_slots_free([instance.slot_id], False), "taken")
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    invalidate_dashboard_stats()
+    record(instance.created_at, instance.service_id, instance.status, -1)
+    if _holds_slot(instance.slot_id, instance.status):
+        publish_slots(set_slots_free([instance.slot_id], True), "freed")
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def group_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        invalidate_roles([instance.pk])
+    elif action == "pre_clear":
+        # group.user_set.clear() – po fakcie nie wiemy już, kogo dotyczyło
+        invalidate_roles(instance.user_set.values_list("pk", flat=True))
+    else:
+        invalidate_roles(pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    # zmiana nazwy lub usunięcie grupy zmienia role wszystkich jej członków
+    invalidate_roles(instance.user_set.values_list("pk", flat=True))
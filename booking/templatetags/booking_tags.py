@@ -1,3 +1,5 @@
+import uuid
+
 from django import template
 from booking.utils.permissions import is_admin as is_admin_check
 
@@ -7,3 +9,9 @@ register = template.Library()
 @register.filter
 def is_admin(user):
     return is_admin_check(user)
+
+
+@register.simple_tag
+def idempotency_key():
+    """Fresh key for a form or action link (see utils.idempotency)."""
+    return uuid.uuid4().hex
@@ -1,3 +1,2125 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time as time_module
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.test import (
+    AsyncRequestFactory,
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .checks import check_cache_size, check_shared_backends, run_startup_checks
+from .models import (
+    ArchivedReservation,
+    ArchivedTimeSlot,
+    IdempotencyKey,
+    Reservation,
+    ReservationDailyStat,
+    ScheduleTemplate,
+    Service,
+    SlotHold,
+    TimeSlot,
+    WaitlistEntry,
+)
+from .utils import events, moderation, slot_import, streaming
+from .utils.availability import get_free_slots_in_range
+from .utils.events import InProcessBroker, PostgresBroker, get_broker, service_channel
+from .utils.intervals import IntervalSet
+from .utils.keyset import encode_cursor
+from .utils.moderation import reject_reservations
+from .utils.permissions import get_roles, is_admin
+from .utils.reservations import (
+    SlotUnavailable,
+    book_slot,
+    hold_slot,
+    move_reservation,
+)
+from .utils.retention import archive, retention_cutoff
+from .utils.rollup import apply_deltas, backfill, chart_series, record_transition
+from .utils.schedule import expand_template, generate_slots, insert_slots
+from .utils.search import search_services
+from .utils.slot_index import CLOSE_HOUR, OPEN_HOUR, DayIndex
+from .utils.slot_import import import_slots
+from .utils.waitlist import close_reservation, join_waitlist
+
+
+def brute_free_points(intervals, lo, hi):
+    return [p for p in range(lo, hi) if not any(s <= p < e for s, e in intervals)]
+
+
+def brute_overlaps(intervals, start, end):
+    if start >= end:
+        return False
+    return any(s < end and start < e for s, e in intervals if s < e)
+
+
+class IntervalSetPropertyTests(SimpleTestCase):
+    """Randomised comparison of IntervalSet with a brute-force reference."""
+
+    runs = 500
+
+    def random_intervals(self, rnd):
+        intervals = []
+        for _ in range(rnd.randint(0, 12)):
+            start = rnd.randint(0, 60)
+            intervals.append((start, start + rnd.randint(0, 15)))
+        return intervals
+
+    def test_overlaps_matches_brute_force(self):
+        rnd = random.Random(4)
+        for _ in range(self.runs):
+            intervals = self.random_intervals(rnd)
+            engine = IntervalSet(intervals)
+            start = rnd.randint(-5, 75)
+            end = start + rnd.randint(0, 20)
+            self.assertEqual(
+                engine.overlaps(start, end),
+                brute_overlaps(intervals, start, end),
+                (intervals, start, end),
+            )
+
+    def test_gaps_match_brute_force(self):
+        rnd = random.Random(5)
+        for _ in range(self.runs):
+            intervals = self.random_intervals(rnd)
+            lo = rnd.randint(-5, 40)
+            hi = lo + rnd.randint(0, 40)
+            gaps = IntervalSet(intervals).gaps(lo, hi)
+
+            points = [p for a, b in gaps for p in range(a, b)]
+            self.assertEqual(points, brute_free_points(intervals, lo, hi))
+            # przerwy są rozłączne, niepuste i nie stykają się
+            for (_, b1), (a2, _) in zip(gaps, gaps[1:]):
+                self.assertLess(b1, a2)
+            self.assertTrue(all(a < b for a, b in gaps))
+
+    def test_grid_matches_brute_force(self):
+        rnd = random.Random(6)
+        for _ in range(self.runs):
+            intervals = self.random_intervals(rnd)
+            lo = rnd.randint(-5, 20)
+            hi = lo + rnd.randint(0, 60)
+            step = rnd.randint(1, 8)
+
+            expected = [
+                (t, t + step)
+                for t in range(lo, hi - step + 1, step)
+                if not brute_overlaps(intervals, t, t + step)
+            ]
+            self.assertEqual(IntervalSet(intervals).grid(lo, hi, step), expected)
+
+    def test_works_with_datetimes(self):
+        base = timezone.make_aware(datetime(2030, 1, 7, 9))
+        h = timedelta(hours=1)
+        engine = IntervalSet([(base + h, base + 3 * h), (base, base + h)])
+        self.assertEqual(list(engine), [(base, base + 3 * h)])
+        self.assertTrue(engine.overlaps(base + 2 * h, base + 4 * h))
+        self.assertEqual(
+            engine.gaps(base, base + 5 * h), [(base + 3 * h, base + 5 * h)]
+        )
+
+
+class DayIndexTests(SimpleTestCase):
+    """Bitmap index of one day: grid boundaries, empty/full days, updates."""
+
+    def setUp(self):
+        self.day = datetime(2030, 1, 7).date()
+        self.index = DayIndex(self.day, 60)
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime.combine(self.day, time(hour, minute)))
+
+    def slot(self, slot_id, hour, minute=0, length=60):
+        start = self.at(hour, minute)
+        return slot_id, start, start + timedelta(minutes=length)
+
+    def test_empty_day(self):
+        self.assertEqual(self.index.cells, CLOSE_HOUR - OPEN_HOUR)
+        self.assertEqual(list(self.index.free_cells()), [])
+        self.assertEqual(self.index.free_slots(), [])
+        self.assertEqual(self.index.taken_slots(), [])
+        self.assertEqual(len(self.index.free_grid()), self.index.cells)
+
+    def test_first_and_last_cells(self):
+        last = CLOSE_HOUR - 1
+        self.index.add_slot(*self.slot(1, OPEN_HOUR))
+        self.index.add_slot(*self.slot(2, last))
+        self.assertEqual(list(self.index.free_cells()), [0, self.index.cells - 1])
+        self.assertEqual([row[0] for row in self.index.free_slots()], [1, 2])
+        # przed otwarciem i od zamknięcia – poza siatką
+        self.assertIsNone(self.index.cell_of(*self.slot(3, OPEN_HOUR - 1)[1:]))
+        self.assertIsNone(self.index.cell_of(*self.slot(3, CLOSE_HOUR)[1:]))
+
+    def test_full_day_and_set_free(self):
+        rows = [
+            self.slot(cell + 1, OPEN_HOUR + cell) + (cell % 2 == 1,)
+            for cell in range(self.index.cells)
+        ]
+        index = DayIndex.build(self.day, 60, rows)
+        self.assertEqual(list(index.free_cells()), list(range(0, index.cells, 2)))
+        self.assertEqual(index.free_grid(), [])
+        self.assertEqual(
+            len(index.free_slots()) + len(index.taken_slots()), index.cells
+        )
+
+        self.assertTrue(index.set_free(*self.slot(2, OPEN_HOUR + 1), True))
+        self.assertTrue(index.contains_free(2, self.at(OPEN_HOUR + 1)))
+        self.assertTrue(index.set_free(*self.slot(1, OPEN_HOUR), False))
+        self.assertFalse(index.contains_free(1, self.at(OPEN_HOUR)))
+        self.assertFalse(index.set_free(*self.slot(99, OPEN_HOUR), True))
+
+    def test_off_grid_slots_go_to_extra(self):
+        self.index.add_slot(*self.slot(1, 10, 30))
+        self.index.add_slot(*self.slot(2, 12, length=30))
+        self.index.add_slot(*self.slot(3, 11), free=False)
+        self.assertEqual(list(self.index.free_cells()), [])
+        self.assertEqual([row[0] for row in self.index.free_slots()], [1, 2])
+        self.assertEqual([row[0] for row in self.index.taken_slots()], [3])
+        self.assertTrue(self.index.set_free(*self.slot(1, 10, 30), False))
+        self.assertFalse(self.index.contains_free(1, self.at(10, 30)))
+        # 10:00–11:00 nachodzi na 10:30–11:30, 11:00–12:00 jest zajęty
+        self.assertNotIn(self.at(10), [start for start, _ in self.index.free_grid()])
+
+
+class StartupCheckTests(SimpleTestCase):
+    """Several workers need a shared broker and a shared cache."""
+
+    def test_single_worker_passes(self):
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "1"}):
+            self.assertEqual(check_shared_backends(), [])
+
+    @override_settings(
+        BOOKING_EVENTS_BROKER="booking.utils.events.InProcessBroker",
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+    )
+    def test_several_workers_need_shared_backends(self):
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "3"}):
+            ids = [e.id for e in check_shared_backends()]
+            self.assertEqual(ids, ["booking.E001", "booking.E002"])
+            with self.assertRaises(ImproperlyConfigured):
+                run_startup_checks()
+            with self.settings(
+                BOOKING_EVENTS_BROKER="booking.utils.events.PostgresBroker",
+                CACHES={
+                    "default": {
+                        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                        "LOCATION": "booking_cache",
+                    }
+                },
+            ):
+                self.assertEqual(check_shared_backends(), [])
+
+    def test_small_cache_is_reported(self):
+        self.assertEqual(check_cache_size(), [])
+        for options in ({}, {"MAX_ENTRIES": 1000}):
+            config = {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "OPTIONS": options,
+            }
+            with self.subTest(options=options):
+                with self.settings(CACHES={"default": config}):
+                    ids = [e.id for e in check_cache_size()]
+                self.assertEqual(ids, ["booking.W001"])
+
+
+class EventBrokerTests(SimpleTestCase):
+    """In-process fan-out and the PostgreSQL listener loop."""
+
+    async def wait_for_subscribers(self, broker, channel, count):
+        for _ in range(200):
+            if len(broker._subscribers.get(channel, ())) == count:
+                return
+            await asyncio.sleep(0.005)
+        self.fail(f"{count} subscribers of {channel} never registered")
+
+    async def test_in_process_fan_out(self):
+        broker = InProcessBroker()
+        streams = [broker.subscribe("a") for _ in range(2)] + [broker.subscribe("b")]
+        pending = [asyncio.ensure_future(anext(stream)) for stream in streams]
+        await self.wait_for_subscribers(broker, "a", 2)
+        await self.wait_for_subscribers(broker, "b", 1)
+
+        # publish() przychodzi z wątku widoku synchronicznego
+        await sync_to_async(broker.publish, thread_sensitive=False)("a", {"id": 1})
+        received = await asyncio.wait_for(asyncio.gather(*pending[:2]), 1)
+        self.assertEqual(received, [{"id": 1}, {"id": 1}])
+        self.assertFalse(pending[2].done())
+
+        pending[2].cancel()
+        await asyncio.gather(pending[2], return_exceptions=True)
+        for stream in streams:
+            await stream.aclose()
+        self.assertEqual(dict(broker._subscribers), {})
+
+    async def test_heartbeat_yields_none(self):
+        stream = InProcessBroker().subscribe("a", heartbeat=0.01)
+        self.assertIsNone(await asyncio.wait_for(anext(stream), 1))
+        await stream.aclose()
+
+    def test_postgres_listener_reconnects_after_errors(self):
+        broker = PostgresBroker()
+        conn = mock.MagicMock()
+        conn.__enter__.return_value = conn
+        conn.notifies.return_value = iter(
+            [
+                mock.Mock(payload="nie-json"),
+                mock.Mock(payload=json.dumps({"channel": "a", "message": 1})),
+            ]
+        )
+        psycopg = mock.Mock()
+        psycopg.connect.side_effect = [OSError("connection refused"), conn]
+        params = {"dbname": "booking", "sslmode": "require"}
+
+        class Stop(Exception):
+            pass
+
+        with (
+            mock.patch.dict("sys.modules", {"psycopg": psycopg}),
+            mock.patch.object(
+                events.connection, "get_connection_params", return_value=params
+            ),
+            mock.patch.object(events.time, "sleep", side_effect=[None, Stop]),
+            mock.patch.object(InProcessBroker, "publish") as publish,
+            self.assertLogs("booking.utils.events") as logs,
+        ):
+            with self.assertRaises(Stop):
+                broker._listen()
+
+        # OPTIONS z DATABASES trafiają do połączenia nasłuchu
+        psycopg.connect.assert_called_with(**params, autocommit=True)
+        self.assertEqual(psycopg.connect.call_count, 2)
+        publish.assert_called_once_with(broker, "a", 1)
+        self.assertEqual(len(logs.records), 2)
+
+
+@override_settings(BOOKING_EVENTS_BROKER="booking.utils.events.InProcessBroker")
+class SlotEventsTests(TransactionTestCase):
+    """The SSE stream delivers "taken"/"freed" once the booking commits."""
+
+    def setUp(self):
+        get_broker.cache_clear()
+        self.addCleanup(get_broker.cache_clear)
+        self.user = User.objects.create_user("klient")
+        self.service = Service.objects.create(name="Masaż", price=100)
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        self.slot = TimeSlot.objects.create(
+            service=self.service, start=start, end=start + timedelta(minutes=30)
+        )
+        self.url = reverse("booking:slot_events", args=[self.service.pk])
+
+    async def next_event(self, events):
+        chunk = await asyncio.wait_for(anext(events), 5)
+        event, data = chunk.decode().strip().split("\n")
+        return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+    async def test_booking_and_cancelling_reach_subscribers(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+        self.assertEqual(await anext(events), b"retry: 5000\n\n")
+        pending = asyncio.ensure_future(self.next_event(events))
+        await EventBrokerTests.wait_for_subscribers(
+            self, get_broker(), service_channel(self.service.pk), 1
+        )
+
+        reservation = await sync_to_async(book_slot)(
+            self.user, self.service, self.slot.pk
+        )
+        self.assertEqual(await pending, ("taken", mock.ANY))
+        self.assertEqual(pending.result()[1]["id"], self.slot.pk)
+
+        await sync_to_async(close_reservation)(
+            reservation, Reservation.Status.CANCELLED
+        )
+        event, data = await self.next_event(events)
+        self.assertEqual((event, data["id"]), ("freed", self.slot.pk))
+        await events.aclose()
+
+    def test_wsgi_answers_no_content(self):
+        self.assertEqual(self.client.get(self.url).status_code, 204)
+
+
+class AdminSlotGeneratorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_user("admin", password="x")
+        admin.groups.add(Group.objects.create(name="Admin"))
+        self.client.force_login(admin)
+        self.service = Service.objects.create(name="Masaż", price=100, slot_duration=30)
+        self.day = timezone.localdate() + timedelta(days=3)
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime.combine(self.day, time(hour, minute)))
+
+    def generated(self):
+        response = self.client.get(
+            reverse("booking:api_get_slots"),
+            {"service_id": self.service.pk, "slot_date": self.day.isoformat()},
+        )
+        return [slot["label"] for slot in response.json()["slots"]]
+
+    def test_overlapping_and_contained_slots_block_candidates(self):
+        # 09:50–11:10 nachodzi na 09:30–10:00 i 11:00–11:30 i zawiera dwa sloty
+        TimeSlot.objects.create(
+            service=self.service, start=self.at(9, 50), end=self.at(11, 10)
+        )
+        # 12:05–12:20 leży w całości wewnątrz kandydata 12:00–12:30
+        TimeSlot.objects.create(
+            service=self.service, start=self.at(12, 5), end=self.at(12, 20)
+        )
+        labels = self.generated()
+        self.assertIn("09:00 - 09:30", labels)
+        for blocked in (
+            "09:30 - 10:00",
+            "10:00 - 10:30",
+            "10:30 - 11:00",
+            "11:00 - 11:30",
+            "12:00 - 12:30",
+        ):
+            self.assertNotIn(blocked, labels)
+        self.assertIn("11:30 - 12:00", labels)
+        self.assertIn("12:30 - 13:00", labels)
+        self.assertEqual(len(labels), 26 - 5)
+
+
+class ScheduleTests(TestCase):
+    """Template expansion, DST change days and repeated generation."""
+
+    def setUp(self):
+        cache.clear()
+        self.service = Service.objects.create(name="Masaż", price=100, slot_duration=30)
+
+    def template(self, **kwargs):
+        fields = {
+            "service": self.service,
+            "weekdays": "02",
+            "start_time": time(9),
+            "end_time": time(10),
+            "valid_from": datetime(2030, 1, 7).date(),
+            "valid_until": datetime(2030, 1, 13).date(),
+        }
+        fields.update(kwargs)
+        return ScheduleTemplate.objects.create(**fields)
+
+    def test_expansion_honours_weekdays_exceptions_and_since(self):
+        # 2030-01-07 to poniedziałek, środa 2030-01-09 jest wyjątkiem
+        template = self.template(exceptions="2030-01-09")
+        since = timezone.make_aware(datetime(2030, 1, 1))
+        starts = [
+            timezone.localtime(start).strftime("%a %H:%M")
+            for _, start, _ in expand_template(template, since)
+        ]
+        self.assertEqual(starts, ["Mon 09:00", "Mon 09:30"])
+
+        since = timezone.make_aware(datetime(2030, 1, 7, 9, 15))
+        self.assertEqual(len(list(expand_template(template, since))), 1)
+
+    def test_dst_change_days(self):
+        since = timezone.make_aware(datetime(2031, 1, 1))
+        # 2031-03-30: 02:00 nie istnieje; 2031-10-26: 02:00–03:00 jest dwa razy
+        for day, expected in (("2031-03-30", 4), ("2031-10-26", 5)):
+            with self.subTest(day=day):
+                date = datetime.fromisoformat(day).date()
+                template = self.template(
+                    weekdays="6",
+                    start_time=time(0),
+                    end_time=time(5),
+                    slot_duration=60,
+                    valid_from=date,
+                    valid_until=date,
+                )
+                slots = [
+                    (start, end) for _, start, end in expand_template(template, since)
+                ]
+                self.assertEqual(len(slots), expected)
+                for start, end in slots:
+                    self.assertEqual(end - start, timedelta(hours=1))
+                for (_, end), (start, _) in zip(slots, slots[1:]):
+                    self.assertLessEqual(end, start)
+
+    def test_repeated_generation_creates_nothing(self):
+        template = self.template(valid_until=datetime(2030, 1, 9).date())
+        first = generate_slots([template])
+        self.assertEqual((first.candidates, first.created, first.skipped), (4, 4, 0))
+        second = generate_slots([template])
+        self.assertEqual((second.candidates, second.created, second.skipped), (4, 0, 4))
+        self.assertEqual(TimeSlot.objects.count(), 4)
+
+    def test_conflicting_rows_are_not_counted(self):
+        # wiersz wstawiony "równolegle" – po sprawdzeniu istniejących terminów
+        start = timezone.make_aware(datetime(2030, 1, 7, 9))
+        end = start + timedelta(minutes=30)
+        TimeSlot.objects.create(service=self.service, start=start, end=end)
+        inserted = insert_slots(
+            [
+                TimeSlot(service=self.service, start=start, end=end),
+                TimeSlot(
+                    service=self.service, start=end, end=end + timedelta(minutes=30)
+                ),
+            ]
+        )
+        self.assertEqual(
+            inserted, {(self.service.pk, end, end + timedelta(minutes=30))}
+        )
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Hundreds of simultaneous bookings of one slot: one winner, no 500s."""
+
+    attempts = 200
+
+    def setUp(self):
+        cache.clear()
+
+    def test_exactly_one_booking_wins(self):
+        service = Service.objects.create(name="Masaż", price=100)
+        start = timezone.now() + timedelta(days=1)
+        slot = TimeSlot.objects.create(
+            service=service, start=start, end=start + timedelta(minutes=30)
+        )
+        url = reverse("booking:reservation_create", args=[service.pk])
+
+        clients = []
+        for i in range(self.attempts):
+            client = Client(raise_request_exception=False)
+            client.force_login(User.objects.create_user(f"user{i}"))
+            clients.append(client)
+
+        barrier = threading.Barrier(self.attempts)
+        statuses = []
+
+        def book(client):
+            try:
+                barrier.wait()
+                statuses.append(client.post(url, {"slot": slot.pk}).status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=book, args=(c,)) for c in clients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(statuses), self.attempts)
+        self.assertEqual(statuses.count(302), 1)
+        self.assertEqual(statuses.count(200), self.attempts - 1)
+        self.assertEqual(Reservation.objects.filter(slot=slot).count(), 1)
+
+
+class AvailabilityCacheTests(TestCase):
+    """Cached day indexes change only after the writing transaction commits."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("klient")
+        self.service = Service.objects.create(name="Masaż", price=100)
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=2)
+        self.slots = [
+            TimeSlot.objects.create(
+                service=self.service,
+                start=self.start + timedelta(minutes=30 * i),
+                end=self.start + timedelta(minutes=30 * (i + 1)),
+            )
+            for i in range(2)
+        ]
+
+    def free_ids(self):
+        rows = get_free_slots_in_range(
+            self.service, self.start, self.start + timedelta(hours=1)
+        )
+        return [row[0] for row in rows]
+
+    def test_index_is_invalidated_on_commit(self):
+        self.assertEqual(self.free_ids(), [s.pk for s in self.slots])
+        with self.captureOnCommitCallbacks() as callbacks:
+            Reservation.objects.create(
+                user=self.user, service=self.service, slot=self.slots[0]
+            )
+            # przed zatwierdzeniem cache nie wie o niezatwierdzonej rezerwacji
+            self.assertEqual(self.free_ids(), [s.pk for s in self.slots])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.free_ids(), [self.slots[1].pk])
+
+    def test_edit_goes_through_the_locked_path(self):
+        other = User.objects.create_user("inny")
+        reservation = Reservation.objects.create(
+            user=self.user, service=self.service, slot=self.slots[0]
+        )
+        taken = TimeSlot.objects.create(
+            service=self.service,
+            start=self.start + timedelta(hours=2),
+            end=self.start + timedelta(hours=2, minutes=30),
+        )
+        Reservation.objects.create(user=other, service=self.service, slot=taken)
+        self.client.force_login(self.user)
+        url = reverse("booking:reservation_edit", args=[reservation.pk])
+
+        response = self.client.post(url, {"slot": taken.pk})
+        self.assertFormError(response.context["form"], "slot", "Termin już zajęty.")
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.slot, self.slots[0])
+
+        response = self.client.post(url, {"slot": self.slots[1].pk})
+        self.assertRedirects(response, reverse("booking:my_reservations"))
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.slot, self.slots[1])
+
+
+class AvailabilityApiTests(TestCase):
+    """Batch availability of many services: structure, limits and ETag."""
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("booking:availability_api")
+        self.day = timezone.localdate() + timedelta(days=2)
+        self.services = [
+            Service.objects.create(name=name, price=100) for name in ("Masaż", "Sauna")
+        ]
+        self.slots = [
+            TimeSlot.objects.create(
+                service=self.services[0], start=self.at(hour), end=self.at(hour, 30)
+            )
+            for hour in (9, 10)
+        ]
+        Reservation.objects.create(
+            user=User.objects.create_user("klient"),
+            service=self.services[0],
+            slot=self.slots[0],
+        )
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime.combine(self.day, time(hour, minute)))
+
+    def get(self, **params):
+        ids = ",".join(str(s.pk) for s in self.services)
+        return self.client.get(
+            self.url,
+            {
+                "services": f"{ids},999999",
+                "from": self.day.isoformat(),
+                "to": (self.day + timedelta(days=1)).isoformat(),
+            },
+            **params,
+        )
+
+    def test_free_slots_grouped_by_service_and_day(self):
+        body = self.get().json()
+        first, second = (str(s.pk) for s in self.services)
+        self.assertEqual(body["from"], self.day.isoformat())
+        self.assertEqual(
+            body["services"],
+            {
+                first: {self.day.isoformat(): [[self.slots[1].pk, "10:00", "10:30"]]},
+                second: {},
+            },
+        )
+        self.assertEqual(body["missing"], [999999])
+
+    def test_limits(self):
+        day = self.day.isoformat()
+        for params in (
+            {},
+            {"services": "x"},
+            {"services": ",".join(map(str, range(1, 52)))},
+            {
+                "services": "1",
+                "from": day,
+                "to": (self.day + timedelta(days=31)).isoformat(),
+            },
+            {
+                "services": "1",
+                "from": day,
+                "to": (self.day - timedelta(days=1)).isoformat(),
+            },
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_full_window_is_served_from_the_cache(self):
+        services = [
+            Service.objects.create(name=f"Usługa {i}", price=10) for i in range(48)
+        ]
+        params = {
+            "services": ",".join(str(s.pk) for s in self.services + services),
+            "from": self.day.isoformat(),
+            "to": (self.day + timedelta(days=30)).isoformat(),
+        }
+        first = self.client.get(self.url, params)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url, params)
+        self.assertEqual(second.json(), first.json())
+        # 50 usług × 31 dni mieści się w cache – bez przebudowy indeksów
+        self.assertFalse(
+            [q for q in queries if 'FROM "booking_timeslot"' in q["sql"]],
+            queries.captured_queries,
+        )
+
+    def test_etag_changes_when_a_slot_is_booked(self):
+        etag = self.get()["ETag"]
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(
+                user=User.objects.create_user("drugi"),
+                service=self.services[0],
+                slot=self.slots[1],
+            )
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["services"][str(self.services[0].pk)], {})
+
+
+class StreamingSlotsTests(TestCase):
+    """``stream=json|ndjson`` of the free-slots API matches the buffered list."""
+
+    def setUp(self):
+        cache.clear()
+        self.service = Service.objects.create(name="Masaż", price=100)
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        self.slots = [
+            TimeSlot.objects.create(
+                service=self.service,
+                start=start + timedelta(minutes=30 * i),
+                end=start + timedelta(minutes=30 * (i + 1)),
+            )
+            for i in range(5)
+        ]
+        user = User.objects.create_user("klient")
+        Reservation.objects.create(user=user, service=self.service, slot=self.slots[1])
+        SlotHold.objects.create(
+            slot=self.slots[2],
+            user=user,
+            expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        self.url = reverse("booking:free_slots_api", args=[self.service.pk])
+        self.params = {
+            "start": start.isoformat(),
+            "end": (start + timedelta(days=1)).isoformat(),
+        }
+
+    def test_json_stream_matches_buffered_response(self):
+        buffered = self.client.get(self.url, self.params)
+        self.assertFalse(buffered.streaming)
+        self.assertEqual(
+            [row["id"] for row in buffered.json()],
+            [self.slots[i].pk for i in (0, 3, 4)],
+        )
+
+        response = self.client.get(self.url, {**self.params, "stream": "json"})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/json")
+        body = b"".join(response.streaming_content)
+        self.assertEqual(json.loads(body), buffered.json())
+
+    async def test_stream_is_async_under_asgi(self):
+        def wsgi_stream():
+            response = self.client.get(self.url, {**self.params, "stream": "json"})
+            return b"".join(response.streaming_content)
+
+        expected = await sync_to_async(wsgi_stream)()
+        response = await self.async_client.get(
+            self.url, {**self.params, "stream": "json"}
+        )
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(body, expected)
+
+    async def test_asgi_response_pulls_chunks_lazily(self):
+        produced = []
+
+        def items():
+            for i in range(5):
+                produced.append(i)
+                yield i
+
+        request = AsyncRequestFactory().get("/")
+        response = streaming.streaming_json_response(
+            items(), "ndjson", chunk_size=2, request=request
+        )
+        self.assertTrue(response.is_async)
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b"0\n1\n")
+        self.assertEqual(produced, [0, 1])
+        self.assertEqual([c async for c in chunks], [b"2\n3\n", b"4\n"])
+
+        # pod WSGI zwykły, synchroniczny strumień
+        response = streaming.streaming_json_response(
+            items(), request=RequestFactory().get("/")
+        )
+        self.assertFalse(response.is_async)
+
+    def test_chunks_join_into_valid_json(self):
+        for size in (1, 2, 5, 6):
+            with self.subTest(chunk_size=size):
+                chunks = list(streaming.iter_json_array(range(5), chunk_size=size))
+                self.assertEqual(json.loads("".join(chunks)), list(range(5)))
+                chunks = list(streaming.iter_ndjson(range(5), chunk_size=size))
+                self.assertEqual("".join(chunks), "0\n1\n2\n3\n4\n")
+
+    def test_ndjson_stream_has_one_object_per_line(self):
+        response = self.client.get(self.url, {**self.params, "stream": "ndjson"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)["id"] for line in lines],
+            [self.slots[i].pk for i in (0, 3, 4)],
+        )
+
+    def test_empty_stream_and_unknown_format(self):
+        Reservation.objects.all().delete()
+        TimeSlot.objects.all().delete()
+        response = self.client.get(self.url, {**self.params, "stream": "json"})
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), [])
+        response = self.client.get(self.url, {**self.params, "stream": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_benchmark_availability_runs_and_rolls_back(self):
+        out = StringIO()
+        call_command("benchmark_availability", days=2, repeat=2, stdout=out)
+        output = out.getvalue()
+        self.assertIn("free slots: index built from DB", output)
+        self.assertIn("admin generator: index", output)
+        self.assertFalse(Service.objects.filter(name="__benchmark__").exists())
+
+
+class HoldExpiryTests(TestCase):
+    """An expiring hold frees its slot without any write: ETag and index TTL."""
+
+    def setUp(self):
+        cache.clear()
+        self.service = Service.objects.create(name="Masaż", price=100)
+        start = timezone.now().replace(microsecond=0) + timedelta(days=2)
+        self.slot = TimeSlot.objects.create(
+            service=self.service, start=start, end=start + timedelta(minutes=30)
+        )
+        self.url = reverse("booking:free_slots_api", args=[self.service.pk])
+        self.params = {
+            "start": (start - timedelta(hours=1)).isoformat(),
+            "end": (start + timedelta(hours=1)).isoformat(),
+        }
+
+    def test_expired_hold_changes_etag_and_frees_the_slot(self):
+        SlotHold.objects.create(
+            slot=self.slot,
+            user=User.objects.create_user("klient"),
+            expires_at=timezone.now() + timedelta(seconds=1),
+        )
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.json(), [])
+        etag = response["ETag"]
+        self.assertEqual(
+            self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag).status_code,
+            304,
+        )
+
+        # zegar aplikacji i cache o dwie sekundy później – bez czekania
+        now, wall = timezone.now(), time_module.time()
+        with (
+            mock.patch(
+                "django.utils.timezone.now", return_value=now + timedelta(seconds=2)
+            ),
+            mock.patch("time.time", return_value=wall + 2),
+        ):
+            response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["id"] for row in response.json()], [self.slot.pk])
+
+    def test_views_sweep_expired_holds(self):
+        SlotHold.objects.create(
+            slot=self.slot,
+            user=User.objects.create_user("klient"),
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        self.client.get(self.url, self.params)
+        self.assertFalse(SlotHold.objects.exists())
+
+    def test_own_hold_is_free_for_its_user(self):
+        holder = User.objects.create_user("klient")
+        hold_slot(holder, self.service, self.slot.pk)
+        params = {**self.params, "taken": "1"}
+
+        self.client.force_login(User.objects.create_user("inny"))
+        rows = self.client.get(self.url, params).json()
+        self.assertEqual(
+            [(r["id"], r.get("taken")) for r in rows], [(self.slot.pk, True)]
+        )
+
+        # właściciel blokady nie trafia na listę oczekujących
+        self.client.force_login(holder)
+        for query in (params, {}):
+            rows = self.client.get(self.url, query).json()
+            self.assertEqual(
+                [(r["id"], r.get("taken")) for r in rows], [(self.slot.pk, None)]
+            )
+        response = self.client.get(self.url, {"stream": "ndjson"})
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], [self.slot.pk])
+
+
+class WaitlistTests(TestCase):
+    """FIFO waitlist for taken slots, promoted when the slot is freed."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user("wlasciciel")
+        self.waiting = [User.objects.create_user(f"czeka{i}") for i in range(3)]
+        self.service = Service.objects.create(name="Masaż", price=100)
+        start = timezone.now().replace(microsecond=0) + timedelta(days=2)
+        self.slot = TimeSlot.objects.create(
+            service=self.service, start=start, end=start + timedelta(minutes=30)
+        )
+        self.reservation = Reservation.objects.create(
+            user=self.owner, service=self.service, slot=self.slot
+        )
+
+    def join_all(self):
+        return [
+            join_waitlist(user, self.service, self.slot.pk)[1] for user in self.waiting
+        ]
+
+    def test_positions_are_fifo_and_joining_twice_keeps_the_place(self):
+        self.assertEqual(self.join_all(), [1, 2, 3])
+        self.assertEqual(
+            join_waitlist(self.waiting[1], self.service, self.slot.pk)[1], 2
+        )
+        self.assertEqual(WaitlistEntry.objects.count(), 3)
+        with self.assertRaises(SlotUnavailable):
+            join_waitlist(self.owner, self.service, self.slot.pk)
+
+    def test_moving_a_reservation_promotes_the_queue_of_the_old_slot(self):
+        self.join_all()
+        other = TimeSlot.objects.create(
+            service=self.service,
+            start=self.slot.end,
+            end=self.slot.end + timedelta(minutes=30),
+        )
+        moved = move_reservation(self.reservation.pk, self.owner, other.pk)
+        self.assertEqual(moved.slot, other)
+        promoted = Reservation.objects.get(slot=self.slot)
+        self.assertEqual(promoted.user, self.waiting[0])
+        self.assertEqual(promoted.status, Reservation.Status.PENDING)
+        self.assertEqual(WaitlistEntry.objects.filter(slot=self.slot).count(), 2)
+
+    def test_cancel_promotes_the_head_of_the_queue(self):
+        self.join_all()
+        promoted = close_reservation(self.reservation, Reservation.Status.CANCELLED)
+        self.assertEqual(promoted.user, self.waiting[0])
+        self.assertEqual(promoted.slot, self.slot)
+        self.assertEqual(promoted.status, Reservation.Status.PENDING)
+
+        promoted = close_reservation(promoted, Reservation.Status.REJECTED)
+        self.assertEqual(promoted.user, self.waiting[1])
+        self.assertEqual(
+            list(WaitlistEntry.objects.values_list("user", flat=True)),
+            [self.waiting[2].pk],
+        )
+
+    def test_bulk_reject_promotes_too(self):
+        self.join_all()
+        self.assertEqual(reject_reservations([self.reservation.pk]), (1, 1))
+        self.assertEqual(Reservation.objects.get(slot=self.slot).user, self.waiting[0])
+
+    def test_calendar_shows_taken_slots(self):
+        self.client.force_login(self.waiting[0])
+        url = reverse("booking:free_slots_api", args=[self.service.pk])
+        params = {
+            "start": (self.slot.start - timedelta(hours=1)).isoformat(),
+            "end": (self.slot.start + timedelta(hours=1)).isoformat(),
+        }
+        self.assertEqual(self.client.get(url, params).json(), [])
+        rows = self.client.get(url, {**params, "taken": 1}).json()
+        self.assertEqual(
+            [(r["id"], r.get("taken")) for r in rows], [(self.slot.pk, True)]
+        )
+
+        response = self.client.post(
+            reverse("booking:slot_waitlist", args=[self.service.pk, self.slot.pk])
+        )
+        self.assertEqual(response.json(), {"slot": self.slot.pk, "position": 1})
+
+
+class BulkModerationTests(TestCase):
+    """Bulk approve/reject: final state, rollup counts and availability."""
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_user("admin", password="x")
+        admin.groups.add(Group.objects.create(name="Admin"))
+        self.client.force_login(admin)
+        self.service = Service.objects.create(name="Masaż", price=100)
+        self.today = timezone.localdate()
+        self.day_start = timezone.make_aware(
+            datetime.combine(self.today + timedelta(days=3), time(0))
+        )
+        self.slots = [
+            TimeSlot.objects.create(
+                service=self.service,
+                start=self.day_start + timedelta(hours=9 + i),
+                end=self.day_start + timedelta(hours=9 + i, minutes=30),
+            )
+            for i in range(3)
+        ]
+        self.reservations = [
+            Reservation.objects.create(
+                user=User.objects.create_user(f"klient{i}"),
+                service=self.service,
+                slot=slot,
+            )
+            for i, slot in enumerate(self.slots)
+        ]
+
+    def bulk(self, action, reservations):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse("booking:admin_reservations_bulk"),
+                {"action": action, "ids": [r.pk for r in reservations]},
+            )
+
+    def free_ids(self):
+        return [
+            slot_id
+            for slot_id, _, _ in get_free_slots_in_range(
+                self.service, self.day_start, self.day_start + timedelta(days=1)
+            )
+        ]
+
+    def counts(self):
+        return {
+            row.status: row.count
+            for row in ReservationDailyStat.objects.filter(day=self.today)
+        }
+
+    def test_bulk_approve(self):
+        self.assertEqual(self.bulk("approve", self.reservations[:2]).status_code, 302)
+        statuses = [Reservation.objects.get(pk=r.pk).status for r in self.reservations]
+        self.assertEqual(statuses, ["approved", "approved", "pending"])
+        self.assertEqual(self.counts(), {"pending": 1, "approved": 2})
+        self.assertEqual(self.free_ids(), [])
+
+    def test_bulk_reject_frees_slots_in_the_cached_index(self):
+        # indeks dnia w cache zanim sloty zostaną zwolnione
+        self.assertEqual(self.free_ids(), [])
+        self.bulk("approve", self.reservations[2:])
+        self.bulk("reject", self.reservations)
+
+        for reservation, slot in zip(self.reservations, self.slots):
+            reservation.refresh_from_db()
+            if reservation.pk == self.reservations[2].pk:
+                # zatwierdzonej nie odrzuca się zbiorczo
+                self.assertEqual(reservation.status, "approved")
+                self.assertEqual(reservation.slot, slot)
+                continue
+            self.assertEqual(reservation.status, "rejected")
+            self.assertIsNone(reservation.slot)
+            self.assertEqual(reservation.archived_start, slot.start)
+            self.assertEqual(reservation.archived_end, slot.end)
+        self.assertEqual(self.counts(), {"pending": 0, "approved": 1, "rejected": 2})
+        self.assertEqual(self.free_ids(), [slot.pk for slot in self.slots[:2]])
+
+    def test_bulk_reject_promotes_the_waitlist(self):
+        waiting = User.objects.create_user("czeka")
+        join_waitlist(waiting, self.service, self.slots[0].pk)
+        self.bulk("reject", self.reservations[:1])
+        promoted = Reservation.objects.get(slot=self.slots[0])
+        self.assertEqual(promoted.user, waiting)
+        self.assertEqual(promoted.status, "pending")
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.assertEqual(self.free_ids(), [])
+
+    def test_bulk_counts_only_the_rows_it_changed(self):
+        lock_pending = moderation._lock_pending
+
+        def cancelled_meanwhile(ids):
+            # równoległe anulowanie tuż przed blokadą
+            close_reservation(self.reservations[0], Reservation.Status.CANCELLED)
+            return lock_pending(ids)
+
+        with mock.patch.object(moderation, "_lock_pending", cancelled_meanwhile):
+            self.bulk("approve", self.reservations)
+        self.assertEqual(self.counts(), {"pending": 0, "approved": 2, "cancelled": 1})
+        self.assertEqual(Reservation.objects.filter(status="approved").count(), 2)
+
+
+class CartBookingTests(TestCase):
+    """Booking several slots in one all-or-nothing request."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("klient", password="x")
+        self.client.force_login(self.user)
+        self.service = Service.objects.create(name="Masaż", price=100)
+        start = timezone.now().replace(microsecond=0) + timedelta(days=2)
+        self.slots = [
+            TimeSlot.objects.create(
+                service=self.service,
+                start=start + timedelta(minutes=30 * i),
+                end=start + timedelta(minutes=30 * (i + 1)),
+            )
+            for i in range(4)
+        ]
+        self.url = reverse("booking:reservation_cart", args=[self.service.pk])
+
+    def test_books_all_slots(self):
+        ids = [slot.pk for slot in self.slots[:3]]
+        response = self.client.post(self.url, {"slots": ids})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(row["slot"] for row in response.json()["reservations"]), ids
+        )
+        self.assertEqual(
+            sorted(
+                Reservation.objects.filter(
+                    user=self.user, status=Reservation.Status.PENDING
+                ).values_list("slot_id", flat=True)
+            ),
+            ids,
+        )
+
+    def test_conflict_books_nothing_and_lists_the_slots(self):
+        Reservation.objects.create(
+            user=User.objects.create_user("inny"),
+            service=self.service,
+            slot=self.slots[1],
+        )
+        other = Service.objects.create(name="Sauna", price=50)
+        foreign = TimeSlot.objects.create(
+            service=other, start=self.slots[0].start, end=self.slots[0].end
+        )
+        response = self.client.post(
+            self.url,
+            json.dumps({"slots": [self.slots[0].pk, self.slots[1].pk, foreign.pk]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            response.json()["conflicts"], sorted([self.slots[1].pk, foreign.pk])
+        )
+        self.assertFalse(Reservation.objects.filter(user=self.user).exists())
+
+    def test_invalid_input(self):
+        for data, status in (
+            ({"slots": ["x"]}, 400),
+            ({"slots": list(range(1, 26))}, 400),
+            ({}, 409),
+        ):
+            with self.subTest(data=data):
+                response = self.client.post(self.url, data)
+                self.assertEqual(response.status_code, status)
+                self.assertFalse(Reservation.objects.filter(user=self.user).exists())
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class DashboardStatsTests(TestCase):
+    """Dashboard counts, their short-lived cache and the pending pages."""
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_user("admin", password="x")
+        admin.groups.add(Group.objects.create(name="Admin"))
+        self.client.force_login(admin)
+        self.url = reverse("booking:admin_dashboard")
+        self.service = Service.objects.create(name="Masaż", price=100)
+        Service.objects.create(name="Sauna", price=50)
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        user = User.objects.create_user("klient")
+        statuses = ["pending"] * 22 + ["approved"] * 2 + ["cancelled"]
+        for i, status in enumerate(statuses):
+            slot = TimeSlot.objects.create(
+                service=self.service,
+                start=start + timedelta(minutes=30 * i),
+                end=start + timedelta(minutes=30 * (i + 1)),
+            )
+            Reservation.objects.create(
+                user=user, service=self.service, slot=slot, status=status
+            )
+        TimeSlot.objects.filter(pk=slot.pk).update(is_active=False)
+
+    def test_counts(self):
+        stats = self.client.get(self.url).context["stats"]
+        self.assertEqual(
+            {k: stats[k] for k in ("all", "pending", "approved", "cancelled")},
+            {"all": 25, "pending": 22, "approved": 2, "cancelled": 1},
+        )
+        self.assertEqual(stats["rejected"], 0)
+        self.assertEqual((stats["services"], stats["slots_active"]), (2, 24))
+
+    def test_stats_are_cached_until_a_reservation_changes(self):
+        self.client.get(self.url)
+        # nowa usługa nie czyści statystyk – odświeżą się po STATS_TIMEOUT
+        Service.objects.create(name="Fryzjer", price=80)
+        self.assertEqual(self.client.get(self.url).context["stats"]["services"], 2)
+
+        reservation = Reservation.objects.filter(status="pending").first()
+        reservation.status = Reservation.Status.APPROVED
+        with self.captureOnCommitCallbacks() as callbacks:
+            reservation.save()
+            # przed commitem odczyt wciąż widzi stary wpis – i go nie nadpisze
+            stats = self.client.get(self.url).context["stats"]
+            self.assertEqual(stats["approved"], 2)
+        for callback in callbacks:
+            callback()
+        stats = self.client.get(self.url).context["stats"]
+        self.assertEqual((stats["pending"], stats["approved"]), (21, 3))
+        self.assertEqual(stats["services"], 3)
+
+    def test_pending_count_matches_the_pending_list(self):
+        # oczekująca rezerwacja z dawno minionym terminem trafia do archiwum
+        start = timezone.now() - timedelta(days=200)
+        slot = TimeSlot.objects.create(
+            service=self.service, start=start, end=start + timedelta(minutes=30)
+        )
+        Reservation.objects.create(
+            user=User.objects.get(username="klient"), service=self.service, slot=slot
+        )
+        archive(retention_cutoff())
+        response = self.client.get(self.url)
+        stats = response.context["stats"]
+        self.assertEqual(stats["pending"], response.context["pending"].paginator.count)
+        self.assertEqual(stats["pending"], 22)
+        self.assertEqual(stats["all"], 26)
+
+    def test_pending_list_is_paginated(self):
+        first = self.client.get(self.url).context["pending"]
+        self.assertEqual(len(first.object_list), 20)
+        self.assertEqual(first.paginator.count, 22)
+        second = self.client.get(self.url, {"page": 2}).context["pending"]
+        self.assertEqual(len(second.object_list), 2)
+
+
+class IdempotencyTests(TestCase):
+    """Keys stored in the database: replays, key reuse, POST-only actions."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("klient", password="x")
+        self.client.force_login(self.user)
+        self.service = Service.objects.create(name="Masaż", price=100)
+        start = timezone.now().replace(microsecond=0) + timedelta(days=2)
+        self.slots = [
+            TimeSlot.objects.create(
+                service=self.service,
+                start=start + timedelta(minutes=30 * i),
+                end=start + timedelta(minutes=30 * (i + 1)),
+            )
+            for i in range(2)
+        ]
+        self.cart_url = reverse("booking:reservation_cart", args=[self.service.pk])
+
+    def test_repeated_key_replays_without_running_the_view(self):
+        reservation = Reservation.objects.create(
+            user=self.user, service=self.service, slot=self.slots[0]
+        )
+        url = reverse("booking:reservation_cancel", args=[reservation.pk])
+        first = self.client.post(url, {"idempotency_key": "k1"})
+        self.assertEqual(first.status_code, 302)
+        Reservation.objects.filter(pk=reservation.pk).update(
+            status=Reservation.Status.PENDING
+        )
+
+        # klucze są w bazie – wyczyszczony cache ich nie gubi
+        cache.clear()
+        second = self.client.post(url, {"idempotency_key": "k1"})
+        self.assertEqual(second.status_code, 302)
+        self.assertEqual(second["Location"], first["Location"])
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, Reservation.Status.PENDING)
+
+    def test_key_reused_with_other_data_is_rejected(self):
+        first = self.client.post(
+            self.cart_url, {"slots": [self.slots[0].pk], "idempotency_key": "k2"}
+        )
+        self.assertEqual(first.status_code, 201)
+        second = self.client.post(
+            self.cart_url, {"slots": [self.slots[1].pk], "idempotency_key": "k2"}
+        )
+        self.assertEqual(second.status_code, 422)
+        self.assertFalse(Reservation.objects.filter(slot=self.slots[1]).exists())
+
+    def test_expired_key_runs_the_view_again(self):
+        self.client.post(
+            self.cart_url, {"slots": [self.slots[0].pk], "idempotency_key": "k3"}
+        )
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        response = self.client.post(
+            self.cart_url, {"slots": [self.slots[1].pk], "idempotency_key": "k3"}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_state_changing_actions_reject_get(self):
+        reservation = Reservation.objects.create(
+            user=self.user, service=self.service, slot=self.slots[0]
+        )
+        url = reverse("booking:reservation_cancel", args=[reservation.pk])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.user.groups.add(Group.objects.create(name="Admin"))
+        for name in ("booking:admin_approve", "booking:admin_reject"):
+            response = self.client.get(reverse(name, args=[reservation.pk]))
+            self.assertEqual(response.status_code, 405)
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, Reservation.Status.PENDING)
+
+
+class SlotAdminListTests(TestCase):
+    """Keyset-paginated slot list: constant queries per page, filters."""
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_user("admin", password="x")
+        admin.groups.add(Group.objects.create(name="Admin"))
+        self.client.force_login(admin)
+        self.services = [
+            Service.objects.create(name=f"Usługa {i}", price=100) for i in range(3)
+        ]
+        base = timezone.make_aware(datetime(2030, 1, 7, 9))
+        for i in range(130):
+            start = base + timedelta(minutes=30 * i)
+            TimeSlot.objects.create(
+                service=self.services[i % 3],
+                start=start,
+                end=start + timedelta(minutes=30),
+                is_active=i % 5 != 0,
+            )
+
+    def walk(self, params=None, expected_queries=None):
+        """Follow "next" cursors to the end; return the slot ids seen."""
+        url = reverse("booking:admin_slots")
+        params = dict(params or {})
+        seen = []
+        while True:
+            if expected_queries is None:
+                response = self.client.get(url, params)
+            else:
+                with self.assertNumQueries(expected_queries):
+                    response = self.client.get(url, params)
+            page = response.context["page_obj"]
+            seen.extend(slot.pk for slot in page)
+            if not page.has_next():
+                return seen
+            params["after"] = page.next_cursor
+
+    def test_query_count_does_not_depend_on_page(self):
+        # role trafiają do cache przy pierwszym żądaniu
+        self.client.get(reverse("booking:admin_slots"))
+        # sesja, użytkownik, strona terminów z usługami, lista usług do filtra
+        seen = self.walk(expected_queries=4)
+        expected = list(
+            TimeSlot.objects.order_by("start", "id").values_list("pk", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_the_same_page(self):
+        url = reverse("booking:admin_slots")
+        first = self.client.get(url).context["page_obj"]
+        second = self.client.get(url, {"after": first.next_cursor}).context["page_obj"]
+        back = self.client.get(url, {"before": second.previous_cursor}).context[
+            "page_obj"
+        ]
+        self.assertEqual([s.pk for s in back], [s.pk for s in first])
+        self.assertFalse(back.has_previous())
+
+    def test_filters(self):
+        service = self.services[1]
+        seen = self.walk(
+            {
+                "service": service.pk,
+                "active": "1",
+                "date_from": "2030-01-08",
+                "date_to": "2030-01-08",
+            }
+        )
+        expected = TimeSlot.objects.filter(
+            service=service,
+            is_active=True,
+            start__gte=timezone.make_aware(datetime(2030, 1, 8)),
+            start__lt=timezone.make_aware(datetime(2030, 1, 9)),
+        ).order_by("start", "id")
+        self.assertTrue(seen)
+        self.assertEqual(seen, list(expected.values_list("pk", flat=True)))
+
+
+class ReservationAdminListTests(TestCase):
+    """Cursor-paginated reservation list ordered by (created_at, id)."""
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_user("admin", password="x")
+        admin.groups.add(Group.objects.create(name="Admin"))
+        self.client.force_login(admin)
+        self.users = [User.objects.create_user(f"klient{i}") for i in range(2)]
+        self.services = [
+            Service.objects.create(name=f"Usługa {i}", price=100) for i in range(2)
+        ]
+        base = timezone.make_aware(datetime(2030, 1, 7, 9))
+        created = timezone.make_aware(datetime(2029, 12, 1, 12))
+        for i in range(45):
+            start = base + timedelta(hours=i)
+            service = self.services[i % 2]
+            slot = TimeSlot.objects.create(
+                service=service, start=start, end=start + timedelta(minutes=30)
+            )
+            Reservation.objects.create(
+                user=self.users[i % 2],
+                service=service,
+                slot=slot,
+                # co trzy rezerwacje ten sam created_at – remisy rozstrzyga id
+                created_at=created + timedelta(minutes=i // 3),
+                status=(
+                    Reservation.Status.APPROVED
+                    if i % 3 == 0
+                    else Reservation.Status.PENDING
+                ),
+            )
+
+    def walk(self, params=None):
+        url = reverse("booking:admin_reservations")
+        params = dict(params or {})
+        seen = []
+        while True:
+            page = self.client.get(url, params).context["page_obj"]
+            seen.extend(r.pk for r in page)
+            if not page.has_next():
+                return seen
+            params["after"] = page.next_cursor
+
+    def test_walks_all_reservations_newest_first(self):
+        expected = Reservation.objects.order_by("-created_at", "-id")
+        self.assertEqual(self.walk(), list(expected.values_list("pk", flat=True)))
+
+    def test_filters(self):
+        params = {
+            "status": Reservation.Status.PENDING,
+            "service": self.services[0].pk,
+            "user": "klient0",
+            "date_from": "2030-01-07",
+            "date_to": "2030-01-07",
+        }
+        expected = Reservation.objects.filter(
+            status=Reservation.Status.PENDING,
+            service=self.services[0],
+            user=self.users[0],
+            slot__start__lt=timezone.make_aware(datetime(2030, 1, 8)),
+        ).order_by("-created_at", "-id")
+        self.assertTrue(expected.exists())
+        self.assertEqual(self.walk(params), list(expected.values_list("pk", flat=True)))
+
+    def test_export_streams_filtered_rows(self):
+        url = reverse("booking:admin_reservations_export")
+        params = {"status": Reservation.Status.APPROVED, "user": "klient1"}
+        expected = list(
+            Reservation.objects.filter(
+                status=Reservation.Status.APPROVED, user=self.users[1]
+            )
+            .order_by("created_at", "id")
+            .values_list("pk", flat=True)
+        )
+
+        response = self.client.get(url, params)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "created_at", "status"])
+        self.assertEqual([int(line.split(",")[0]) for line in lines[1:]], expected)
+
+        response = self.client.get(url, {**params, "format": "ndjson"})
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual([row["id"] for row in rows], expected)
+        self.assertEqual({row["user"] for row in rows}, {"klient1"})
+
+    async def test_export_streams_under_asgi(self):
+        # pod ASGI odpowiedź jest asynchroniczna – serwer nie zbiera jej w liście
+        url = reverse("booking:admin_reservations_export")
+
+        def wsgi_export():
+            return b"".join(self.client.get(url).streaming_content)
+
+        expected = await sync_to_async(wsgi_export)()
+
+        admin = await User.objects.aget(username="admin")
+        await self.async_client.aforce_login(admin)
+        response = await self.async_client.get(url)
+        self.assertTrue(response.is_async)
+        self.assertEqual(
+            b"".join([c async for c in response.streaming_content]), expected
+        )
+
+
+class SlotImportTests(TestCase):
+    """CSV slot import: chunked validation, duplicates, rejected rows."""
+
+    def setUp(self):
+        cache.clear()
+        self.service = Service.objects.create(name="Masaż", price=100)
+        TimeSlot.objects.create(
+            service=self.service,
+            start=timezone.make_aware(datetime(2030, 1, 7, 9)),
+            end=timezone.make_aware(datetime(2030, 1, 7, 9, 30)),
+        )
+        self.csv = (
+            "service,start,end\n"
+            f"{self.service.pk},2030-01-07 09:00,2030-01-07 09:30\n"
+            "Masaż,2030-01-07 09:30,2030-01-07 10:00\n"
+            "masaż,2030-01-07 09:30,2030-01-07 10:00\n"
+            "Masaż,2030-01-07 11:00,2030-01-07 10:00\n"
+            "Fryzjer,2030-01-07 11:00,2030-01-07 11:30\n"
+            "Masaż,jutro,2030-01-07 11:30\n"
+            "Masaż,2030-01-07T12:00:00+00:00,2030-01-07T12:30:00+00:00\n"
+        )
+
+    def test_import_reports_rejected_rows(self):
+        result = import_slots(self.csv.splitlines(), chunk_size=3)
+        self.assertEqual(result.rows, 7)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, _ in result.rejected], [2, 4, 5, 6, 7])
+        self.assertEqual(TimeSlot.objects.count(), 3)
+        # daty bez strefy trafiają do strefy projektu, jak w TimeSlot.clean
+        self.assertTrue(
+            TimeSlot.objects.filter(
+                start=timezone.make_aware(datetime(2030, 1, 7, 9, 30))
+            ).exists()
+        )
+
+    def test_slot_added_concurrently_is_rejected(self):
+        real_insert = slot_import.insert_slots
+
+        def insert_after_concurrent_add(slots, batch_size):
+            # ktoś dodaje ten sam termin po sprawdzeniu istniejących
+            TimeSlot.objects.create(
+                service=self.service,
+                start=timezone.make_aware(datetime(2030, 1, 7, 9, 30)),
+                end=timezone.make_aware(datetime(2030, 1, 7, 10)),
+            )
+            return real_insert(slots, batch_size)
+
+        with mock.patch.object(
+            slot_import, "insert_slots", side_effect=insert_after_concurrent_add
+        ):
+            result = import_slots(self.csv.splitlines())
+        self.assertEqual(result.created, 1)
+        self.assertEqual(
+            result.rejected[1], (3, "Taki termin już istnieje."), result.rejected
+        )
+        self.assertEqual(TimeSlot.objects.count(), 3)
+
+    def test_admin_upload(self):
+        admin = User.objects.create_user("admin", password="x")
+        admin.groups.add(Group.objects.create(name="Admin"))
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile("sloty.csv", self.csv.encode("utf-8-sig"))
+        response = self.client.post(
+            reverse("booking:admin_slots_import"), {"file": upload, "dry_run": "on"}
+        )
+        self.assertEqual(response.status_code, 200)
+        result = response.context["result"]
+        self.assertEqual((result.rows, result.created), (7, 2))
+        self.assertEqual(TimeSlot.objects.count(), 1)
+
+
+class RoleCacheTests(TestCase):
+    """Roles memoised per request and cached per user until groups change."""
+
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(name="Admin")
+        self.user = User.objects.create_user("admin", password="x")
+        self.user.groups.add(self.group)
+
+    def fresh_user(self):
+        # nowy obiekt – jak request.user w kolejnym żądaniu
+        return User.objects.get(pk=self.user.pk)
+
+    def test_cached_hit_costs_no_queries(self):
+        self.assertTrue(is_admin(self.fresh_user()))
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(is_admin(user))
+            self.assertEqual(get_roles(user), {"Admin"})
+
+    def test_memoised_per_request(self):
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            is_admin(user)
+            cache.clear()
+            is_admin(user)
+
+    def test_membership_changes_invalidate(self):
+        self.assertTrue(is_admin(self.fresh_user()))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.group)
+        self.assertFalse(is_admin(self.fresh_user()))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.user_set.add(self.user)
+        self.assertTrue(is_admin(self.fresh_user()))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.user_set.clear()
+        self.assertFalse(is_admin(self.fresh_user()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.group)
+        self.assertTrue(is_admin(self.fresh_user()))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.name = "Obsługa"
+            self.group.save()
+        self.assertFalse(is_admin(self.fresh_user()))
+
+    def test_invalidated_only_after_commit(self):
+        self.assertTrue(is_admin(self.fresh_user()))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.groups.remove(self.group)
+            # niezatwierdzona zmiana – cache nadal trzyma stare role
+            self.assertTrue(is_admin(self.fresh_user()))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(is_admin(self.fresh_user()))
+
+    def test_admin_page_checks_role_once(self):
+        self.client.force_login(self.user)
+        url = reverse("booking:admin_services")
+        # sesja, użytkownik, role (brak w cache), lista usług
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertTrue(response.context["is_admin"])
+        # kolejne żądanie: role z cache
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+
+class ServiceSearchTests(TestCase):
+    """Full-text service search kept in sync with Service rows."""
+
+    def setUp(self):
+        self.massage = Service.objects.create(
+            name="Masaż relaksacyjny", description="Olejki i gorące kamienie", price=1
+        )
+        self.haircut = Service.objects.create(
+            name="Strzyżenie", description="Po strzyżeniu krótki masaż głowy", price=1
+        )
+        Service.objects.create(name="Manicure", description="Hybryda", price=1)
+
+    def names(self, query):
+        return [s.name for s in search_services(query)]
+
+    def test_ranked_prefix_matches(self):
+        # trafienie w nazwie przed trafieniem w opisie
+        self.assertEqual(self.names("masaż"), ["Masaż relaksacyjny", "Strzyżenie"])
+        prefix = self.names("ma")
+        self.assertEqual(set(prefix[:2]), {"Manicure", "Masaż relaksacyjny"})
+        self.assertEqual(prefix[2:], ["Strzyżenie"])
+        self.assertEqual(self.names("relaks"), ["Masaż relaksacyjny"])
+        self.assertEqual(self.names("masaż głowy"), ["Strzyżenie"])
+        self.assertEqual(self.names("!!"), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.massage.name = "Refleksologia"
+        self.massage.save()
+        self.assertEqual(self.names("refleks"), ["Refleksologia"])
+        self.assertEqual(self.names("relaks"), [])
+        self.haircut.delete()
+        self.assertEqual(self.names("masaż"), [])
+
+    def test_suggest_endpoint(self):
+        response = self.client.get(reverse("booking:api_service_suggest"), {"q": "str"})
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {
+                    "id": self.haircut.pk,
+                    "name": "Strzyżenie",
+                    "url": reverse("booking:service_detail", args=[self.haircut.pk]),
+                }
+            ],
+        )
+        response = self.client.get(reverse("booking:service_list"), {"q": "mani"})
+        self.assertEqual(
+            [s.name for s in response.context["object_list"]], ["Manicure"]
+        )
+
+
+class CatalogCacheTests(TestCase):
+    """Versioned catalog cache: warm pages skip the database."""
+
+    def setUp(self):
+        cache.clear()
+        self.service = Service.objects.create(
+            name="Masaż", description="Relaks", price=100
+        )
+        Service.objects.create(name="Manicure", price=80)
+
+    def test_warm_pages_run_no_queries(self):
+        for url in (
+            reverse("booking:service_list"),
+            reverse("booking:service_detail", args=[self.service.pk]),
+        ):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertContains(response, "Masaż")
+            self.assertIn("public", response["Cache-Control"])
+            self.assertIn("max-age", response["Cache-Control"])
+
+    def test_save_and_delete_bump_the_version(self):
+        list_url = reverse("booking:service_list")
+        detail_url = reverse("booking:service_detail", args=[self.service.pk])
+        self.client.get(list_url)
+        self.client.get(detail_url)
+
+        self.service.name = "Masaż klasyczny"
+        self.service.price = 120
+        self.service.save()
+        self.assertContains(self.client.get(list_url), "Masaż klasyczny")
+        response = self.client.get(detail_url)
+        self.assertContains(response, "Masaż klasyczny")
+        self.assertContains(response, "120")
+
+        self.service.delete()
+        self.assertNotContains(self.client.get(list_url), "Masaż")
+        self.assertEqual(self.client.get(detail_url).status_code, 404)
+
+    def test_logged_in_pages_are_not_public(self):
+        self.client.force_login(User.objects.create_user("klient"))
+        response = self.client.get(reverse("booking:service_list"))
+        self.assertNotIn("public", response.get("Cache-Control", ""))
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN every query the hot views run against seeded data and require
+    each table to be read through a named index of that table. SQLite: a
+    ``SEARCH … USING INDEX`` step (a ``SCAN``, also ``USING INDEX``, reads
+    the whole table or index); PostgreSQL, with fresh statistics: an
+    ``Index Scan``/``Bitmap Index Scan`` instead of a ``Seq Scan``.
+    """
+
+    # katalog usług i rollup (dzień × usługa × status) są małe, a te
+    # zapytania i tak czytają je w całości
+    FULL_SCAN_ALLOWED = {"booking_service", "booking_reservationdailystat"}
+
+    @classmethod
+    def setUpTestData(cls):
+        admin = User.objects.create_user("admin")
+        admin.groups.add(Group.objects.create(name="Admin"))
+        cls.customer = User.objects.create_user("klient")
+        cls.services = [
+            Service.objects.create(name=f"Usługa {i}", price=100) for i in range(5)
+        ]
+        base = timezone.make_aware(datetime(2030, 1, 7, 9))
+        slots = TimeSlot.objects.bulk_create(
+            TimeSlot(
+                service=cls.services[i % 5],
+                start=base + timedelta(minutes=30 * i),
+                end=base + timedelta(minutes=30 * i + 30),
+            )
+            for i in range(2000)
+        )
+        statuses = Reservation.Status.values
+        Reservation.objects.bulk_create(
+            Reservation(
+                user=cls.customer if i % 2 else admin,
+                service=slot.service,
+                slot=slot,
+                status=statuses[i % len(statuses)],
+            )
+            for i, slot in enumerate(slots[:900])
+        )
+        SlotHold.objects.bulk_create(
+            SlotHold(slot=slot, user=admin, expires_at=base) for slot in slots[900:1400]
+        )
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(
+                    "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'"
+                )
+            elif connection.vendor == "postgresql":
+                # plan ze statystykami jak na produkcji, bez enable_seqscan
+                cursor.execute("ANALYZE")
+                cursor.execute(
+                    "SELECT indexname, tablename FROM pg_indexes"
+                    " WHERE schemaname = current_schema()"
+                )
+            cls.index_tables = dict(cursor.fetchall())
+
+    def setUp(self):
+        cache.clear()
+
+    def unindexed_reads(self, sql):
+        """Tables the plan of ``sql`` reads without an index of their own."""
+        reads = []
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                steps = [row[3] for row in cursor.fetchall()]
+                # pierwsza strona listy bez filtrów: indeks daje kolejność,
+                # LIMIT kończy przejście po kilkudziesięciu wierszach
+                ordered_page = (
+                    " WHERE " not in sql
+                    and re.search(r"\bLIMIT \d+$", sql)
+                    and not any("TEMP B-TREE FOR ORDER BY" in s for s in steps)
+                )
+                for step in steps:
+                    match = re.match(
+                        r"(SEARCH|SCAN) (\w+)(?: USING (?:COVERING )?INDEX (\w+)"
+                        r"| USING INTEGER PRIMARY KEY)?",
+                        step,
+                    )
+                    if not match or match[2] in ("CONSTANT", "SUBQUERY"):
+                        continue
+                    table = match[2]
+                    if re.fullmatch(r"U\d+", table):
+                        # alias podzapytania Django – tabelę wskazuje indeks
+                        table = self.index_tables.get(match[3], table)
+                    if "INTEGER PRIMARY KEY" in step:
+                        index = "pk"
+                    elif match[1] == "SEARCH" or (match[3] and ordered_page):
+                        index = match[3]
+                    else:
+                        index = None
+                    reads.append((table, index))
+            elif connection.vendor == "postgresql":
+                cursor.execute("EXPLAIN " + sql)
+                for (step,) in cursor.fetchall():
+                    match = re.search(
+                        r"Seq Scan on (\w+)|Index (?:Only )?Scan(?: Backward)?"
+                        r" using (\w+) on (\w+)|Bitmap Index Scan on (\w+)",
+                        step,
+                    )
+                    if not match:
+                        continue
+                    index = match[2] or match[4]
+                    table = match[1] or match[3] or self.index_tables.get(index)
+                    reads.append((table, index))
+            else:
+                self.skipTest(f"No plan check for {connection.vendor}.")
+        return [
+            table
+            for table, index in reads
+            if table not in self.FULL_SCAN_ALLOWED
+            and not (index == "pk" or self.index_tables.get(index) == table)
+        ]
+
+    def assertIndexedQueries(self, username, urls):
+        client = Client()
+        client.force_login(User.objects.get(username=username))
+        for url in urls:
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            self.assertEqual(response.status_code, 200, url)
+            for query in ctx.captured_queries:
+                if query["sql"].startswith("SELECT"):
+                    self.assertEqual(
+                        self.unindexed_reads(query["sql"]),
+                        [],
+                        f"{url}\n{query['sql']}",
+                    )
+
+    def test_admin_views(self):
+        day = "2030-01-08"
+        service = self.services[0].pk
+        reservations = reverse("booking:admin_reservations")
+        # dalsze strony idą już zakresem po indeksie (SEARCH)
+        newest = Reservation.objects.order_by("-created_at", "-pk").first()
+        cursor = encode_cursor(newest.created_at, newest.pk)
+        slot = TimeSlot.objects.order_by("start", "pk").first()
+        self.assertIndexedQueries(
+            "admin",
+            [
+                reverse("booking:admin_dashboard"),
+                reservations,
+                f"{reservations}?after={cursor}",
+                f"{reservations}?status=pending",
+                f"{reservations}?archived=on&status=pending",
+                f"{reservations}?service={service}&user=klient"
+                f"&date_from={day}&date_to={day}",
+                reverse("booking:admin_slots"),
+                f"{reverse('booking:admin_slots')}?after="
+                f"{encode_cursor(slot.start, slot.pk)}",
+                f"{reverse('booking:admin_slots')}?service={service}&active=1"
+                f"&date_from={day}",
+                reverse("booking:api_reservation_stats"),
+                f"{reverse('booking:admin_reservations_export')}?status=pending",
+            ],
+        )
+
+    def test_customer_views(self):
+        service = self.services[0].pk
+        slots = reverse("booking:free_slots_api", args=[service])
+        self.assertIndexedQueries(
+            "klient",
+            [
+                reverse("booking:service_list"),
+                reverse("booking:service_detail", args=[service]),
+                reverse("booking:my_reservations"),
+                f"{reverse('booking:my_reservations')}?status=pending",
+                f"{slots}?start=2030-01-07T00:00:00&end=2030-01-21T00:00:00",
+                f"{slots}?stream=ndjson",
+                f"{reverse('booking:availability_api')}?services={service}"
+                "&from=2030-01-07&to=2030-01-13",
+            ],
+        )
+
+
+class RollupTests(TestCase):
+    """Daily reservation rollup: deltas, transitions, backfill and charts."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("klient")
+        self.service = Service.objects.create(name="Masaż", price=100)
+        self.today = timezone.localdate()
+
+    def counts(self):
+        return {
+            (row.day, row.status): row.count
+            for row in ReservationDailyStat.objects.filter(service=self.service)
+        }
+
+    def reserve(self, days=1, **kwargs):
+        start = timezone.now() + timedelta(days=days)
+        slot = TimeSlot.objects.create(
+            service=self.service, start=start, end=start + timedelta(minutes=30)
+        )
+        return Reservation.objects.create(
+            user=self.user, service=self.service, slot=slot, **kwargs
+        )
+
+    def test_apply_deltas_inserts_and_updates(self):
+        key = (self.today, self.service.pk, "pending")
+        apply_deltas({key: 2})
+        apply_deltas({key: -1, (self.today, self.service.pk, "approved"): 0})
+        self.assertEqual(self.counts(), {(self.today, "pending"): 1})
+
+    def test_apply_deltas_never_goes_negative(self):
+        pending = (self.today, self.service.pk, "pending")
+        apply_deltas({pending: 1})
+        apply_deltas({pending: -3, (self.today, self.service.pk, "rejected"): -1})
+        self.assertEqual(
+            self.counts(), {(self.today, "pending"): 0, (self.today, "rejected"): 0}
+        )
+
+    def test_signals_and_transitions_keep_counts(self):
+        reservations = [self.reserve(days=i + 1) for i in range(3)]
+        self.assertEqual(self.counts(), {(self.today, "pending"): 3})
+
+        reservations[0].status = Reservation.Status.CANCELLED
+        reservations[0].save()
+        pending = Reservation.objects.filter(pk__in=[r.pk for r in reservations[1:]])
+        record_transition(
+            pending.values_list("created_at", "service_id", "status"),
+            Reservation.Status.APPROVED,
+        )
+        pending.update(status=Reservation.Status.APPROVED)
+        Reservation.objects.get(pk=reservations[1].pk).delete()
+        self.assertEqual(
+            self.counts(),
+            {
+                (self.today, "pending"): 0,
+                (self.today, "cancelled"): 1,
+                (self.today, "approved"): 1,
+            },
+        )
+
+    def test_backfill_rebuilds_from_reservations(self):
+        old = self.reserve(created_at=timezone.now() - timedelta(days=10))
+        self.reserve()
+        ReservationDailyStat.objects.update(count=99)
+
+        # zakres dat przebudowuje tylko swoje dni
+        self.assertEqual(backfill(date_from=self.today), 1)
+        old_day = timezone.localdate(old.created_at)
+        self.assertEqual(
+            self.counts(), {(old_day, "pending"): 99, (self.today, "pending"): 1}
+        )
+        self.assertEqual(backfill(), 2)
+        self.assertEqual(
+            self.counts(), {(old_day, "pending"): 1, (self.today, "pending"): 1}
+        )
+
+    def test_chart_series_fills_empty_buckets(self):
+        monday = self.today - timedelta(days=self.today.weekday())
+        apply_deltas(
+            {
+                (monday - timedelta(days=7), self.service.pk, "approved"): 2,
+                (monday, self.service.pk, "approved"): 3,
+                (monday + timedelta(days=1), self.service.pk, "pending"): 1,
+            }
+        )
+        buckets, series = chart_series(
+            monday - timedelta(days=14), monday + timedelta(days=6), "week"
+        )
+        self.assertEqual(
+            buckets, [monday - timedelta(days=14 - 7 * i) for i in range(3)]
+        )
+        self.assertEqual(series["approved"], [0, 2, 3])
+        self.assertEqual(series["pending"], [0, 0, 1])
+        self.assertEqual(series["rejected"], [0, 0, 0])
+
+        buckets, series = chart_series(monday, monday + timedelta(days=1), "day")
+        self.assertEqual(series["approved"], [3, 0])
+        other = Service.objects.create(name="Manicure", price=80)
+        _, series = chart_series(monday, monday, service_ids=[other.pk])
+        self.assertEqual(series["approved"], [0])
+
+
+class RetentionTests(TestCase):
+    """Batched, resumable archival of closed reservations and past slots."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("klient", password="x")
+        self.service = Service.objects.create(name="Masaż", price=100)
+        now = timezone.now()
+
+        def slot(days):
+            start = now + timedelta(days=days)
+            return TimeSlot.objects.create(
+                service=self.service, start=start, end=start + timedelta(hours=1)
+            )
+
+        old = now - timedelta(days=200)
+        self.past = [
+            Reservation.objects.create(
+                user=self.user,
+                service=self.service,
+                slot=slot(-200 + i),
+                status=Reservation.Status.APPROVED,
+                created_at=old,
+            )
+            for i in range(3)
+        ]
+        self.closed = Reservation.objects.create(
+            user=self.user,
+            service=self.service,
+            status=Reservation.Status.CANCELLED,
+            archived_start=old - timedelta(days=1),
+            archived_end=old - timedelta(days=1) + timedelta(hours=1),
+            created_at=old,
+        )
+        self.free_past = slot(-150)
+        self.live = Reservation.objects.create(
+            user=self.user, service=self.service, slot=slot(5)
+        )
+        self.recent = Reservation.objects.create(
+            user=self.user,
+            service=self.service,
+            slot=slot(-2),
+            status=Reservation.Status.APPROVED,
+        )
+
+    def chart_totals(self):
+        _, series = chart_series(
+            timezone.localdate() - timedelta(days=400), timezone.localdate()
+        )
+        return {status: sum(counts) for status, counts in series.items()}
+
+    def test_archive_is_batched_and_resumable(self):
+        cutoff = retention_cutoff(90)
+        charts = self.chart_totals()
+
+        self.assertEqual(archive(cutoff, batch_size=2, max_batches=1), (2, 0))
+        self.assertEqual(archive(cutoff, batch_size=2), (2, 4))
+        self.assertEqual(archive(cutoff, batch_size=2), (0, 0))
+
+        self.assertEqual(
+            set(Reservation.objects.values_list("pk", flat=True)),
+            {self.live.pk, self.recent.pk},
+        )
+        self.assertFalse(TimeSlot.objects.filter(end__lt=cutoff).exists())
+        self.assertEqual(ArchivedTimeSlot.objects.count(), 4)
+        archived = ArchivedReservation.objects.get(pk=self.past[0].pk)
+        self.assertEqual(archived.start, self.past[0].slot.start)
+        self.assertEqual(archived.status, Reservation.Status.APPROVED)
+
+        # wykresy liczą zarchiwizowane rezerwacje – także po przebudowie
+        self.assertEqual(self.chart_totals(), charts)
+        backfill()
+        self.assertEqual(self.chart_totals(), charts)
+
+    def test_history_stays_visible(self):
+        archive(retention_cutoff(90))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("booking:my_reservations"))
+        # od najnowszej rezerwacji – (created_at, id) malejąco
+        self.assertEqual(
+            [r.pk for r in response.context["history"]],
+            [self.closed.pk, self.past[2].pk, self.past[1].pk, self.past[0].pk],
+        )
+        response = self.client.get(
+            reverse("booking:my_reservations"), {"status": "cancelled"}
+        )
+        self.assertEqual([r.pk for r in response.context["history"]], [self.closed.pk])
+
+    @mock.patch("booking.views.HISTORY_PER_PAGE", 3)
+    def test_history_is_paginated_by_cursor(self):
+        archive(retention_cutoff(90))
+        self.client.force_login(self.user)
+        url = reverse("booking:my_reservations")
+
+        first = self.client.get(url).context["history"]
+        self.assertEqual(
+            [r.pk for r in first], [self.closed.pk, self.past[2].pk, self.past[1].pk]
+        )
+        self.assertFalse(first.has_previous())
+        second = self.client.get(url, {"after": first.next_cursor})
+        self.assertEqual([r.pk for r in second.context["history"]], [self.past[0].pk])
+        self.assertFalse(second.context["history"].has_next())
+        self.assertContains(second, "Poprzednia")
+
+        # zepsuty kursor – pierwsza strona
+        broken = self.client.get(url, {"after": "zepsuty"}).context["history"]
+        self.assertEqual([r.pk for r in broken], [r.pk for r in first])
+
+    def test_admin_sees_archived_rows(self):
+        archive(retention_cutoff(90))
+        admin = User.objects.create_user("admin")
+        admin.groups.add(Group.objects.create(name="Admin"))
+        self.client.force_login(admin)
+
+        response = self.client.get(
+            reverse("booking:admin_reservations_export"), {"format": "ndjson"}
+        )
+        rows = [json.loads(line) for line in response.getvalue().splitlines()]
+        # archiwum i bieżące rezerwacje scalone wg (created_at, id)
+        self.assertEqual(
+            [row["id"] for row in rows],
+            [r.pk for r in self.past + [self.closed, self.live, self.recent]],
+        )
+
+        response = self.client.get(
+            reverse("booking:admin_reservations"), {"archived": "on"}
+        )
+        self.assertEqual(len(response.context["object_list"]), 4)
+
+        stats = self.client.get(reverse("booking:admin_dashboard")).context["stats"]
+        charts = self.chart_totals()
+        self.assertEqual(stats["all"], sum(charts.values()))
+        self.assertEqual(stats["cancelled"], charts["cancelled"])
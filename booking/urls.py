@@ -2,7 +2,6 @@ from django.urls import path, include
 from . import views
 from . import views_admin
 
-
 app_name = "booking"
 
 urlpatterns = [
@@ -16,6 +15,7 @@ urlpatterns = [
         views.ReservationCreateView.as_view(),
         name="reservation_create",
     ),
+    path("services/<int:pk>/book/cart/", views.book_cart, name="reservation_cart"),
     path("my/", views.MyReservationsView.as_view(), name="my_reservations"),
     path(
         "my/<int:pk>/edit/",
@@ -26,7 +26,21 @@ urlpatterns = [
         "my/<int:pk>/", views.ReservationDetailView.as_view(), name="reservation_detail"
     ),
     path("my/<int:pk>/cancel/", views.cancel_reservation, name="reservation_cancel"),
+    path("api/services/suggest/", views.suggest_services, name="api_service_suggest"),
     path("api/services/<int:pk>/slots/", views.free_slots_api, name="free_slots_api"),
+    path(
+        "api/services/<int:pk>/slots/<int:slot_id>/hold/",
+        views.hold_slot_api,
+        name="slot_hold",
+    ),
+    path(
+        "api/services/<int:pk>/slots/<int:slot_id>/waitlist/",
+        views.join_waitlist_api,
+        name="slot_waitlist",
+    ),
+    path("my/waitlist/<int:pk>/leave/", views.leave_waitlist, name="waitlist_leave"),
+    path("api/services/<int:pk>/events/", views.slot_events, name="slot_events"),
+    path("api/availability/", views.availability_api, name="availability_api"),
     path(
         "admin-panel/api/slots/",
         views_admin.get_slots_for_service,
@@ -46,6 +60,16 @@ urlpatterns = [
         views_admin.reject_reservation,
         name="admin_reject",
     ),
+    path(
+        "admin-panel/api/reservation-stats/",
+        views_admin.reservation_stats_api,
+        name="api_reservation_stats",
+    ),
+    path(
+        "admin-panel/res/bulk/",
+        views_admin.bulk_reservations,
+        name="admin_reservations_bulk",
+    ),
     path(
         "admin-panel/services/",
         views_admin.ServiceAdminList.as_view(),
@@ -82,9 +106,49 @@ urlpatterns = [
         views_admin.SlotAdminDelete.as_view(),
         name="admin_slots_delete",
     ),
+    path(
+        "admin-panel/schedules/",
+        views_admin.ScheduleAdminList.as_view(),
+        name="admin_schedules",
+    ),
+    path(
+        "admin-panel/slots/import/",
+        views_admin.import_slots_view,
+        name="admin_slots_import",
+    ),
+    path(
+        "admin-panel/schedules/add/",
+        views_admin.ScheduleAdminCreate.as_view(),
+        name="admin_schedules_add",
+    ),
+    path(
+        "admin-panel/schedules/<int:pk>/edit/",
+        views_admin.ScheduleAdminUpdate.as_view(),
+        name="admin_schedules_edit",
+    ),
+    path(
+        "admin-panel/schedules/<int:pk>/delete/",
+        views_admin.ScheduleAdminDelete.as_view(),
+        name="admin_schedules_delete",
+    ),
+    path(
+        "admin-panel/schedules/generate/",
+        views_admin.generate_schedule_slots,
+        name="admin_schedules_generate_all",
+    ),
+    path(
+        "admin-panel/schedules/<int:pk>/generate/",
+        views_admin.generate_schedule_slots,
+        name="admin_schedules_generate",
+    ),
     path(
         "admin-panel/reservations/",
         views_admin.ReservationAdminList.as_view(),
         name="admin_reservations",
     ),
+    path(
+        "admin-panel/reservations/export/",
+        views_admin.export_reservations,
+        name="admin_reservations_export",
+    ),
 ]
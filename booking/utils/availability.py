@@ -0,0 +1,266 @@
+"""
+Per-day availability indexes (``DayIndex``) of every service, cached under
+keys that carry a version of the (service, day) pair.
+
+Writers never touch cached indexes: once their transaction commits they
+bump the versions of the days they changed (``invalidate_availability``)
+and the next read rebuilds them. A reader that built an index from data a
+writer is replacing stores it under the old version, where nobody looks
+any more, and a rolled back transaction bumps nothing at all.
+
+Each service also has an availability version of its own (ETags of the
+free-slots APIs). Both live in the cache, not in the ``Service`` row, so
+bookings of one service do not queue up on a row lock.
+"""
+
+import math
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, Min, OuterRef, Subquery
+from django.utils import timezone
+
+from booking.models import Reservation, SlotHold, TimeSlot
+from booking.utils import metrics
+from booking.utils.slot_index import DayIndex
+from booking.utils.versions import bump_version, get_version, get_versions
+
+ACTIVE_STATUSES = [Reservation.Status.PENDING, Reservation.Status.APPROVED]
+
+CACHE_TIMEOUT = getattr(settings, "BOOKING_AVAILABILITY_CACHE_TIMEOUT", 300)
+
+
+def _service_version_key(service_id):
+    return f"availability:ver:{service_id}"
+
+
+def bump_availability_version(service_id):
+    """Invalidate ETags of the free-slots API for the given service."""
+    bump_version(_service_version_key(service_id))
+
+
+def get_availability_version(service_id):
+    return get_version(_service_version_key(service_id))
+
+
+def get_availability_versions(service_ids):
+    """``{service_id: version}`` with one cache round trip."""
+    keys = {service_id: _service_version_key(service_id) for service_id in service_ids}
+    versions = get_versions(list(keys.values()))
+    return {service_id: versions[key] for service_id, key in keys.items()}
+
+
+def local_day(dt):
+    return timezone.localdate(dt)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def days_between(start, end):
+    """Local days touched by the half-open range [start, end)."""
+    first = local_day(start)
+    last = local_day(end - timedelta(microseconds=1))
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def _version_key(service_id, day):
+    return f"availability:ver:{service_id}:{day.isoformat()}"
+
+
+def _cache_key(service_id, day, version):
+    return f"availability:{service_id}:{day.isoformat()}:{version}"
+
+
+def _build_indexes(services, missing):
+    """
+    Build indexes for ``missing`` (service_id, day) pairs with one query.
+    Returns ``(indexes, expiries)``; ``expiries`` maps the pairs with held
+    slots to the moment the first of those holds expires.
+    """
+    days = {day for _, day in missing}
+    now = timezone.now()
+    rows = (
+        TimeSlot.objects.filter(
+            service_id__in={service_id for service_id, _ in missing},
+            is_active=True,
+            start__gte=day_start(min(days)),
+            start__lt=day_start(max(days) + timedelta(days=1)),
+        )
+        .annotate(
+            booked=Exists(
+                Reservation.objects.filter(
+                    slot=OuterRef("pk"), status__in=ACTIVE_STATUSES
+                )
+            ),
+            # aktywna blokada (SlotHold) zajmuje termin tak jak rezerwacja,
+            # ale tylko do swojego wygaśnięcia – tyle najwyżej żyje indeks
+            held_until=Subquery(
+                SlotHold.objects.filter(slot=OuterRef("pk"), expires_at__gt=now).values(
+                    "expires_at"
+                )[:1]
+            ),
+        )
+        .values_list("service_id", "id", "start", "end", "booked", "held_until")
+    )
+    wanted = set(missing)
+    tz = timezone.get_current_timezone()
+    grouped = defaultdict(list)
+    expiries = {}
+    for service_id, slot_id, start, end, booked, held_until in rows:
+        target = (service_id, start.astimezone(tz).date())
+        if target not in wanted:
+            continue
+        grouped[target].append((slot_id, start, end, booked or bool(held_until)))
+        if held_until and not booked:
+            expiries[target] = min(expiries.get(target, held_until), held_until)
+    indexes = {
+        (service_id, day): DayIndex.build(
+            day, services[service_id].slot_duration, grouped.get((service_id, day), [])
+        )
+        for service_id, day in missing
+    }
+    return indexes, expiries
+
+
+def _timeout_until(moment, now):
+    return max(1, min(CACHE_TIMEOUT, math.ceil((moment - now).total_seconds())))
+
+
+def get_indexes_for_services(services, days):
+    """
+    Return ``{service_id: {day: DayIndex}}``. Indexes are served from the
+    cache; everything missing, across all services, is built with a single
+    query. A day with a held slot is cached only until the hold expires.
+    """
+    services = {service.pk: service for service in services}
+    targets = [(service_id, day) for service_id in services for day in days]
+    versions = get_versions([_version_key(*target) for target in targets])
+    keys = {
+        _cache_key(*target, versions[_version_key(*target)]): target
+        for target in targets
+    }
+    found = {
+        keys[k]: index
+        for k, index in cache.get_many(keys).items()
+        # po zmianie długości slotu siatka jest nieaktualna
+        if index.step == services[keys[k][0]].slot_duration
+    }
+
+    missing = [target for target in keys.values() if target not in found]
+    if found:
+        metrics.incr("availability_cache_hit", len(found))
+    if missing:
+        metrics.incr("availability_cache_miss", len(missing))
+        fresh, expiries = _build_indexes(services, missing)
+        now = timezone.now()
+        by_timeout = defaultdict(dict)
+        for target, index in fresh.items():
+            timeout = (
+                _timeout_until(expiries[target], now)
+                if target in expiries
+                else CACHE_TIMEOUT
+            )
+            key = _cache_key(*target, versions[_version_key(*target)])
+            by_timeout[timeout][key] = index
+        for timeout, entries in by_timeout.items():
+            cache.set_many(entries, timeout)
+        found.update(fresh)
+
+    result = {service_id: {} for service_id in services}
+    for (service_id, day), index in found.items():
+        result[service_id][day] = index
+    return result
+
+
+def next_hold_expiries(service_ids, now=None):
+    """
+    ``{service_id: datetime}`` – when the first active hold of each service
+    expires (services without holds are left out). Part of the ETags of the
+    free-slots APIs: an expiring hold frees a slot without any write.
+    """
+    rows = (
+        SlotHold.objects.filter(
+            slot__service_id__in=service_ids, expires_at__gt=now or timezone.now()
+        )
+        .values("slot__service_id")
+        .annotate(first=Min("expires_at"))
+        .order_by()
+    )
+    return {row["slot__service_id"]: row["first"] for row in rows}
+
+
+def get_day_indexes(service, days):
+    """Return ``{day: DayIndex}`` for a single service."""
+    return get_indexes_for_services([service], days)[service.pk]
+
+
+def get_free_slots_in_range(service, start, end):
+    """Flat, ordered list of free ``(id, start, end)`` slots starting in [start, end)."""
+    indexes = get_day_indexes(service, days_between(start, end))
+    return [
+        row
+        for day in sorted(indexes)
+        for row in indexes[day].free_slots()
+        if start <= row[1] < end
+    ]
+
+
+def get_taken_slots_in_range(service, start, end):
+    """Like ``get_free_slots_in_range``, for reserved or held slots."""
+    indexes = get_day_indexes(service, days_between(start, end))
+    return [
+        row
+        for day in sorted(indexes)
+        for row in indexes[day].taken_slots()
+        if start <= row[1] < end
+    ]
+
+
+def is_slot_free(slot, service):
+    day = local_day(slot.start)
+    return get_day_indexes(service, [day])[day].contains_free(slot.pk, slot.start)
+
+
+def invalidate_availability(targets):
+    """
+    Make cached availability of ``(service_id, day)`` pairs unreachable and
+    bump the versions of the affected services – once the current
+    transaction commits, so no reader caches what it has not seen yet.
+    """
+    targets = set(targets)
+    if not targets:
+        return
+
+    def bump():
+        for target in targets:
+            bump_version(_version_key(*target))
+        for service_id in {service_id for service_id, _ in targets}:
+            bump_availability_version(service_id)
+
+    transaction.on_commit(bump)
+
+
+def slot_added(slot):
+    if slot.is_active:
+        invalidate_availability([(slot.service_id, local_day(slot.start))])
+
+
+def set_slots_free(slot_ids, free):
+    """
+    Slots were freed (``free=True``) or taken: invalidate their days.
+    Returns ``(id, service_id, start, end)`` of the affected active slots.
+    """
+    changed = list(
+        TimeSlot.objects.filter(pk__in=slot_ids, is_active=True).values_list(
+            "id", "service_id", "start", "end"
+        )
+    )
+    invalidate_availability(
+        (service_id, local_day(start)) for _, service_id, start, _ in changed
+    )
+    return changed
@@ -0,0 +1,129 @@
+"""
+Read-through cache of the service catalog. Every service has a content
+version in the cache, bumped by ``booking.signals`` on save/delete; cached
+objects and template fragments are keyed on it, so a change makes the old
+entries unreachable instead of deleting them one by one. The catalog as a
+whole has its own version for the service list.
+"""
+
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from django.utils.cache import patch_cache_control
+
+from booking.models import Service
+from booking.utils.versions import bump_version, get_version, get_versions
+
+CATALOG_TIMEOUT = getattr(settings, "BOOKING_CATALOG_CACHE_TIMEOUT", 600)
+
+# max-age stron katalogu dla niezalogowanych (przeglądarka/proxy)
+CATALOG_MAX_AGE = getattr(settings, "BOOKING_CATALOG_MAX_AGE", 60)
+
+_CATALOG = "catalog"
+
+
+def _version_key(name):
+    return f"catalog:ver:{name}"
+
+
+def _version(name):
+    return get_version(_version_key(name))
+
+
+def _bump(name):
+    bump_version(_version_key(name))
+
+
+def service_version(pk):
+    return _version(f"service:{pk}")
+
+
+def catalog_version():
+    return _version(_CATALOG)
+
+
+def bump_service_version(pk):
+    _bump(f"service:{pk}")
+    _bump(_CATALOG)
+
+
+def get_service(pk):
+    """The ``Service`` with ``pk`` from the cache or the database, or ``None``."""
+    version = service_version(pk)
+    key = f"catalog:service:{pk}:{version}"
+    service = cache.get(key)
+    if service is None:
+        service = Service.objects.filter(pk=pk).first()
+        if service is None:
+            return None
+        cache.set(key, service, CATALOG_TIMEOUT)
+    service.cache_version = version
+    return service
+
+
+def get_service_or_404(pk):
+    service = get_service(pk)
+    if service is None:
+        raise Http404("Nie ma takiej usługi.")
+    return service
+
+
+def with_versions(services):
+    """Set ``cache_version`` (fragment cache key) on every service."""
+    keys = {s.pk: _version_key(f"service:{s.pk}") for s in services}
+    versions = get_versions(list(keys.values()))
+    for s in services:
+        s.cache_version = versions[keys[s.pk]]
+    return services
+
+
+def get_catalog():
+    """All services (list order) from the cache, with ``cache_version``."""
+    key = f"catalog:list:{catalog_version()}"
+    services = cache.get(key)
+    if services is None:
+        services = list(Service.objects.all())
+        cache.set(key, services, CATALOG_TIMEOUT)
+    return with_versions(services)
+
+
+def _sets_cookies(request, response):
+    # token CSRF i komunikaty trafiają do ciasteczek dopiero w middleware
+    messages = getattr(request, "_messages", None)
+    return bool(
+        response.cookies
+        or request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+        or (messages is not None and (messages.used or messages.added_new))
+    )
+
+
+def public_for_anonymous(view):
+    """
+    Let browsers and shared caches keep the page for ``CATALOG_MAX_AGE``
+    seconds – only for anonymous visitors and only when the response sets
+    no cookies (CSRF token, flash messages).
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if (
+            request.method not in ("GET", "HEAD")
+            or request.user.is_authenticated
+            or response.status_code != 200
+        ):
+            return response
+
+        def make_public(response):
+            if not _sets_cookies(request, response):
+                patch_cache_control(response, public=True, max_age=CATALOG_MAX_AGE)
+
+        if getattr(response, "is_rendered", True):
+            make_public(response)
+        else:
+            response.add_post_render_callback(make_public)
+        return response
+
+    return wrapper
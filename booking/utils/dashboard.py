@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from booking.models import Reservation, ReservationDailyStat, Service, TimeSlot
+
+# Kilka sekund wystarczy, żeby odświeżanie panelu przez wielu adminów nie
+# liczyło tego samego; zmiany rezerwacji i tak czyszczą wpis od razu
+STATS_TIMEOUT = getattr(settings, "BOOKING_DASHBOARD_CACHE_TIMEOUT", 5)
+
+STATS_CACHE_KEY = "dashboard:stats"
+
+
+def _compute_stats():
+    # z rollupu, tak jak wykresy – liczy też rezerwacje przeniesione do archiwum
+    stats = dict.fromkeys(Reservation.Status.values, 0)
+    rows = (
+        ReservationDailyStat.objects.values("status")
+        .annotate(n=Sum("count"))
+        .order_by()
+    )
+    for row in rows:
+        stats[row["status"]] = row["n"]
+    stats["all"] = sum(stats.values())
+    # oczekujące z żywej tabeli – tak jak lista do zatwierdzenia pod spodem
+    # (rollup liczy też oczekujące przeniesione do archiwum)
+    stats["pending"] = Reservation.objects.filter(
+        status=Reservation.Status.PENDING
+    ).count()
+    stats["services"] = Service.objects.count()
+    # nadchodzące – zakres po indeksie start zamiast całej tabeli terminów
+    stats["slots_active"] = TimeSlot.objects.filter(
+        is_active=True, start__gte=timezone.now()
+    ).count()
+    return stats
+
+
+def get_dashboard_stats():
+    """
+    Counts shown on the admin dashboard: all reservations and per status
+    (live and archived, summed from the daily rollup the charts use; pending
+    only live, as listed for approval), services and upcoming active slots.
+    """
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = _compute_stats()
+        cache.set(STATS_CACHE_KEY, stats, STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_dashboard_stats():
+    # po commicie – inaczej równoległy odczyt zapisze do cache stan sprzed zmian
+    transaction.on_commit(lambda: cache.delete(STATS_CACHE_KEY))
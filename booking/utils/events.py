@@ -0,0 +1,171 @@
+"""
+Fan-out of live availability changes ("slot taken" / "held" / "freed") to open
+calendars (Server-Sent Events, see ``views.slot_events``).
+
+The backend is chosen with ``settings.BOOKING_EVENTS_BROKER``:
+
+* ``booking.utils.events.InProcessBroker`` (default with ``DEBUG``) – a
+  single process; subscribers in other workers never see its events,
+* ``booking.utils.events.PostgresBroker`` (default in production) – several
+  nodes/processes; events are relayed through PostgreSQL ``LISTEN/NOTIFY``.
+
+``booking.checks`` refuses to start several workers with the first one.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Ile zdarzeń może czekać na wolnego klienta zanim zaczniemy je gubić
+QUEUE_SIZE = 100
+# Po ilu sekundach nasłuch PostgresBroker łączy się ponownie po błędzie
+RECONNECT_DELAY = 5
+
+
+def service_channel(service_id):
+    return f"service:{service_id}"
+
+
+class Broker(ABC):
+    """Interface of event brokers."""
+
+    @abstractmethod
+    def publish(self, channel, message):
+        """Deliver ``message`` to the subscribers of ``channel``."""
+
+    @abstractmethod
+    def subscribe(self, channel, heartbeat=None):
+        """
+        Async iterator of messages published on ``channel``. When
+        ``heartbeat`` seconds pass without a message, ``None`` is yielded.
+        """
+
+
+class InProcessBroker(Broker):
+    """Delivers messages to subscribers living in the current process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, message):
+        # publish() jest wołane z wątków widoków synchronicznych
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._deliver, queue, message)
+
+    @staticmethod
+    def _deliver(queue, message):
+        if queue.full():
+            # wolny klient – gubimy najstarsze zdarzenie, nie blokujemy innych
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    async def subscribe(self, channel, heartbeat=None):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(QUEUE_SIZE))
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber[1].get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(subscriber)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Multi-node broker: messages go through ``pg_notify`` (delivered on commit)
+    and a listener thread per process hands them to local subscribers.
+    """
+
+    pg_channel = "booking_events"
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, channel, message):
+        payload = json.dumps({"channel": channel, "message": message})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.pg_channel, payload])
+
+    async def subscribe(self, channel, heartbeat=None):
+        self._ensure_listener()
+        async for message in super().subscribe(channel, heartbeat):
+            yield message
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name="booking-events", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        import psycopg
+
+        while True:
+            try:
+                # parametry jak połączenia Django – razem z OPTIONS (np. sslmode)
+                params = connection.get_connection_params()
+                with psycopg.connect(**params, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {self.pg_channel}")
+                    for notify in conn.notifies():
+                        self._relay(notify.payload)
+            except Exception:
+                logger.exception(
+                    "Events listener failed, reconnecting in %s s", RECONNECT_DELAY
+                )
+            # bez nasłuchu otwarte kalendarze przestają dostawać zmiany – wracamy
+            time.sleep(RECONNECT_DELAY)
+
+    def _relay(self, payload):
+        try:
+            data = json.loads(payload)
+            InProcessBroker.publish(self, data["channel"], data["message"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed event payload: %r", payload)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    path = getattr(
+        settings, "BOOKING_EVENTS_BROKER", "booking.utils.events.InProcessBroker"
+    )
+    return import_string(path)()
+
+
+def publish_slots(rows, event):
+    """
+    Announce ``event`` ("taken"/"held"/"freed") for ``(slot_id, service_id, start,
+    end)`` rows once the current transaction commits.
+    """
+    for slot_id, service_id, start, end in rows:
+        message = {
+            "type": event,
+            "id": slot_id,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+        }
+        transaction.on_commit(
+            lambda c=service_channel(service_id), m=message: get_broker().publish(c, m)
+        )
@@ -0,0 +1,124 @@
+"""
+Temporary slot holds ("leases") taken when a user picks a slot in the
+calendar. A held slot is treated as taken by the availability index until
+the hold is converted into a reservation, replaced or it expires.
+
+Expired holds are ignored by every read (lazy expiry); cached indexes and
+ETags of the free-slots APIs carry the nearest expiry. The rows are deleted
+(and the slots announced as freed) when somebody else claims the slot, by
+``manage.py sweep_slot_holds`` or, at most every ``SWEEP_INTERVAL``
+seconds, by the availability views (``sweeps_expired_holds``).
+"""
+
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from booking.models import SlotHold, TimeSlot
+from booking.utils import metrics
+from booking.utils.availability import ACTIVE_STATUSES, set_slots_free
+from booking.utils.events import publish_slots
+
+# Jak długo (w sekundach) kliknięty termin czeka na wysłanie formularza
+HOLD_TTL = getattr(settings, "BOOKING_HOLD_TTL", 300)
+
+SWEEP_BATCH_SIZE = 1000
+
+# Co ile sekund (najwyżej) widoki dostępności sprzątają wygasłe blokady
+SWEEP_INTERVAL = getattr(settings, "BOOKING_HOLD_SWEEP_INTERVAL", 30)
+
+
+def hold_expiry(now=None):
+    return (now or timezone.now()) + timedelta(seconds=HOLD_TTL)
+
+
+def active_holds(now=None):
+    return SlotHold.objects.filter(expires_at__gt=now or timezone.now())
+
+
+def claim_holds(slot_ids, user, now=None):
+    """
+    Resolve holds on ``slot_ids`` for a booking made by ``user`` (primary key
+    lookups, O(1) per slot). Returns the ids held by somebody else; when
+    there are none, the user's own holds (converted) and expired ones are
+    deleted. Call inside the booking transaction.
+    """
+    now = now or timezone.now()
+    holds = list(
+        SlotHold.objects.filter(pk__in=slot_ids).values_list(
+            "pk", "user_id", "expires_at"
+        )
+    )
+    blocked = [
+        pk
+        for pk, user_id, expires_at in holds
+        if user_id != user.pk and expires_at > now
+    ]
+    if blocked or not holds:
+        return blocked
+
+    SlotHold.objects.filter(pk__in=[pk for pk, _, _ in holds]).delete()
+    converted = sum(1 for _, user_id, _ in holds if user_id == user.pk)
+    if converted:
+        metrics.incr("hold_converted", converted)
+    if len(holds) > converted:
+        metrics.incr("hold_expired", len(holds) - converted)
+    return []
+
+
+def release_holds(slot_ids):
+    """
+    Make held slots free again, skipping slots that got an active
+    reservation meanwhile. Call after the hold rows are deleted.
+    """
+    free = TimeSlot.objects.filter(pk__in=slot_ids).exclude(
+        reservation__status__in=ACTIVE_STATUSES
+    )
+    publish_slots(
+        set_slots_free(list(free.values_list("pk", flat=True)), True), "freed"
+    )
+
+
+def sweep_expired_holds(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """Delete expired holds in batches and free their slots. Returns the count."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            # partia po indeksie expires_at, blokady w kolejności kluczy
+            expired = SlotHold.objects.filter(expires_at__lte=now).order_by(
+                "expires_at"
+            )[:batch_size]
+            ids = list(
+                SlotHold.objects.select_for_update()
+                .filter(pk__in=list(expired.values_list("pk", flat=True)))
+                .filter(expires_at__lte=now)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            if not ids:
+                break
+            SlotHold.objects.filter(pk__in=ids).delete()
+            release_holds(ids)
+        metrics.incr("hold_expired", len(ids))
+        total += len(ids)
+    return total
+
+
+def sweeps_expired_holds(view):
+    """
+    Sweep expired holds before the view runs – in one request per
+    ``SWEEP_INTERVAL`` across all workers, so no scheduler is required.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if cache.add("holds:swept", True, SWEEP_INTERVAL):
+            sweep_expired_holds()
+        return view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,152 @@
+"""
+Idempotency keys for state-changing POST requests. The first request with
+a key inserts an ``IdempotencyKey`` row (primary key = user, path and key),
+so every worker sees it; repeats replay the stored response.
+"""
+
+import hashlib
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+
+from booking.models import IdempotencyKey
+
+FIELD = "idempotency_key"
+
+# Jak długo pamiętamy odpowiedź dla danego klucza
+TTL = getattr(settings, "BOOKING_IDEMPOTENCY_TTL", 24 * 3600)
+# Jak długo trzyma się znacznik "w trakcie" (np. po awarii procesu)
+LOCK_TTL = 30
+# Co ile sekund usuwamy wygasłe klucze
+SWEEP_INTERVAL = 3600
+
+# Nagłówki, które odtwarzamy razem z treścią odpowiedzi
+REPLAYED_HEADERS = ("Content-Type", "Location")
+
+
+def get_key(request):
+    return request.headers.get("Idempotency-Key") or request.POST.get(FIELD)
+
+
+def _fingerprint(request):
+    items = sorted(
+        (k, v)
+        for k, values in request.POST.lists()
+        for v in values
+        if k not in (FIELD, "csrfmiddlewaretoken")
+    )
+    body = request.body if request.content_type == "application/json" else b""
+    raw = f"{request.method}|{request.path}|{items}".encode() + body
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _digest(request, key):
+    return hashlib.sha256(
+        f"{request.user.pk or 'anon'}|{request.path}|{key}".encode()
+    ).hexdigest()
+
+
+def _claim(digest, fingerprint):
+    """
+    Mark ``digest`` as in progress. Returns ``None`` when the caller may run
+    the view, otherwise the row of the earlier request (an unsaved
+    in-progress row when it was deleted in the meantime).
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=LOCK_TTL)
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                digest=digest, fingerprint=fingerprint, expires_at=expires_at
+            )
+        return None
+    except IntegrityError:
+        pass
+    # wygasły wpis (także porzucony "w trakcie") przejmujemy
+    taken = IdempotencyKey.objects.filter(digest=digest, expires_at__lte=now).update(
+        fingerprint=fingerprint,
+        status=None,
+        headers=[],
+        content=b"",
+        expires_at=expires_at,
+    )
+    if taken:
+        return None
+    return IdempotencyKey.objects.filter(digest=digest).first() or IdempotencyKey(
+        fingerprint=fingerprint
+    )
+
+
+def _replay(stored):
+    response = HttpResponse(bytes(stored.content), status=stored.status)
+    for name, value in stored.headers:
+        response[name] = value
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def sweep_expired_keys(now=None):
+    """Delete expired keys. Returns the count."""
+    deleted, _ = IdempotencyKey.objects.filter(
+        expires_at__lte=now or timezone.now()
+    ).delete()
+    return deleted
+
+
+def idempotent(view):
+    """
+    Replay the stored response when a request repeats its idempotency key
+    (``Idempotency-Key`` header or ``idempotency_key`` form field).
+    The view – and so the booking tables – is not touched for repeats.
+    Responses are kept in the database for ``TTL`` seconds, per user and
+    path.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = get_key(request)
+        if not key:
+            return view(request, *args, **kwargs)
+
+        if cache.add("idem:swept", True, SWEEP_INTERVAL):
+            sweep_expired_keys()
+        digest = _digest(request, key)
+        fingerprint = _fingerprint(request)
+        stored = _claim(digest, fingerprint)
+        if stored is None:
+            return _execute(view, request, args, kwargs, digest)
+
+        if stored.fingerprint != fingerprint:
+            return HttpResponse("Klucz idempotencji użyty z innymi danymi.", status=422)
+        if stored.status is None:
+            return HttpResponse("Żądanie jest w trakcie przetwarzania.", status=409)
+        return _replay(stored)
+
+    return wrapper
+
+
+def _execute(view, request, args, kwargs, digest):
+    try:
+        response = view(request, *args, **kwargs)
+    except Exception:
+        IdempotencyKey.objects.filter(digest=digest).delete()
+        raise
+
+    if hasattr(response, "render") and not response.is_rendered:
+        response.render()
+    if response.streaming or response.status_code >= 500:
+        IdempotencyKey.objects.filter(digest=digest).delete()
+        return response
+
+    IdempotencyKey.objects.filter(digest=digest).update(
+        status=response.status_code,
+        headers=[(h, response[h]) for h in REPLAYED_HEADERS if response.has_header(h)],
+        content=response.content,
+        expires_at=timezone.now() + timedelta(seconds=TTL),
+    )
+    return response
@@ -0,0 +1,59 @@
+from bisect import bisect_right
+
+
+class IntervalSet:
+    """
+    Sorted set of merged, half-open intervals ``[start, end)``.
+
+    Works with any ordered values (datetimes, ints) – building is
+    O(n log n), overlap checks are O(log n) and gaps are O(log n + k).
+    An interval overlaps the set also when it is fully contained in, or
+    fully contains, a stored interval.
+    """
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(i for i in intervals if i[0] < i[1]):
+            if self.ends and start <= self.ends[-1]:
+                if end > self.ends[-1]:
+                    self.ends[-1] = end
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def overlaps(self, start, end):
+        # pierwszy przedział kończący się po `start`
+        i = bisect_right(self.ends, start)
+        return i < len(self.starts) and self.starts[i] < end and start < end
+
+    def gaps(self, lo, hi):
+        """Free ``(start, end)`` ranges inside [lo, hi)."""
+        free = []
+        current = lo
+        i = bisect_right(self.ends, lo)
+        while i < len(self.starts) and self.starts[i] < hi:
+            if self.starts[i] > current:
+                free.append((current, self.starts[i]))
+            current = max(current, self.ends[i])
+            i += 1
+        if current < hi:
+            free.append((current, hi))
+        return free
+
+    def grid(self, lo, hi, step):
+        """Free ``(start, start + step)`` cells aligned to ``lo`` inside [lo, hi)."""
+        cells = []
+        for start, end in self.gaps(lo, hi):
+            # pierwsza komórka siatki zaczynająca się nie wcześniej niż `start`
+            current = lo + -((lo - start) // step) * step
+            while current + step <= end:
+                cells.append((current, current + step))
+                current += step
+        return cells
@@ -0,0 +1,134 @@
+"""
+Keyset ("cursor") pagination for long lists. A page is fetched with
+``WHERE (key, id) > (cursor)`` on an index instead of ``OFFSET``, so deep
+pages cost the same as the first one.
+"""
+
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([value.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return ``(datetime, pk)``; raises ``ValueError`` for a broken token."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        value, pk = json.loads(raw)
+        value = parse_datetime(value)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Nieprawidłowy kursor.")
+    if value is None or not isinstance(pk, int):
+        raise ValueError("Nieprawidłowy kursor.")
+    return value, pk
+
+
+class KeysetPage:
+    def __init__(self, items, field, has_next, has_previous):
+        self.object_list = items
+        self.field = field
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    def _cursor(self, obj):
+        return encode_cursor(getattr(obj, self.field), obj.pk)
+
+    @property
+    def next_cursor(self):
+        if self.has_next_page and self.object_list:
+            return self._cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous_page and self.object_list:
+            return self._cursor(self.object_list[0])
+
+
+def _after(field, value, pk, descending):
+    op = "lt" if descending else "gt"
+    return Q(**{f"{field}__{op}": value}) | Q(**{field: value, f"pk__{op}": pk})
+
+
+def paginate_keyset(
+    queryset, field, per_page, after=None, before=None, descending=False
+):
+    """
+    One page of ``queryset`` ordered by ``(field, pk)``. ``after``/``before``
+    are cursors taken from a neighbouring page. Raises ``ValueError`` for
+    an invalid cursor.
+    """
+    order = [f"-{field}", "-pk"] if descending else [field, "pk"]
+    reverse = [o.lstrip("-") if o.startswith("-") else f"-{o}" for o in order]
+
+    if before:
+        value, pk = decode_cursor(before)
+        rows = list(
+            queryset.filter(_after(field, value, pk, not descending)).order_by(
+                *reverse
+            )[: per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        return KeysetPage(items, field, has_next=True, has_previous=has_previous)
+
+    if after:
+        value, pk = decode_cursor(after)
+        queryset = queryset.filter(_after(field, value, pk, descending))
+    rows = list(queryset.order_by(*order)[: per_page + 1])
+    return KeysetPage(
+        rows[:per_page],
+        field,
+        has_next=len(rows) > per_page,
+        has_previous=bool(after),
+    )
+
+
+class KeysetPaginationMixin:
+    """
+    ``ListView`` mixin: ``page_obj`` becomes a ``KeysetPage`` driven by the
+    ``after``/``before`` query parameters.
+    """
+
+    keyset_field = None
+    keyset_descending = False
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            page = paginate_keyset(
+                queryset,
+                self.keyset_field,
+                page_size,
+                after=self.request.GET.get("after"),
+                before=self.request.GET.get("before"),
+                descending=self.keyset_descending,
+            )
+        except ValueError:
+            # zepsuty kursor – wracamy na pierwszą stronę
+            page = paginate_keyset(
+                queryset,
+                self.keyset_field,
+                page_size,
+                descending=self.keyset_descending,
+            )
+        return None, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,36 @@
+from django.core.cache import cache
+
+# Liczniki widoczne w `manage.py booking_metrics`
+METRICS = [
+    "availability_cache_hit",
+    "availability_cache_miss",
+    "hold_granted",
+    "hold_converted",
+    "hold_expired",
+    "hold_released",
+]
+
+
+def _key(name):
+    return f"metrics:{name}"
+
+
+def incr(name, delta=1):
+    """Increment a shared counter kept in the default cache."""
+    key = _key(name)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Licznik jeszcze nie istnieje (albo wypadł z cache)
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def get_counters(names=None):
+    names = list(names or METRICS)
+    values = cache.get_many([_key(n) for n in names])
+    return {n: values.get(_key(n), 0) for n in names}
+
+
+def reset_counters(names=None):
+    cache.delete_many([_key(n) for n in (names or METRICS)])
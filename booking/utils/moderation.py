@@ -0,0 +1,94 @@
+"""
+Bulk approve/reject of pending reservations from the admin panel. Each
+action is a few set-based statements in one transaction, regardless of
+how many reservations are selected.
+"""
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from booking.models import Reservation, TimeSlot, WaitlistEntry
+from booking.utils.availability import set_slots_free
+from booking.utils.dashboard import invalidate_dashboard_stats
+from booking.utils.events import publish_slots
+from booking.utils.rollup import record_transition
+from booking.utils.waitlist import promote_waitlist
+
+# Ile rezerwacji można zmienić jednym żądaniem
+MAX_BULK_RESERVATIONS = 500
+
+
+def _lock_pending(ids):
+    """
+    Lock the reservations among ``ids`` that are still pending and return
+    their ``(pk, slot_id, created_at, service_id, status)`` rows.
+    """
+    return list(
+        Reservation.objects.select_for_update(of=("self",))
+        .filter(pk__in=ids, status=Reservation.Status.PENDING)
+        .order_by("pk")
+        .values_list("pk", "slot_id", "created_at", "service_id", "status")
+    )
+
+
+def approve_reservations(ids):
+    """Approve the pending reservations among ``ids``; returns their count."""
+    with transaction.atomic():
+        rows = _lock_pending(ids)
+        approved = Reservation.objects.filter(pk__in=[row[0] for row in rows]).update(
+            status=Reservation.Status.APPROVED
+        )
+        # delty z zablokowanych wierszy – dokładnie tych, które zmieniliśmy
+        record_transition([row[2:] for row in rows], Reservation.Status.APPROVED)
+    # update() nie wysyła sygnałów
+    invalidate_dashboard_stats()
+    return approved
+
+
+def reject_reservations(ids):
+    """
+    Reject the pending reservations among ``ids``: one ``UPDATE`` copies the
+    slot times into ``archived_start``/``archived_end`` and detaches the
+    slots; the freed slots go to their waitlists. Returns
+    ``(rejected, promoted)`` counts.
+    """
+    pending = Reservation.objects.filter(pk__in=ids, status=Reservation.Status.PENDING)
+    slot = TimeSlot.objects.filter(pk=OuterRef("slot_id"))
+
+    with transaction.atomic():
+        # te same blokady co przy rezerwacji – w stałej kolejności, sloty
+        # przed rezerwacjami, tak jak przy anulowaniu
+        list(
+            TimeSlot.objects.select_for_update()
+            .filter(pk__in=pending.exclude(slot=None).values("slot_id"))
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        rows = _lock_pending(ids)
+        rejected = Reservation.objects.filter(pk__in=[row[0] for row in rows]).update(
+            status=Reservation.Status.REJECTED,
+            archived_start=Coalesce(
+                Subquery(slot.values("start")[:1]), F("archived_start")
+            ),
+            archived_end=Coalesce(Subquery(slot.values("end")[:1]), F("archived_end")),
+            slot=None,
+        )
+        record_transition([row[2:] for row in rows], Reservation.Status.REJECTED)
+        invalidate_dashboard_stats()
+        slot_ids = sorted({row[1] for row in rows if row[1]})
+        if not slot_ids:
+            return rejected, 0
+
+        # update() nie wysyła sygnałów – dostępność aktualizujemy sami
+        publish_slots(set_slots_free(slot_ids, True), "freed")
+        waiting = (
+            WaitlistEntry.objects.filter(slot_id__in=slot_ids)
+            .values_list("slot_id", flat=True)
+            .distinct()
+        )
+        promoted = 0
+        for slot in TimeSlot.objects.filter(pk__in=list(waiting)).order_by("pk"):
+            if promote_waitlist(slot):
+                promoted += 1
+    return rejected, promoted
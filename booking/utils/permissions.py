@@ -1,8 +1,54 @@
+"""
+Role resolution: a user's roles are their group names. They are memoised
+on the user object (``request.user`` lives for one request) and cached per
+user; ``booking.signals`` drops the cache entry whenever group membership
+changes, once the change is committed.
+
+The cache must be shared by all workers (see ``booking.checks``); the short
+timeout bounds how long a revoked role can survive a reader that raced the
+invalidation.
+"""
+
+from django.conf import settings
 from django.contrib.auth.decorators import user_passes_test
+from django.core.cache import cache
+from django.db import transaction
+
+ADMIN_GROUP = "Admin"
+
+# Sygnały czyszczą wpis po zmianie grup; krótki czas życia ogranicza
+# skutki wyścigu z równoległym odczytem (np. odebrane uprawnienia admina)
+ROLES_TIMEOUT = getattr(settings, "BOOKING_ROLES_CACHE_TIMEOUT", 60)
+
+
+def _roles_key(user_id):
+    return f"roles:{user_id}"
+
+
+def get_roles(user):
+    """Group names of ``user`` as a frozenset; empty for anonymous users."""
+    if not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, "_booking_roles", None)
+    if roles is None:
+        roles = cache.get(_roles_key(user.pk))
+        if roles is None:
+            roles = frozenset(user.groups.values_list("name", flat=True))
+            cache.set(_roles_key(user.pk), roles, ROLES_TIMEOUT)
+        user._booking_roles = roles
+    return roles
+
+
+def invalidate_roles(user_ids):
+    """Drop cached roles of ``user_ids`` once the current transaction commits."""
+    # lista liczona od razu – np. przed group.user_set.clear()
+    keys = [_roles_key(pk) for pk in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
 
 
 def is_admin(user):
-    return user.is_authenticated and user.groups.filter(name="Admin").exists()
+    return ADMIN_GROUP in get_roles(user)
 
 
 admin_required = user_passes_test(is_admin)
@@ -0,0 +1,209 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from booking.models import Reservation, SlotHold, TimeSlot
+from booking.utils import metrics
+from booking.utils.availability import ACTIVE_STATUSES, set_slots_free
+from booking.utils.dashboard import invalidate_dashboard_stats
+from booking.utils.events import publish_slots
+from booking.utils.holds import claim_holds, hold_expiry, release_holds
+from booking.utils.rollup import record
+
+SLOT_TAKEN = "Termin już zajęty."
+SLOT_HELD = "Ktoś właśnie rezerwuje ten termin. Spróbuj za kilka minut."
+
+# Maksymalna liczba slotów rezerwowanych jednym żądaniem
+MAX_CART_SLOTS = 24
+
+
+class SlotUnavailable(Exception):
+    """The slot cannot be booked (taken, inactive or in the past)."""
+
+
+class SlotsUnavailable(SlotUnavailable):
+    """Some slots of a cart cannot be booked; ``conflicts`` lists their ids."""
+
+    def __init__(self, conflicts):
+        self.conflicts = sorted(conflicts)
+        super().__init__("Część terminów jest już zajęta lub niedostępna.")
+
+
+def _lock_bookable_slot(service, slot_id):
+    slot = (
+        TimeSlot.objects.select_for_update()
+        .filter(pk=slot_id, service=service, is_active=True)
+        .first()
+    )
+    if slot is None:
+        raise SlotUnavailable("Wybrany termin jest niedostępny.")
+    if slot.start < timezone.now():
+        raise SlotUnavailable("Nie możesz zarezerwować terminu w przeszłości.")
+    if Reservation.objects.filter(slot=slot, status__in=ACTIVE_STATUSES).exists():
+        raise SlotUnavailable(SLOT_TAKEN)
+    return slot
+
+
+def hold_slot(user, service, slot_id):
+    """
+    Hold a slot for ``user`` for ``HOLD_TTL`` seconds (repeating the call
+    extends the hold). A user keeps one hold per service – the previous one
+    is released. Returns the ``SlotHold``.
+    """
+    with transaction.atomic():
+        slot = _lock_bookable_slot(service, slot_id)
+        now = timezone.now()
+        current = SlotHold.objects.filter(pk=slot.pk).first()
+        if current and current.user_id != user.pk:
+            if current.is_active(now):
+                raise SlotUnavailable(SLOT_HELD)
+            metrics.incr("hold_expired")
+
+        previous = list(
+            SlotHold.objects.filter(user=user, slot__service=service)
+            .exclude(pk=slot.pk)
+            .values_list("pk", flat=True)
+        )
+        if previous:
+            SlotHold.objects.filter(pk__in=previous).delete()
+            release_holds(previous)
+            metrics.incr("hold_released", len(previous))
+
+        hold, _ = SlotHold.objects.update_or_create(
+            slot=slot, defaults={"user": user, "expires_at": hold_expiry(now)}
+        )
+        if current is None or current.user_id != user.pk:
+            publish_slots(set_slots_free([slot.pk], False), "held")
+            metrics.incr("hold_granted")
+    return hold
+
+
+def book_slot(user, service, slot_id):
+    """
+    Reserve a slot as a single atomic operation.
+
+    The slot row is locked (``SELECT ... FOR UPDATE`` on PostgreSQL, a write
+    transaction on SQLite), so concurrent bookings are serialised; the
+    one-to-one constraint on ``Reservation.slot`` is the last line of
+    defence and is reported as ``SlotUnavailable`` as well. The user's own
+    hold on the slot is converted; somebody else's active hold blocks it.
+    """
+    with transaction.atomic():
+        slot = _lock_bookable_slot(service, slot_id)
+        # blokada użytkownika zamienia się w rezerwację; cudza aktywna – odmowa
+        if claim_holds([slot.pk], user):
+            raise SlotUnavailable(SLOT_HELD)
+        try:
+            with transaction.atomic():
+                return Reservation.objects.create(user=user, service=service, slot=slot)
+        except IntegrityError:
+            raise SlotUnavailable(SLOT_TAKEN)
+
+
+def move_reservation(reservation_id, user, slot_id):
+    """
+    Move a pending reservation of ``user`` to another slot of its service,
+    with the same locking and hold rules as ``book_slot``. The old slot goes
+    to its waitlist in the same transaction. Returns the updated
+    reservation.
+    """
+    # waitlist importuje ten moduł (SlotUnavailable)
+    from booking.utils.waitlist import promote_waitlist
+
+    with transaction.atomic():
+        reservation = (
+            Reservation.objects.select_for_update(of=("self",))
+            .filter(pk=reservation_id, user=user, status=Reservation.Status.PENDING)
+            .select_related("service")
+            .first()
+        )
+        if reservation is None:
+            raise SlotUnavailable("Tej rezerwacji nie można już zmienić.")
+        if reservation.slot_id == slot_id:
+            return reservation
+        # stary i nowy termin blokujemy w stałej kolejności – zamiany
+        # terminów między dwiema rezerwacjami się nie zakleszczą
+        locked = {
+            slot.pk: slot
+            for slot in TimeSlot.objects.select_for_update()
+            .filter(pk__in=[reservation.slot_id, slot_id])
+            .order_by("pk")
+        }
+        old_slot = locked.get(reservation.slot_id)
+        slot = _lock_bookable_slot(reservation.service, slot_id)
+        if claim_holds([slot.pk], user):
+            raise SlotUnavailable(SLOT_HELD)
+        reservation.slot = slot
+        try:
+            with transaction.atomic():
+                reservation.save(update_fields=["slot"])
+        except IntegrityError:
+            raise SlotUnavailable(SLOT_TAKEN)
+        if old_slot is not None:
+            # jak przy anulowaniu – zwolniony termin dostaje kolejka
+            promote_waitlist(old_slot)
+    return reservation
+
+
+def book_slots(user, service, slot_ids):
+    """
+    Reserve several slots all-or-nothing: one locking query validates every
+    slot, one ``bulk_create`` inserts the reservations. Raises
+    ``SlotsUnavailable`` listing the conflicting slots.
+    """
+    slot_ids = sorted(set(slot_ids))
+    if not slot_ids:
+        raise SlotsUnavailable([])
+    if len(slot_ids) > MAX_CART_SLOTS:
+        raise SlotUnavailable(f"Maksymalnie {MAX_CART_SLOTS} terminów naraz.")
+
+    with transaction.atomic():
+        bookable = set(
+            TimeSlot.objects.select_for_update()
+            .filter(
+                pk__in=slot_ids,
+                service=service,
+                is_active=True,
+                start__gte=timezone.now(),
+            )
+            .annotate(
+                reserved=Exists(
+                    Reservation.objects.filter(
+                        slot=OuterRef("pk"), status__in=ACTIVE_STATUSES
+                    )
+                )
+            )
+            .filter(reserved=False)
+            # stała kolejność blokad – brak zakleszczeń między koszykami
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        conflicts = [pk for pk in slot_ids if pk not in bookable]
+        if conflicts:
+            raise SlotsUnavailable(conflicts)
+        conflicts = claim_holds(slot_ids, user)
+        if conflicts:
+            raise SlotsUnavailable(conflicts)
+
+        try:
+            with transaction.atomic():
+                reservations = Reservation.objects.bulk_create(
+                    Reservation(user=user, service=service, slot_id=pk)
+                    for pk in slot_ids
+                )
+        except IntegrityError:
+            taken = Reservation.objects.filter(slot_id__in=slot_ids).values_list(
+                "slot_id", flat=True
+            )
+            raise SlotsUnavailable(taken)
+
+        # bulk_create nie wysyła sygnałów – dostępność i statystyki aktualizujemy sami
+        publish_slots(set_slots_free(slot_ids, False), "taken")
+        record(
+            reservations[0].created_at,
+            service.pk,
+            Reservation.Status.PENDING,
+            len(reservations),
+        )
+        invalidate_dashboard_stats()
+    return reservations
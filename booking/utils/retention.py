@@ -0,0 +1,144 @@
+"""
+Retention: closed reservations and past slots older than the cutoff move to
+``ArchivedReservation``/``ArchivedTimeSlot``. Work is done in batches, each
+in its own transaction, so an interrupted run simply continues on the next
+one.
+
+Rows are removed with plain ``DELETE`` statements, without model signals:
+an archived reservation must stay counted in the daily rollup and must not
+announce its (past) slot as freed.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from booking.models import (
+    ArchivedReservation,
+    ArchivedTimeSlot,
+    Reservation,
+    SlotHold,
+    TimeSlot,
+    WaitlistEntry,
+)
+from booking.utils.dashboard import invalidate_dashboard_stats
+
+RETENTION_DAYS = getattr(settings, "BOOKING_RETENTION_DAYS", 90)
+BATCH_SIZE = 500
+
+
+def retention_cutoff(days=None, now=None):
+    days = RETENTION_DAYS if days is None else days
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def archivable_reservations(cutoff):
+    """Reservations whose slot ended before ``cutoff`` or that were closed then."""
+    return Reservation.objects.filter(
+        Q(slot__end__lt=cutoff)
+        | Q(slot=None, archived_end__lt=cutoff)
+        | Q(slot=None, archived_end=None, created_at__lt=cutoff)
+    )
+
+
+def archivable_slots(cutoff):
+    """Past slots no live reservation points to any more."""
+    return TimeSlot.objects.filter(end__lt=cutoff, reservation__isnull=True)
+
+
+def _delete_rows(model, ids):
+    table = connection.ops.quote_name(model._meta.db_table)
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+
+
+def archive_reservations_batch(cutoff, batch_size=BATCH_SIZE):
+    """Archive up to ``batch_size`` reservations; returns how many."""
+    with transaction.atomic():
+        rows = list(
+            archivable_reservations(cutoff)
+            .select_related("slot")
+            .select_for_update(of=("self",))
+            .order_by("pk")[:batch_size]
+        )
+        if not rows:
+            return 0
+        ArchivedReservation.objects.bulk_create(
+            [
+                ArchivedReservation(
+                    id=r.pk,
+                    user_id=r.user_id,
+                    service_id=r.service_id,
+                    status=r.status,
+                    start=r.slot.start if r.slot else r.archived_start,
+                    end=r.slot.end if r.slot else r.archived_end,
+                    created_at=r.created_at,
+                )
+                for r in rows
+            ],
+            # wiersz już w archiwum (np. po ręcznej kopii) nie przerywa przebiegu
+            ignore_conflicts=True,
+        )
+        _delete_rows(Reservation, [r.pk for r in rows])
+    invalidate_dashboard_stats()
+    return len(rows)
+
+
+def archive_slots_batch(cutoff, batch_size=BATCH_SIZE):
+    """Archive up to ``batch_size`` past slots; returns how many."""
+    with transaction.atomic():
+        rows = list(
+            archivable_slots(cutoff)
+            .select_for_update(of=("self",))
+            .order_by("pk")[:batch_size]
+        )
+        if not rows:
+            return 0
+        ids = [s.pk for s in rows]
+        ArchivedTimeSlot.objects.bulk_create(
+            [
+                ArchivedTimeSlot(
+                    id=s.pk,
+                    service_id=s.service_id,
+                    start=s.start,
+                    end=s.end,
+                    is_active=s.is_active,
+                    created_at=s.created_at,
+                )
+                for s in rows
+            ],
+            ignore_conflicts=True,
+        )
+        # blokady i kolejki do minionych terminów nie mają już znaczenia;
+        # indeksy dostępności przeszłych dni nie są czytane, więc ich nie ruszamy
+        SlotHold.objects.filter(pk__in=ids).delete()
+        WaitlistEntry.objects.filter(slot_id__in=ids).delete()
+        _delete_rows(TimeSlot, ids)
+    return len(rows)
+
+
+def archive(cutoff, batch_size=BATCH_SIZE, max_batches=None, on_batch=None):
+    """
+    Archive reservations first (they pin their slots), then slots, batch by
+    batch until nothing is left or ``max_batches`` ran. ``on_batch(kind,
+    count)`` is called after each batch. Returns ``(reservations, slots)``.
+    """
+    totals = {"reservations": 0, "slots": 0}
+    batches = 0
+    for kind, step in (
+        ("reservations", archive_reservations_batch),
+        ("slots", archive_slots_batch),
+    ):
+        while max_batches is None or batches < max_batches:
+            count = step(cutoff, batch_size)
+            if not count:
+                break
+            batches += 1
+            totals[kind] += count
+            if on_batch:
+                on_batch(kind, count)
+    return totals["reservations"], totals["slots"]
@@ -0,0 +1,179 @@
+"""
+Daily reservation rollup (``ReservationDailyStat``): reservations counted
+per creation day, service and current status. Charts read only this table.
+
+Every path that changes reservations applies a delta here – the model
+signals for single rows, the bulk helpers for set-based updates.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from booking.models import ArchivedReservation, Reservation, ReservationDailyStat
+from booking.utils.availability import day_start
+
+GRANULARITIES = {
+    "day": None,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+
+
+def apply_deltas(deltas):
+    """
+    Add ``{(day, service_id, status): n}`` to the rollup: an ``UPDATE`` per
+    touched row, an ``INSERT`` for rows that do not exist yet. Counts never
+    go below zero.
+    """
+    for (day, service_id, status), delta in deltas.items():
+        if not delta:
+            continue
+        lookup = {"day": day, "service_id": service_id, "status": status}
+        # rozjechany licznik naprawia backfill – ujemnego nie zapisujemy
+        count = Greatest(F("count") + delta, 0)
+        if ReservationDailyStat.objects.filter(**lookup).update(count=count):
+            continue
+        try:
+            with transaction.atomic():
+                ReservationDailyStat.objects.create(count=max(delta, 0), **lookup)
+        except IntegrityError:
+            # równoległe żądanie właśnie utworzyło ten wiersz
+            ReservationDailyStat.objects.filter(**lookup).update(count=count)
+
+
+def record(created_at, service_id, status, delta=1):
+    apply_deltas({(timezone.localdate(created_at), service_id, status): delta})
+
+
+def record_transition(rows, new_status):
+    """
+    Move reservations to ``new_status`` in the rollup. ``rows`` are the
+    ``(created_at, service_id, status)`` of the rows actually updated, read
+    under ``select_for_update`` in the same transaction.
+    """
+    deltas = Counter()
+    for created_at, service_id, status in rows:
+        if status == new_status:
+            continue
+        day = timezone.localdate(created_at)
+        deltas[(day, service_id, status)] -= 1
+        deltas[(day, service_id, new_status)] += 1
+    apply_deltas(deltas)
+
+
+def _lock_rollup():
+    """
+    Block rollup writers (``apply_deltas``) until the transaction ends.
+    On PostgreSQL ``EXCLUSIVE`` still lets readers in; SQLite transactions
+    here are ``IMMEDIATE`` and hold the database write lock anyway.
+    """
+    if connection.vendor == "postgresql":
+        table = connection.ops.quote_name(ReservationDailyStat._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+
+
+def backfill(date_from=None, date_to=None):
+    """
+    Rebuild the rollup (optionally only for ``[date_from, date_to]``) from
+    the live and archived reservations. Returns the number of rollup rows
+    written.
+
+    Counting and replacing run in one transaction that holds the rollup
+    lock: a booking that applied its delta before the lock is committed
+    (and counted) by the time the counts are read, one that comes later
+    applies its delta on top of the rebuilt rows.
+    """
+    with transaction.atomic():
+        _lock_rollup()
+        stats = ReservationDailyStat.objects.all()
+        if date_from:
+            stats = stats.filter(day__gte=date_from)
+        if date_to:
+            stats = stats.filter(day__lte=date_to)
+
+        # zarchiwizowane rezerwacje nadal liczą się do wykresów
+        counts = Counter()
+        for model in (Reservation, ArchivedReservation):
+            rows = model.objects.all()
+            # zakres po created_at, nie po TruncDate – inaczej indeks nie zadziała
+            if date_from:
+                rows = rows.filter(created_at__gte=day_start(date_from))
+            if date_to:
+                rows = rows.filter(
+                    created_at__lt=day_start(date_to + timedelta(days=1))
+                )
+            rows = (
+                rows.annotate(day=TruncDate("created_at"))
+                .values("day", "service_id", "status")
+                .annotate(n=Count("id"))
+                .order_by()
+            )
+            for row in rows.iterator():
+                counts[(row["day"], row["service_id"], row["status"])] += row["n"]
+
+        stats.delete()
+        created = ReservationDailyStat.objects.bulk_create(
+            (
+                ReservationDailyStat(
+                    day=day, service_id=service_id, status=status, count=n
+                )
+                for (day, service_id, status), n in counts.items()
+            ),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def _bucket_start(day, granularity):
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(day, granularity):
+    if granularity == "week":
+        return day + timedelta(days=7)
+    if granularity == "month":
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def chart_series(date_from, date_to, granularity="day", service_ids=None):
+    """
+    Reservations created between ``date_from`` and ``date_to`` (inclusive)
+    grouped into day/week/month buckets. Returns ``(buckets, {status:
+    [counts]})``; empty buckets are filled with zeros.
+    """
+    stats = ReservationDailyStat.objects.filter(day__gte=date_from, day__lte=date_to)
+    if service_ids:
+        stats = stats.filter(service_id__in=service_ids)
+    trunc = GRANULARITIES[granularity]
+    bucket = trunc("day") if trunc else F("day")
+    rows = (
+        stats.annotate(bucket=bucket)
+        .values("bucket", "status")
+        .annotate(n=Sum("count"))
+        .order_by()
+    )
+
+    buckets = []
+    current = _bucket_start(date_from, granularity)
+    while current <= date_to:
+        buckets.append(current)
+        current = _next_bucket(current, granularity)
+
+    position = {b: i for i, b in enumerate(buckets)}
+    series = {status: [0] * len(buckets) for status in Reservation.Status.values}
+    for row in rows:
+        i = position.get(row["bucket"])
+        if i is not None:
+            series[row["status"]][i] += row["n"]
+    return buckets, series
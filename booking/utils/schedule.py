@@ -0,0 +1,158 @@
+"""
+Expansion of ``ScheduleTemplate`` rows into ``TimeSlot`` rows.
+
+Candidates of all templates are checked against the existing slots with a
+single query and inserted with batched ``bulk_create``; slots that collide
+with an existing (or another generated) slot of the same service are
+skipped.
+"""
+
+import time as clock
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+
+from booking.models import TimeSlot
+from booking.utils.availability import day_start, invalidate_availability
+from booking.utils.intervals import IntervalSet
+
+BATCH_SIZE = 1000
+
+GenerationResult = namedtuple(
+    "GenerationResult", ["candidates", "created", "skipped", "seconds"]
+)
+
+
+def _wall_clock_moment(naive):
+    """
+    ``naive`` local wall-clock time as an aware UTC datetime; ``None`` when
+    it does not exist (skipped by the spring DST change). An ambiguous
+    autumn time means its first occurrence.
+    """
+    moment = timezone.make_aware(naive).astimezone(dt_timezone.utc)
+    if timezone.make_naive(moment) != naive:
+        return None
+    return moment
+
+
+def expand_template(template, since=None):
+    """
+    Yield ``(day, start, end)`` of every slot described by ``template``.
+    Slots start at the template's wall-clock times and last exactly the
+    slot duration, also on DST change days (a start time that does not
+    exist that day is skipped).
+    """
+    since = since or timezone.now()
+    step = timedelta(minutes=template.get_slot_duration())
+    weekdays = template.weekday_numbers()
+    exceptions = template.exception_dates()
+
+    day = template.valid_from
+    while day <= template.valid_until:
+        if day.weekday() in weekdays and day not in exceptions:
+            wall = datetime.combine(day, template.start_time)
+            close = datetime.combine(day, template.end_time)
+            while wall + step <= close:
+                # arytmetyka w UTC – na datach ze strefą byłaby "po zegarze"
+                start = _wall_clock_moment(wall)
+                if start is not None and start >= since:
+                    yield day, start, start + step
+                wall += step
+        day += timedelta(days=1)
+
+
+def insert_slots(slots, batch_size=BATCH_SIZE):
+    """
+    ``bulk_create`` ``slots`` skipping conflicting rows and return the keys
+    ``(service_id, start, end)`` of the rows actually inserted – with
+    ``ignore_conflicts`` the database does not report them, so the rows are
+    stamped with one ``created_at`` and read back.
+    """
+    if not slots:
+        return set()
+    stamp = timezone.now()
+    for slot in slots:
+        slot.created_at = stamp
+    TimeSlot.objects.bulk_create(slots, batch_size=batch_size, ignore_conflicts=True)
+    starts = [slot.start for slot in slots]
+    return set(
+        TimeSlot.objects.filter(
+            service_id__in={slot.service_id for slot in slots},
+            start__gte=min(starts),
+            start__lte=max(starts),
+            created_at=stamp,
+        ).values_list("service_id", "start", "end")
+    )
+
+
+def _candidates(templates, since):
+    """``{(service_id, day): [(start, end), ...]}`` for all templates."""
+    grouped = defaultdict(list)
+    for template in templates:
+        for day, start, end in expand_template(template, since):
+            grouped[(template.service_id, day)].append((start, end))
+    return grouped
+
+
+def generate_slots(templates, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Create the slots of ``templates``. Existing slots are fetched with one
+    query; a candidate is skipped when it overlaps an existing slot or one
+    generated earlier in the same run. Returns a ``GenerationResult``;
+    ``created`` counts only the rows actually inserted.
+    """
+    started = clock.perf_counter()
+    templates = list(templates)
+    grouped = _candidates(templates, timezone.now())
+    candidates = sum(len(v) for v in grouped.values())
+    if not grouped:
+        return GenerationResult(0, 0, 0, clock.perf_counter() - started)
+
+    days = [day for _, day in grouped]
+    existing_rows = TimeSlot.objects.filter(
+        service_id__in={service_id for service_id, _ in grouped},
+        start__gte=day_start(min(days)),
+        start__lt=day_start(max(days) + timedelta(days=1)),
+    ).values_list("service_id", "start", "end", "is_active")
+
+    existing = defaultdict(list)
+    taken = set()
+    for service_id, start, end, is_active in existing_rows:
+        taken.add((service_id, start, end))
+        if is_active:
+            existing[(service_id, timezone.localdate(start))].append((start, end))
+
+    new_slots = []
+    for (service_id, day), slots in grouped.items():
+        busy = IntervalSet(existing.get((service_id, day), ()))
+        last_end = None
+        for start, end in sorted(slots):
+            if (service_id, start, end) in taken or busy.overlaps(start, end):
+                continue
+            if last_end is not None and start < last_end:
+                continue
+            new_slots.append(TimeSlot(service_id=service_id, start=start, end=end))
+            last_end = end
+
+    if dry_run:
+        created = len(new_slots)
+    else:
+        with transaction.atomic():
+            # ignore_conflicts: wiersz wstawiony równolegle nie przerywa
+            # generowania, ale nie liczy się jako utworzony
+            inserted = insert_slots(new_slots, batch_size)
+            # bulk_create nie wysyła sygnałów – dostępność unieważniamy sami
+            invalidate_availability(
+                {
+                    (service_id, timezone.localdate(start))
+                    for service_id, start, _ in inserted
+                }
+            )
+        created = len(inserted)
+
+    return GenerationResult(
+        candidates, created, candidates - created, clock.perf_counter() - started
+    )
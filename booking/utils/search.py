@@ -0,0 +1,119 @@
+"""
+Full-text service search. PostgreSQL keeps a weighted ``tsvector`` in
+``booking_service.search_vector`` (GIN index), SQLite a FTS5 table
+``booking_service_fts``; both are created by migration 0014 and updated on
+``Service`` save/delete by ``booking.signals``. Every search term is a
+prefix, so the same query serves the result list and typeahead.
+
+On other databases ``search_service_ids`` returns ``None`` and callers fall
+back to ``icontains``.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from booking.models import Service
+
+# Ile wyników zwraca wyszukiwarka / podpowiedzi
+SEARCH_LIMIT = 200
+SUGGEST_LIMIT = 8
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+_PG_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+
+def _terms(query):
+    return [t.lower() for t in _TERM.findall(query or "")][:10]
+
+
+def is_supported():
+    return connection.vendor in ("postgresql", "sqlite")
+
+
+def search_service_ids(query, limit=SEARCH_LIMIT):
+    """
+    Ids of services matching every term of ``query`` (as prefixes), best
+    match first; name matches outrank description matches. ``None`` when
+    the database has no full-text backend.
+    """
+    if not is_supported():
+        return None
+    terms = _terms(query)
+    if not terms:
+        return []
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT id FROM booking_service, to_tsquery('simple', %s) q "
+                "WHERE search_vector @@ q "
+                "ORDER BY ts_rank(search_vector, q) DESC, id LIMIT %s",
+                [" & ".join(f"{t}:*" for t in terms), limit],
+            )
+        else:
+            cursor.execute(
+                "SELECT rowid FROM booking_service_fts "
+                "WHERE booking_service_fts MATCH %s "
+                # bm25: mniejszy = lepszy; nazwa waży 10x więcej niż opis
+                "ORDER BY bm25(booking_service_fts, 10.0, 1.0), rowid LIMIT %s",
+                [" AND ".join(f'"{t}"*' for t in terms), limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_services(query, queryset=None, limit=SEARCH_LIMIT):
+    """
+    Services of ``queryset`` (default: all) matching ``query`` as a list,
+    best match first. Ranked ids are re-ordered in Python – a ``CASE`` with
+    hundreds of branches costs more than the search itself.
+    """
+    queryset = Service.objects.all() if queryset is None else queryset
+    ids = search_service_ids(query, limit)
+    if ids is None:
+        return list(
+            queryset.filter(Q(name__icontains=query) | Q(description__icontains=query))
+        )
+    position = {pk: i for i, pk in enumerate(ids)}
+    return sorted(queryset.filter(pk__in=ids), key=lambda s: position[s.pk])
+
+
+def index_service(service):
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE booking_service SET search_vector = {_PG_VECTOR} "
+                "WHERE id = %s",
+                [service.pk],
+            )
+    elif connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT OR REPLACE INTO booking_service_fts "
+                "(rowid, name, description) VALUES (%s, %s, %s)",
+                [service.pk, service.name, service.description],
+            )
+
+
+def unindex_service(pk):
+    # w PostgreSQL wektor znika razem z wierszem usługi
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM booking_service_fts WHERE rowid = %s", [pk])
+
+
+def rebuild_index():
+    """Re-index every service (after bulk changes that skip signals)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"UPDATE booking_service SET search_vector = {_PG_VECTOR}")
+        elif connection.vendor == "sqlite":
+            cursor.execute("DELETE FROM booking_service_fts")
+            cursor.execute(
+                "INSERT INTO booking_service_fts (rowid, name, description) "
+                "SELECT id, name, description FROM booking_service"
+            )
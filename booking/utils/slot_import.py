@@ -0,0 +1,159 @@
+"""
+CSV import of time slots (``service,start,end`` rows). The file is read as
+a stream and processed in chunks: every chunk is validated like
+``TimeSlot.clean``, checked for duplicates of the ``(service, start, end)``
+key with one query and inserted with ``bulk_create``.
+"""
+
+import csv
+import time as clock
+from collections import namedtuple
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from booking.models import Service, TimeSlot
+from booking.utils.availability import invalidate_availability, local_day
+from booking.utils.schedule import insert_slots
+
+CHUNK_SIZE = 1000
+BATCH_SIZE = 1000
+
+COLUMNS = ("service", "start", "end")
+
+ImportResult = namedtuple("ImportResult", ["rows", "created", "rejected", "seconds"])
+
+
+class ImportFileError(ValueError):
+    """The file itself is unusable (e.g. missing columns)."""
+
+
+def _service_lookup():
+    """Map both ids and names to service ids – services are few."""
+    lookup = {}
+    for pk, name in Service.objects.values_list("pk", "name"):
+        lookup.setdefault(name.strip().casefold(), pk)
+        lookup[str(pk)] = pk
+    return lookup
+
+
+def _parse_moment(value):
+    moment = parse_datetime((value or "").strip())
+    if moment is None:
+        raise ValueError(f"Nieprawidłowa data: {value!r}")
+    # jak w TimeSlot.clean – daty bez strefy w strefie projektu
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    # w UTC – godziny ze zmiany czasu porównują się wtedy poprawnie z bazą
+    return moment.astimezone(dt_timezone.utc)
+
+
+def _parse_row(row, services):
+    """Return ``(service_id, start, end)``; raises ``ValueError``."""
+    key = (row.get("service") or "").strip()
+    service_id = services.get(key) or services.get(key.casefold())
+    if service_id is None:
+        raise ValueError(f"Nieznana usługa: {key!r}")
+    start = _parse_moment(row.get("start"))
+    end = _parse_moment(row.get("end"))
+    if end <= start:
+        raise ValueError("Czas zakończenia musi być po czasie rozpoczęcia.")
+    return service_id, start, end
+
+
+def _chunks(reader, size):
+    chunk = []
+    # linia 1 to nagłówek
+    for line, row in enumerate(reader, start=2):
+        chunk.append((line, row))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _import_chunk(chunk, services, seen, batch_size, dry_run):
+    """Validate and insert one chunk; returns ``(created, rejected)``."""
+    rejected = []
+    parsed = []
+    for line, row in chunk:
+        try:
+            key = _parse_row(row, services)
+        except ValueError as exc:
+            rejected.append((line, str(exc)))
+            continue
+        if key in seen:
+            rejected.append((line, "Duplikat wiersza w pliku."))
+            continue
+        seen.add(key)
+        parsed.append((line, key))
+    if not parsed:
+        return 0, rejected
+
+    # jedno zapytanie o istniejące terminy z tego kawałka
+    keys = [key for _, key in parsed]
+    existing = set(
+        TimeSlot.objects.filter(
+            service_id__in={service_id for service_id, _, _ in keys},
+            start__in={start for _, start, _ in keys},
+        ).values_list("service_id", "start", "end")
+    )
+    new_slots = {}
+    for line, (service_id, start, end) in parsed:
+        if (service_id, start, end) in existing:
+            rejected.append((line, "Taki termin już istnieje."))
+            continue
+        new_slots[(service_id, start, end)] = line
+
+    if not new_slots or dry_run:
+        return len(new_slots), rejected
+    with transaction.atomic():
+        # ignore_conflicts: termin dodany równolegle nie przerywa importu,
+        # jego wiersz trafia do odrzuconych
+        inserted = insert_slots(
+            [
+                TimeSlot(service_id=service_id, start=start, end=end)
+                for service_id, start, end in new_slots
+            ],
+            batch_size,
+        )
+        # bulk_create nie wysyła sygnałów – dostępność unieważniamy sami
+        invalidate_availability(
+            {(service_id, local_day(start)) for service_id, start, _ in inserted}
+        )
+    for key, line in new_slots.items():
+        if key not in inserted:
+            rejected.append((line, "Taki termin już istnieje."))
+    return len(inserted), rejected
+
+
+def import_slots(lines, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Import slots from ``lines`` (a text file or any iterable of CSV lines
+    with a ``service,start,end`` header; ``service`` is an id or a name).
+    Rows are committed chunk by chunk. Returns an ``ImportResult`` whose
+    ``rejected`` is a list of ``(line_number, reason)``.
+    """
+    started = clock.perf_counter()
+    reader = csv.DictReader(lines)
+    missing = set(COLUMNS) - set(reader.fieldnames or ())
+    if missing:
+        raise ImportFileError(f"Brak kolumn: {', '.join(sorted(missing))}.")
+
+    services = _service_lookup()
+    seen = set()
+    rows = created = 0
+    rejected = []
+    for chunk in _chunks(reader, chunk_size):
+        rows += len(chunk)
+        chunk_created, chunk_rejected = _import_chunk(
+            chunk, services, seen, batch_size, dry_run
+        )
+        created += chunk_created
+        rejected.extend(chunk_rejected)
+
+    rejected.sort()
+    return ImportResult(rows, created, rejected, clock.perf_counter() - started)
@@ -0,0 +1,149 @@
+from array import array
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from booking.utils.intervals import IntervalSet
+
+# Siatka terminów – tak samo jak w generatorze slotów w panelu admina
+OPEN_HOUR = 9
+CLOSE_HOUR = 22
+
+
+class DayIndex:
+    """
+    Availability of one service on one day as bitmaps over the slot grid
+    (``step`` minutes from OPEN_HOUR to CLOSE_HOUR).
+
+    * ``free`` – bit i set: an active, unreserved slot covers exactly cell i,
+    * ``ids``  – id of the active slot on cell i (0 when empty).
+
+    Active slots that do not fit the grid are kept in ``extra`` as
+    ``(id, start, end, free)`` tuples.
+    """
+
+    __slots__ = ("day", "origin", "step", "cells", "free", "ids", "extra")
+
+    def __init__(self, day, step):
+        self.day = day
+        self.origin = timezone.make_aware(datetime.combine(day, time(OPEN_HOUR)))
+        self.step = int(step)
+        self.cells = (CLOSE_HOUR - OPEN_HOUR) * 60 // self.step
+        self.free = 0
+        self.ids = array("Q", bytes(8 * self.cells))
+        self.extra = []
+
+    @classmethod
+    def build(cls, day, step, rows):
+        """Build from ``(id, start, end, reserved)`` rows of active slots."""
+        index = cls(day, step)
+        for slot_id, start, end, reserved in rows:
+            index.add_slot(slot_id, start, end, free=not reserved)
+        return index
+
+    # ---- siatka ----
+
+    def cell_start(self, cell):
+        return self.origin + timedelta(minutes=cell * self.step)
+
+    def cell_end(self, cell):
+        return self.cell_start(cell + 1)
+
+    def cell_of(self, start, end):
+        """Grid cell matching exactly [start, end) or None."""
+        offset = (start - self.origin).total_seconds() / 60
+        if (
+            offset < 0
+            or offset % self.step
+            or end - start != timedelta(minutes=self.step)
+        ):
+            return None
+        cell = int(offset) // self.step
+        return cell if cell < self.cells else None
+
+    # ---- zapytania ----
+
+    def is_free(self, cell):
+        return bool(self.free >> cell & 1)
+
+    def free_cells(self):
+        """Indexes of the free grid cells, ascending."""
+        bits = self.free
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+
+    def occupied(self):
+        """IntervalSet of all active slots (free or reserved) of the day."""
+        origin, step, ids = self.origin, timedelta(minutes=self.step), self.ids
+        return IntervalSet(
+            [
+                (origin + cell * step, origin + (cell + 1) * step)
+                for cell in range(self.cells)
+                if ids[cell]
+            ]
+            + [(start, end) for _, start, end, _ in self.extra]
+        )
+
+    def free_grid(self):
+        """Grid cells not overlapping any active slot (admin slot generator)."""
+        close = self.origin + timedelta(minutes=self.cells * self.step)
+        return self.occupied().grid(self.origin, close, timedelta(minutes=self.step))
+
+    def free_slots(self):
+        """Ordered ``(id, start, end)`` tuples of free slots."""
+        origin, step, ids = self.origin, timedelta(minutes=self.step), self.ids
+        rows = [
+            (ids[cell], origin + cell * step, origin + (cell + 1) * step)
+            for cell in self.free_cells()
+        ]
+        if self.extra:
+            rows.extend((i, s, e) for i, s, e, free in self.extra if free)
+            rows.sort(key=lambda row: row[1])
+        return rows
+
+    def taken_slots(self):
+        """Ordered ``(id, start, end)`` tuples of reserved or held slots."""
+        origin, step, ids = self.origin, timedelta(minutes=self.step), self.ids
+        rows = [
+            (ids[cell], origin + cell * step, origin + (cell + 1) * step)
+            for cell in range(self.cells)
+            if ids[cell] and not self.is_free(cell)
+        ]
+        if self.extra:
+            rows.extend((i, s, e) for i, s, e, free in self.extra if not free)
+            rows.sort(key=lambda row: row[1])
+        return rows
+
+    def contains_free(self, slot_id, start):
+        cell = self.cell_of(start, start + timedelta(minutes=self.step))
+        if cell is not None and self.ids[cell] == slot_id:
+            return self.is_free(cell)
+        return any(i == slot_id and free for i, _, _, free in self.extra)
+
+    # ---- aktualizacje przyrostowe ----
+
+    def add_slot(self, slot_id, start, end, free=True):
+        cell = self.cell_of(start, end)
+        if cell is not None and not self.ids[cell]:
+            self.ids[cell] = slot_id
+            if free:
+                self.free |= 1 << cell
+            return
+        self.extra.append((slot_id, start, end, free))
+
+    def set_free(self, slot_id, start, end, free):
+        """Flip the free flag of a known slot; False if it is not indexed."""
+        cell = self.cell_of(start, end)
+        if cell is not None and self.ids[cell] == slot_id:
+            if free:
+                self.free |= 1 << cell
+            else:
+                self.free &= ~(1 << cell)
+            return True
+        for pos, (i, s, e, _) in enumerate(self.extra):
+            if i == slot_id:
+                self.extra[pos] = (i, s, e, free)
+                return True
+        return False
@@ -0,0 +1,115 @@
+import csv
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Liczba wierszy pobieranych z bazy / sklejanych w jeden kawałek odpowiedzi
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+_encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+
+def _batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_json_array(items, chunk_size=CHUNK_SIZE):
+    """Encode ``items`` as one JSON array, emitted in chunks."""
+    yield "["
+    first = True
+    for batch in _batched(items, chunk_size):
+        body = ",".join(_encoder.encode(item) for item in batch)
+        yield body if first else "," + body
+        first = False
+    yield "]"
+
+
+def iter_ndjson(items, chunk_size=CHUNK_SIZE):
+    """Encode ``items`` as newline-delimited JSON, emitted in chunks."""
+    for batch in _batched(items, chunk_size):
+        yield "".join(_encoder.encode(item) + "\n" for item in batch)
+
+
+class _Echo:
+    """File-like object for ``csv.writer`` that hands the line back."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, header=None, chunk_size=CHUNK_SIZE):
+    """Encode ``rows`` (sequences) as CSV, emitted in chunks."""
+    writer = csv.writer(_Echo())
+    if header:
+        yield writer.writerow(header)
+    for batch in _batched(rows, chunk_size):
+        yield "".join(writer.writerow(row) for row in batch)
+
+
+async def _aiter_chunks(chunks):
+    """
+    Hand the chunks of a synchronous iterator to the ASGI server one by one.
+    Each ``next()`` runs in the thread of the sync views, where the database
+    cursor was opened – nothing is buffered beyond the current chunk.
+    """
+    iterator = iter(chunks)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    try:
+        while (chunk := await next_chunk(iterator, done)) is not done:
+            yield chunk
+    finally:
+        if hasattr(iterator, "close"):
+            await sync_to_async(iterator.close, thread_sensitive=True)()
+
+
+def _streaming_response(chunks, request, **kwargs):
+    # pod ASGI synchroniczny iterator byłby najpierw w całości zebrany do
+    # listy (StreamingHttpResponse.__aiter__) – podajemy asynchroniczny
+    if isinstance(request, ASGIRequest):
+        chunks = _aiter_chunks(chunks)
+    return StreamingHttpResponse(chunks, **kwargs)
+
+
+def streaming_csv_response(
+    rows, header=None, filename=None, chunk_size=CHUNK_SIZE, request=None
+):
+    """
+    StreamingHttpResponse with ``rows`` as a CSV attachment. Pass the
+    ``request`` so that the response streams under ASGI as well.
+    """
+    response = _streaming_response(
+        iter_csv(rows, header, chunk_size),
+        request,
+        content_type="text/csv; charset=utf-8",
+    )
+    if filename:
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def streaming_json_response(items, fmt="json", chunk_size=CHUNK_SIZE, request=None):
+    """
+    StreamingHttpResponse over an iterable of JSON-serialisable items.
+    Pass a lazy iterable (e.g. ``qs.values_list(...).iterator(chunk_size=...)``)
+    and the ``request`` to keep memory flat regardless of the result size,
+    under WSGI and ASGI alike.
+    """
+    encode = iter_ndjson if fmt == "ndjson" else iter_json_array
+    return _streaming_response(
+        encode(items, chunk_size), request, content_type=CONTENT_TYPES[fmt]
+    )
@@ -0,0 +1,42 @@
+"""
+Version counters for cache keys. Entries embed the version of what they
+were built from; bumping it makes them unreachable, so nothing is deleted
+and a reader racing a writer cannot put a stale entry back under the new
+key.
+
+A counter starts from the current time in nanoseconds – after the cache
+loses it, it never returns to a value old entries were stored under.
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_versions(keys):
+    """``{key: version}`` for ``keys`` with one round trip when all exist."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = get_version(key)
+    return versions
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
@@ -0,0 +1,107 @@
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from booking.models import Reservation, TimeSlot, WaitlistEntry
+from booking.utils.availability import ACTIVE_STATUSES
+from booking.utils.holds import active_holds
+from booking.utils.reservations import SlotUnavailable
+
+
+def join_waitlist(user, service, slot_id):
+    """
+    Queue ``user`` for a reserved slot. Joining twice keeps the original
+    place. Returns ``(entry, position)`` – position 1 is next in line.
+    """
+    with transaction.atomic():
+        slot = (
+            TimeSlot.objects.select_for_update()
+            .filter(pk=slot_id, service=service, is_active=True)
+            .first()
+        )
+        if slot is None or slot.start < timezone.now():
+            raise SlotUnavailable("Wybrany termin jest niedostępny.")
+        reservation = (
+            Reservation.objects.filter(slot=slot, status__in=ACTIVE_STATUSES)
+            .only("user_id")
+            .first()
+        )
+        if reservation is None:
+            if active_holds().filter(pk=slot.pk).exists():
+                raise SlotUnavailable(
+                    "Termin jest tylko chwilowo zablokowany. Spróbuj za kilka minut."
+                )
+            raise SlotUnavailable("Termin jest wolny – możesz go zarezerwować.")
+        if reservation.user_id == user.pk:
+            raise SlotUnavailable("Ten termin jest już Twój.")
+
+        entry, _ = WaitlistEntry.objects.get_or_create(slot=slot, user=user)
+    position = (
+        with_positions(WaitlistEntry.objects.filter(pk=entry.pk))
+        .values_list("position", flat=True)
+        .get()
+    )
+    return entry, position
+
+
+def with_positions(entries):
+    """Annotate WaitlistEntry rows with their 1-based ``position`` in the queue."""
+    ahead = (
+        WaitlistEntry.objects.filter(slot_id=OuterRef("slot_id"))
+        .filter(
+            Q(created_at__lt=OuterRef("created_at"))
+            | Q(created_at=OuterRef("created_at"), id__lt=OuterRef("id"))
+        )
+        .order_by()
+        .values("slot_id")
+        .annotate(c=Count("id"))
+        .values("c")
+    )
+    return entries.annotate(position=Coalesce(Subquery(ahead), 0) + 1)
+
+
+def promote_waitlist(slot):
+    """
+    Turn the head of the slot's queue into a pending reservation. Must run
+    in the transaction that freed the slot, with the slot row locked.
+    Returns the new reservation or ``None``.
+    """
+    if not slot.is_active or slot.start < timezone.now():
+        return None
+    head = (
+        WaitlistEntry.objects.select_for_update()
+        .filter(slot=slot)
+        .order_by("created_at", "id")
+        .first()
+    )
+    if head is None:
+        return None
+    head.delete()
+    return Reservation.objects.create(
+        user_id=head.user_id, service_id=slot.service_id, slot=slot
+    )
+
+
+def close_reservation(reservation, status):
+    """
+    Cancel or reject a reservation: its slot times are archived, the slot is
+    released and – in the same transaction – offered to the first user
+    waiting for it. Returns the promoted reservation, if any.
+    """
+    with transaction.atomic():
+        slot = None
+        if reservation.slot_id:
+            # ta sama blokada co przy rezerwacji – nikt nie wejdzie w lukę
+            slot = TimeSlot.objects.select_for_update().get(pk=reservation.slot_id)
+            reservation.archived_start = slot.start
+            reservation.archived_end = slot.end
+            reservation.slot = None
+        freed = reservation.status in ACTIVE_STATUSES
+        reservation.status = status
+        reservation.save(
+            update_fields=["status", "slot", "archived_start", "archived_end"]
+        )
+        if slot is not None and freed:
+            return promote_waitlist(slot)
+    return None
@@ -1,8 +1,22 @@
+import hashlib
+import json
+from datetime import datetime, time, timedelta
+
 from django.contrib.auth import login
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.db.models import Q
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.shortcuts import get_object_or_404, redirect
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic import (
     TemplateView,
     ListView,
@@ -12,37 +26,120 @@ from django.views.generic import (
     FormView,
 )
 from django.utils import timezone
-
-from .models import Service, TimeSlot, Reservation
-from django.db.models import Q
+from django.utils.decorators import method_decorator
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
+
+from .models import (
+    ArchivedReservation,
+    Reservation,
+    Service,
+    TimeSlot,
+    WaitlistEntry,
+)
 from .forms import RegisterForm, ReservationForm
+from .utils import streaming
+from .utils.catalog import (
+    CATALOG_TIMEOUT,
+    get_catalog,
+    get_service,
+    get_service_or_404,
+    public_for_anonymous,
+    with_versions,
+)
+from .utils.events import get_broker, service_channel
+from .utils.holds import sweeps_expired_holds
+from .utils.idempotency import idempotent
+from .utils.keyset import paginate_keyset
+from .utils.search import SUGGEST_LIMIT, search_services
+from .utils.reservations import (
+    SlotsUnavailable,
+    SlotUnavailable,
+    book_slot,
+    book_slots,
+    hold_slot,
+    move_reservation,
+)
+from .utils.waitlist import close_reservation, join_waitlist, with_positions
+from .utils.availability import (
+    ACTIVE_STATUSES,
+    get_availability_version,
+    get_availability_versions,
+    get_free_slots_in_range,
+    get_indexes_for_services,
+    get_taken_slots_in_range,
+    next_hold_expiries,
+)
+
+# Maksymalna długość okna start/end dla API wolnych terminów
+FREE_SLOTS_MAX_RANGE = timedelta(days=93)
+
+# Co ile sekund wysyłamy komentarz podtrzymujący połączenie SSE
+SSE_HEARTBEAT = 15
+
+# Limity zbiorczego API dostępności (ochrona bazy)
+AVAILABILITY_MAX_DAYS = 31
+AVAILABILITY_MAX_SERVICES = 50
+
+# Ile zarchiwizowanych rezerwacji pokazujemy na stronie historii
+HISTORY_PER_PAGE = 20
 
 
 class HomeView(TemplateView):
     template_name = "home.html"
 
 
+@method_decorator(public_for_anonymous, name="dispatch")
 class ServiceListView(ListView):
     model = Service
     template_name = "service_list.html"
 
     def get_queryset(self):
-        qs = super().get_queryset()
         q = self.request.GET.get("q", "").strip()
         if q:
-            qs = qs.filter(Q(name__icontains=q) | Q(description__icontains=q))
-        return qs
+            return with_versions(search_services(q))
+        return get_catalog()
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx["query"] = self.request.GET.get("q", "")
+        ctx["catalog_timeout"] = CATALOG_TIMEOUT
         return ctx
 
 
+@require_GET
+def suggest_services(request):
+    """Typeahead: best-matching service names for a (partial) query."""
+    q = request.GET.get("q", "").strip()
+    services = search_services(q, limit=SUGGEST_LIMIT) if q else []
+    return JsonResponse(
+        {
+            "results": [
+                {
+                    "id": s.pk,
+                    "name": s.name,
+                    "url": reverse("booking:service_detail", args=[s.pk]),
+                }
+                for s in services
+            ]
+        }
+    )
+
+
+@method_decorator(public_for_anonymous, name="dispatch")
 class ServiceDetailView(DetailView):
     model = Service
     template_name = "service_detail.html"
 
+    def get_object(self, queryset=None):
+        return get_service_or_404(self.kwargs["pk"])
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["catalog_timeout"] = CATALOG_TIMEOUT
+        return ctx
+
 
 class RegisterView(CreateView):
     form_class = RegisterForm
@@ -55,6 +152,7 @@ class RegisterView(CreateView):
         return response
 
 
+@method_decorator(idempotent, name="post")
 class ReservationCreateView(LoginRequiredMixin, CreateView):
     model = Reservation
     form_class = ReservationForm
@@ -64,7 +162,7 @@ class ReservationCreateView(LoginRequiredMixin, CreateView):
         return redirect("booking:service_detail", pk=self.service.pk)
 
     def dispatch(self, request, *args, **kwargs):
-        self.service = get_object_or_404(Service, pk=kwargs["pk"])
+        self.service = get_service_or_404(kwargs["pk"])
         return super().dispatch(request, *args, **kwargs)
 
     def get_form_kwargs(self):
@@ -75,26 +173,67 @@ class ReservationCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         slot = form.cleaned_data["slot"]
 
-        # Slot must be in the future
-        if slot.start < timezone.now():
-            form.add_error("slot", "Nie możesz zarezerwować terminu w przeszłości.")
-            return self.form_invalid(form)
-
-        if Reservation.objects.filter(
-            slot=slot,
-            status__in=[Reservation.Status.PENDING, Reservation.Status.APPROVED],
-        ).exists():
-            form.add_error("slot", "Termin już zajęty.")
+        # Sprawdzenie i zapis w jednej transakcji z blokadą slotu –
+        # równoległe żądania nie przejdą obu naraz
+        try:
+            self.object = book_slot(self.request.user, self.service, slot.pk)
+        except SlotUnavailable as e:
+            form.add_error("slot", str(e))
             return self.form_invalid(form)
-
-        form.instance.user = self.request.user
-        form.instance.service = self.service
-        return super().form_valid(form)
+        return HttpResponseRedirect(self.get_success_url())
 
     def get_success_url(self):
         return redirect("booking:my_reservations").url
 
 
+@login_required
+@require_POST
+@idempotent
+def book_cart(request, pk):
+    """
+    Book several slots of a service at once, all-or-nothing. Slot ids come
+    as ``slots`` form values or a JSON body ``{"slots": [...]}``.
+    """
+    service = get_service_or_404(pk)
+    try:
+        if request.content_type == "application/json":
+            raw = json.loads(request.body or b"{}").get("slots", [])
+        else:
+            raw = request.POST.getlist("slots")
+        slot_ids = [int(x) for x in raw]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({"error": "Nieprawidłowa lista terminów."}, status=400)
+
+    try:
+        reservations = book_slots(request.user, service, slot_ids)
+    except SlotsUnavailable as e:
+        return JsonResponse({"error": str(e), "conflicts": e.conflicts}, status=409)
+    except SlotUnavailable as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse(
+        {"reservations": [{"id": r.pk, "slot": r.slot_id} for r in reservations]},
+        status=201,
+    )
+
+
+@login_required
+@require_POST
+def hold_slot_api(request, pk, slot_id):
+    """
+    Hold a slot while the user completes the booking form. Responds with
+    the hold expiry, or 409 when the slot is taken or held by someone else.
+    """
+    service = get_service_or_404(pk)
+    try:
+        hold = hold_slot(request.user, service, slot_id)
+    except SlotUnavailable as e:
+        return JsonResponse({"error": str(e)}, status=409)
+    return JsonResponse(
+        {"slot": hold.slot_id, "expires_at": hold.expires_at.isoformat()}
+    )
+
+
 # class MyReservationsView(LoginRequiredMixin, ListView):
 #     template_name = "my_reservations.html"
 
@@ -125,10 +264,43 @@ class MyReservationsView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx["services"] = Service.objects.all()
+        ctx["waitlist"] = with_positions(
+            WaitlistEntry.objects.filter(user=self.request.user).select_related(
+                "slot__service"
+            )
+        )
+        ctx["history"] = self.get_history()
         ctx["selected_status"] = self.request.GET.get("status", "")
         ctx["selected_service"] = self.request.GET.get("service", "")
         return ctx
 
+    def get_history(self):
+        """
+        One keyset page (``after``/``before``) of the archived reservations
+        (see utils.retention), newest bookings first, same filters.
+        """
+        qs = ArchivedReservation.objects.filter(user=self.request.user).select_related(
+            "service"
+        )
+        status = self.request.GET.get("status")
+        if status:
+            qs = qs.filter(status=status)
+        service = self.request.GET.get("service")
+        if service:
+            qs = qs.filter(service__id=service)
+        try:
+            return paginate_keyset(
+                qs,
+                "created_at",
+                HISTORY_PER_PAGE,
+                after=self.request.GET.get("after"),
+                before=self.request.GET.get("before"),
+                descending=True,
+            )
+        except ValueError:
+            # zepsuty kursor – wracamy na pierwszą stronę
+            return paginate_keyset(qs, "created_at", HISTORY_PER_PAGE, descending=True)
+
 
 class ReservationUpdateView(LoginRequiredMixin, UpdateView):
     model = Reservation
@@ -143,6 +315,16 @@ class ReservationUpdateView(LoginRequiredMixin, UpdateView):
         kwargs["service"] = self.object.service
         return kwargs
 
+    def form_valid(self, form):
+        try:
+            self.object = move_reservation(
+                self.object.pk, self.request.user, form.cleaned_data["slot"].pk
+            )
+        except SlotUnavailable as e:
+            form.add_error("slot", str(e))
+            return self.form_invalid(form)
+        return HttpResponseRedirect(self.get_success_url())
+
     def get_success_url(self):
         return redirect("booking:my_reservations").url
 
@@ -157,28 +339,315 @@ class ReservationDetailView(LoginRequiredMixin, DetailView):
         return Reservation.objects.filter(user=self.request.user)
 
 
+@require_POST
+@idempotent
 def cancel_reservation(request, pk):
     res = get_object_or_404(Reservation, pk=pk, user=request.user)
-    if res.slot:
-        res.archived_start = res.slot.start
-        res.archived_end = res.slot.end
-        res.slot = None
-    res.status = Reservation.Status.CANCELLED
-    res.save(update_fields=["status", "slot", "archived_start", "archived_end"])
+    # zwolniony termin od razu trafia do pierwszej osoby z listy oczekujących
+    close_reservation(res, Reservation.Status.CANCELLED)
     return redirect("booking:my_reservations")
 
 
-def free_slots_api(request, pk):
-    service = get_object_or_404(Service, pk=pk)
-    qs = TimeSlot.objects.filter(
-        service=service, is_active=True, start__gte=timezone.now()
-    ).exclude(
-        reservation__status__in=[
-            Reservation.Status.PENDING,
-            Reservation.Status.APPROVED,
-        ]
+@login_required
+@require_POST
+def join_waitlist_api(request, pk, slot_id):
+    """Queue for a reserved slot; responds with the place in the queue."""
+    service = get_service_or_404(pk)
+    try:
+        entry, position = join_waitlist(request.user, service, slot_id)
+    except SlotUnavailable as e:
+        return JsonResponse({"error": str(e)}, status=409)
+    return JsonResponse({"slot": entry.slot_id, "position": position})
+
+
+@login_required
+@require_POST
+def leave_waitlist(request, pk):
+    WaitlistEntry.objects.filter(pk=pk, user=request.user).delete()
+    return redirect("booking:my_reservations")
+
+
+def parse_range_bound(value):
+    """Parse a FullCalendar ``start``/``end`` parameter into an aware datetime."""
+    if not value:
+        return None
+    # "+" ze strefy czasowej w niezakodowanym query stringu zamienia się w spację
+    value = value.strip().replace(" ", "+")
+    dt = parse_datetime(value)
+    if dt is None:
+        d = parse_date(value)
+        if d is None:
+            raise ValueError(f"Nieprawidłowa data: {value}")
+        dt = datetime.combine(d, time.min)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def get_slots_query(request):
+    """
+    Parse ``start``/``end`` and the optional ``stream=json|ndjson`` switch.
+    The range cap applies only to buffered responses.
+    """
+    stream = request.GET.get("stream") or None
+    if stream and stream not in streaming.CONTENT_TYPES:
+        raise ValueError("Nieobsługiwany format strumienia.")
+    start = parse_range_bound(request.GET.get("start"))
+    end = parse_range_bound(request.GET.get("end"))
+    if start and end:
+        if end <= start:
+            raise ValueError("Koniec zakresu musi być po jego początku.")
+        if not stream and end - start > FREE_SLOTS_MAX_RANGE:
+            raise ValueError("Zakres dat jest zbyt długi.")
+    return start, end, stream
+
+
+def free_slots_etag(request, pk):
+    if get_service(pk) is None:
+        return None
+    version = get_availability_version(pk)
+    try:
+        start, end, stream = get_slots_query(request)
+    except ValueError:
+        return None
+
+    now = timezone.now()
+    expires = next_hold_expiries([pk], now).get(pk)
+    parts = [
+        str(pk),
+        str(version),
+        # wygasła blokada zwalnia termin bez żadnego zapisu
+        expires and expires.isoformat(),
+        start and start.isoformat(),
+        end and end.isoformat(),
+        stream,
+        request.GET.get("taken"),
+        # własne blokady widać jako wolne – odpowiedź zależy od użytkownika
+        request.user.pk,
+    ]
+    # Okno obejmujące "teraz" zmienia się wraz z upływem czasu (sloty z przeszłości)
+    if start is None or start < now:
+        parts.append(now.strftime("%Y%m%d%H%M"))
+    return hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def held_by_others(request, now):
+    """
+    Slots hidden by an active hold – except the holds of ``request.user``:
+    a slot they are booking right now is still free for them.
+    """
+    held = Q(hold__expires_at__gt=now)
+    if request.user.is_authenticated:
+        held &= ~Q(hold__user=request.user)
+    return held
+
+
+def own_held_slots(request, service, since, end, now):
+    """``(id, start, end)`` of the unreserved slots ``request.user`` holds."""
+    if not request.user.is_authenticated:
+        return []
+    return list(
+        TimeSlot.objects.filter(
+            hold__user=request.user,
+            hold__expires_at__gt=now,
+            service=service,
+            is_active=True,
+            start__gte=since,
+            start__lt=end,
+        )
+        .exclude(reservation__status__in=ACTIVE_STATUSES)
+        .values_list("id", "start", "end")
+    )
+
+
+def stream_free_slots(request, service, since, end, fmt):
+    """Free slots straight from a DB cursor, never materialised as a list."""
+    qs = (
+        TimeSlot.objects.filter(service=service, is_active=True, start__gte=since)
+        .exclude(reservation__status__in=ACTIVE_STATUSES)
+        .exclude(held_by_others(request, timezone.now()))
+        .order_by("start", "id")
+        .values_list("id", "start", "end")
+    )
+    if end:
+        qs = qs.filter(start__lt=end)
+    rows = (
+        {"id": slot_id, "start": slot_start.isoformat(), "end": slot_end.isoformat()}
+        for slot_id, slot_start, slot_end in qs.iterator(
+            chunk_size=streaming.CHUNK_SIZE
+        )
     )
+    return streaming.streaming_json_response(rows, fmt, request=request)
+
+
+@cache_control(private=True, no_cache=True)
+@sweeps_expired_holds
+@condition(etag_func=free_slots_etag)
+def free_slots_api(request, pk):
+    service = get_service_or_404(pk)
+    try:
+        start, end, stream = get_slots_query(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    now = timezone.now()
+    since = max(start or now, now)
+    if stream:
+        return stream_free_slots(request, service, since, end, stream)
+    own_ids = set()
+    if end:
+        rows = []
+        if since < end:
+            # indeks dnia jest wspólny – własne blokady dokładamy jako wolne
+            own = own_held_slots(request, service, since, end, now)
+            own_ids = {row[0] for row in own}
+            rows = sorted(
+                [*get_free_slots_in_range(service, since, end), *own],
+                key=lambda row: (row[1], row[0]),
+            )
+    else:
+        rows = (
+            TimeSlot.objects.filter(service=service, is_active=True, start__gte=since)
+            .exclude(reservation__status__in=ACTIVE_STATUSES)
+            .exclude(held_by_others(request, now))
+            .values_list("id", "start", "end")
+        )
     data = [
-        {"id": s.id, "start": s.start.isoformat(), "end": s.end.isoformat()} for s in qs
+        {"id": slot_id, "start": slot_start.isoformat(), "end": slot_end.isoformat()}
+        for slot_id, slot_start, slot_end in rows
     ]
+    if end and since < end and request.GET.get("taken"):
+        # kalendarz pokazuje też zajęte terminy – można się na nie zapisać
+        # na listę oczekujących
+        data.extend(
+            {
+                "id": slot_id,
+                "start": slot_start.isoformat(),
+                "end": slot_end.isoformat(),
+                "taken": True,
+            }
+            for slot_id, slot_start, slot_end in get_taken_slots_in_range(
+                service, since, end
+            )
+            if slot_id not in own_ids
+        )
     return JsonResponse(data, safe=False)
+
+
+@sweeps_expired_holds
+def availability_api(request):
+    """
+    Free slots of many services at once:
+    ``?services=1,2,3&from=YYYY-MM-DD&to=YYYY-MM-DD`` (both days inclusive).
+
+    Response: ``{"from", "to", "services": {id: {day: [[slot_id, "HH:MM",
+    "HH:MM"], ...]}}, "missing": [ids]}`` – days without free slots are
+    omitted.
+    """
+    try:
+        ids = sorted(
+            {int(x) for x in request.GET.get("services", "").split(",") if x.strip()}
+        )
+    except ValueError:
+        return JsonResponse({"error": "Nieprawidłowa lista usług."}, status=400)
+    if not ids:
+        return JsonResponse({"error": "Podaj parametr services."}, status=400)
+    if len(ids) > AVAILABILITY_MAX_SERVICES:
+        return JsonResponse(
+            {"error": f"Maksymalnie {AVAILABILITY_MAX_SERVICES} usług naraz."},
+            status=400,
+        )
+
+    today = timezone.localdate()
+    date_from = parse_date(request.GET.get("from") or "") or today
+    date_to = parse_date(request.GET.get("to") or "") or date_from + timedelta(days=6)
+    if date_to < date_from:
+        return JsonResponse(
+            {"error": "Koniec zakresu musi być po jego początku."}, status=400
+        )
+    if (date_to - date_from).days + 1 > AVAILABILITY_MAX_DAYS:
+        return JsonResponse(
+            {"error": f"Maksymalnie {AVAILABILITY_MAX_DAYS} dni naraz."}, status=400
+        )
+    date_from = max(date_from, today)
+
+    services = list(Service.objects.filter(pk__in=ids).only("id", "slot_duration"))
+
+    now = timezone.now()
+    versions = get_availability_versions([s.pk for s in services])
+    expiries = next_hold_expiries([s.pk for s in services], now)
+    etag_parts = [date_from, date_to] + [
+        f"{s.pk}.{versions[s.pk]}.{expiries.get(s.pk, '')}" for s in services
+    ]
+    if date_from <= today:
+        etag_parts.append(now.strftime("%Y%m%d%H%M"))
+    etag = '"%s"' % hashlib.md5(":".join(map(str, etag_parts)).encode()).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+
+    if response is None:
+        days = [
+            date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)
+        ]
+        if days:
+            indexes = get_indexes_for_services(services, days)
+        else:
+            indexes = {s.pk: {} for s in services}
+
+        result = {}
+        for service_id, by_day in indexes.items():
+            per_day = {}
+            for day in sorted(by_day):
+                rows = [
+                    [
+                        slot_id,
+                        timezone.localtime(start).strftime("%H:%M"),
+                        timezone.localtime(end).strftime("%H:%M"),
+                    ]
+                    for slot_id, start, end in by_day[day].free_slots()
+                    if start >= now
+                ]
+                if rows:
+                    per_day[day.isoformat()] = rows
+            result[str(service_id)] = per_day
+
+        found = {s.pk for s in services}
+        response = JsonResponse(
+            {
+                "from": date_from.isoformat(),
+                "to": date_to.isoformat(),
+                "services": result,
+                "missing": [i for i in ids if i not in found],
+            }
+        )
+        response["ETag"] = etag
+
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+async def slot_events(request, pk):
+    """
+    Server-Sent Events with "taken"/"held"/"freed" deltas for the service
+    calendar.
+    Requires ASGI; under WSGI the stream would pin a worker, so 204 tells
+    EventSource not to reconnect and the calendar keeps plain fetching.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    if not await Service.objects.filter(pk=pk).aexists():
+        raise Http404
+
+    async def stream():
+        yield "retry: 5000\n\n"
+        async for message in get_broker().subscribe(
+            service_channel(pk), heartbeat=SSE_HEARTBEAT
+        ):
+            if message is None:
+                yield ": ping\n\n"
+            else:
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,4 +1,8 @@
-from django.shortcuts import get_object_or_404, redirect
+import csv
+import heapq
+import io
+
+from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.decorators import method_decorator
 from django.views.generic import (
     TemplateView,
@@ -7,45 +11,72 @@ from django.views.generic import (
     UpdateView,
     DeleteView,
 )
-from django.urls import reverse_lazy
-
-from .models import Service, TimeSlot, Reservation
+from django.urls import reverse, reverse_lazy
+from django.utils.http import url_has_allowed_host_and_scheme
+
+from .models import (
+    ArchivedReservation,
+    Reservation,
+    ScheduleTemplate,
+    Service,
+    TimeSlot,
+)
+from .utils.availability import get_day_indexes
+from .utils.dashboard import get_dashboard_stats
+from .utils.idempotency import idempotent
+from .utils.keyset import KeysetPaginationMixin
+from .utils.moderation import (
+    MAX_BULK_RESERVATIONS,
+    approve_reservations,
+    reject_reservations,
+)
 from .utils.permissions import admin_required
-from .forms import ServiceAdminForm, SlotAdminForm
+from .utils.rollup import GRANULARITIES, chart_series
+from .utils.schedule import generate_slots
+from .utils.slot_import import ImportFileError, import_slots
+from .utils import streaming
+from .utils.waitlist import close_reservation
+from .forms import (
+    ReservationFilterForm,
+    ScheduleTemplateForm,
+    ServiceAdminForm,
+    SlotAdminForm,
+    SlotFilterForm,
+    SlotImportForm,
+)
 
 
-from django.db.models import Count
-from django.db.models.functions import TruncDate
+from django.core.paginator import Paginator
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
 import json
 from django.http import JsonResponse
-from django.views.decorators.http import require_GET
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib import messages
 
 
 @method_decorator(admin_required, name="dispatch")
 class AdminDashboardView(TemplateView):
     template_name = "admin/dashboard.html"
+    pending_per_page = 20
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
 
-        # zwykłe statystyki
-        ctx["stats"] = {
-            "all": Reservation.objects.count(),
-            "pending": Reservation.objects.filter(status="pending").count(),
-            "approved": Reservation.objects.filter(status="approved").count(),
-            "cancelled": Reservation.objects.filter(status="cancelled").count(),
-            "rejected": Reservation.objects.filter(status="rejected").count(),
-            "services": Service.objects.count(),
-            "slots_active": TimeSlot.objects.filter(is_active=True).count(),
-        }
+        # statystyki – sumy z dziennego rollupu, chwilowo w cache
+        ctx["stats"] = get_dashboard_stats()
 
-        # pending do tabeli na dole dashboardu
-        ctx["pending"] = Reservation.objects.filter(status="pending").select_related(
-            "user", "service", "slot"
+        # pending do tabeli na dole dashboardu, stronicowane
+        pending = (
+            Reservation.objects.filter(status="pending")
+            .select_related("user", "service", "slot")
+            .order_by("created_at", "id")
+        )
+        page = Paginator(pending, self.pending_per_page).get_page(
+            self.request.GET.get("page")
         )
+        ctx["pending"] = page
 
         # ---- WYKRES 1: REZERWACJE WG STATUSU ----
         status_labels = ["Oczekujące", "Zatwierdzone", "Anulowane", "Odrzucone"]
@@ -58,28 +89,71 @@ class AdminDashboardView(TemplateView):
         ctx["chart_status_labels"] = json.dumps(status_labels)
         ctx["chart_status_values"] = json.dumps(status_values)
 
-        # ---- WYKRES 2: OSTATNIE 14 DNI ----
-        since = timezone.now().date() - timedelta(days=13)
+        # ---- WYKRES 2: OSTATNIE 14 DNI (z tabeli dziennych sum) ----
+        today = timezone.localdate()
+        days, series = chart_series(today - timedelta(days=13), today)
 
-        daily_qs = (
-            Reservation.objects.filter(created_at__date__gte=since)
-            .annotate(day=TruncDate("created_at"))
-            .values("day")
-            .annotate(c=Count("id"))
-            .order_by("day")
+        ctx["chart_daily_labels"] = json.dumps([d.strftime("%d.%m") for d in days])
+        ctx["chart_daily_values"] = json.dumps(
+            [sum(counts) for counts in zip(*series.values())]
         )
 
-        # pełna lista dni (żeby wykres był ciągły)
-        days = [since + timedelta(days=i) for i in range(14)]
-        daily_map = {x["day"]: x["c"] for x in daily_qs}
+        return ctx
 
-        ctx["chart_daily_labels"] = json.dumps([d.strftime("%d.%m") for d in days])
-        ctx["chart_daily_values"] = json.dumps([daily_map.get(d, 0) for d in days])
 
-        return ctx
+# Limit punktów na wykresie (ochrona przed np. dziennym zakresem z 10 lat)
+CHART_MAX_BUCKETS = 400
+
+
+@require_GET
+@admin_required
+def reservation_stats_api(request):
+    """
+    Reservations created per day/week/month, read from the daily rollup:
+    ``?from=YYYY-MM-DD&to=YYYY-MM-DD&granularity=day|week|month&services=1,2``.
+
+    Response: ``{"granularity", "labels": [bucket start dates], "series":
+    {status: [counts]}, "total": [counts]}``.
+    """
+    granularity = request.GET.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        return JsonResponse({"error": "Nieobsługiwana granulacja."}, status=400)
+
+    today = timezone.localdate()
+    try:
+        date_to = parse_date(request.GET.get("to") or "") or today
+        date_from = parse_date(request.GET.get("from") or "") or date_to - timedelta(
+            days=13
+        )
+        service_ids = [
+            int(x) for x in request.GET.get("services", "").split(",") if x.strip()
+        ]
+    except ValueError:
+        return JsonResponse({"error": "Nieprawidłowe parametry."}, status=400)
+    if date_to < date_from:
+        return JsonResponse(
+            {"error": "Koniec zakresu musi być po jego początku."}, status=400
+        )
+    span = {"day": 1, "week": 7, "month": 28}[granularity]
+    if (date_to - date_from).days // span + 1 > CHART_MAX_BUCKETS:
+        return JsonResponse(
+            {"error": "Zbyt długi zakres – wybierz większą granulację."}, status=400
+        )
+
+    buckets, series = chart_series(date_from, date_to, granularity, service_ids)
+    return JsonResponse(
+        {
+            "granularity": granularity,
+            "labels": [b.isoformat() for b in buckets],
+            "series": series,
+            "total": [sum(counts) for counts in zip(*series.values())],
+        }
+    )
 
 
+@require_POST
 @admin_required
+@idempotent
 def approve_reservation(request, pk):
     r = get_object_or_404(Reservation, pk=pk)
     r.status = Reservation.Status.APPROVED
@@ -87,18 +161,56 @@ def approve_reservation(request, pk):
     return redirect("booking:admin_dashboard")
 
 
+@require_POST
 @admin_required
+@idempotent
 def reject_reservation(request, pk):
     r = get_object_or_404(Reservation, pk=pk)
-    if r.slot:
-        r.archived_start = r.slot.start
-        r.archived_end = r.slot.end
-        r.slot = None
-    r.status = Reservation.Status.REJECTED
-    r.save(update_fields=["status", "slot", "archived_start", "archived_end"])
+    promoted = close_reservation(r, Reservation.Status.REJECTED)
+    if promoted:
+        messages.info(
+            request, f"Termin przekazano osobie z listy oczekujących ({promoted.user})."
+        )
     return redirect("booking:admin_dashboard")
 
 
+@require_POST
+@admin_required
+@idempotent
+def bulk_reservations(request):
+    """Approve or reject the selected reservations (``ids``) at once."""
+    action = request.POST.get("action")
+    try:
+        ids = sorted({int(x) for x in request.POST.getlist("ids")})
+    except ValueError:
+        ids = []
+    redirect_to = request.POST.get("next")
+    if not url_has_allowed_host_and_scheme(
+        redirect_to, allowed_hosts={request.get_host()}
+    ):
+        redirect_to = reverse("booking:admin_dashboard")
+
+    if not ids or action not in ("approve", "reject"):
+        messages.error(request, "Zaznacz rezerwacje i wybierz akcję.")
+        return redirect(redirect_to)
+    if len(ids) > MAX_BULK_RESERVATIONS:
+        messages.error(
+            request, f"Maksymalnie {MAX_BULK_RESERVATIONS} rezerwacji naraz."
+        )
+        return redirect(redirect_to)
+
+    if action == "approve":
+        count = approve_reservations(ids)
+        messages.success(request, f"✓ Zatwierdzono {count} rezerwacji.")
+    else:
+        count, promoted = reject_reservations(ids)
+        text = f"✓ Odrzucono {count} rezerwacji."
+        if promoted:
+            text += f" {promoted} terminów przekazano osobom z listy oczekujących."
+        messages.success(request, text)
+    return redirect(redirect_to)
+
+
 @method_decorator(admin_required, name="dispatch")
 class ServiceAdminList(ListView):
     model = Service
@@ -129,9 +241,20 @@ class ServiceAdminDelete(DeleteView):
 
 
 @method_decorator(admin_required, name="dispatch")
-class SlotAdminList(ListView):
+class SlotAdminList(KeysetPaginationMixin, ListView):
     model = TimeSlot
     template_name = "admin/slot_list.html"
+    paginate_by = 50
+    keyset_field = "start"
+
+    def get_queryset(self):
+        self.filter_form = SlotFilterForm(self.request.GET or None)
+        return self.filter_form.filter(TimeSlot.objects.select_related("service"))
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["filter_form"] = self.filter_form
+        return ctx
 
 
 @method_decorator(admin_required, name="dispatch")
@@ -159,6 +282,35 @@ class SlotAdminCreate(CreateView):
         return response
 
 
+# Ile odrzuconych wierszy pokazujemy w raporcie importu
+IMPORT_REJECTED_SHOWN = 100
+
+
+@admin_required
+def import_slots_view(request):
+    """Upload a CSV of slots; the report lists rejected rows and throughput."""
+    result = None
+    form = SlotImportForm(request.POST or None, request.FILES or None)
+    if request.method == "POST" and form.is_valid():
+        lines = io.TextIOWrapper(
+            form.cleaned_data["file"].file, encoding="utf-8-sig", newline=""
+        )
+        try:
+            result = import_slots(lines, dry_run=form.cleaned_data["dry_run"])
+        except (ImportFileError, UnicodeDecodeError, csv.Error) as exc:
+            form.add_error("file", f"Nie można odczytać pliku: {exc}")
+    return render(
+        request,
+        "admin/slot_import.html",
+        {
+            "form": form,
+            "result": result,
+            "rejected": result.rejected[:IMPORT_REJECTED_SHOWN] if result else (),
+            "rate": result.rows / result.seconds if result and result.seconds else 0,
+        },
+    )
+
+
 @method_decorator(admin_required, name="dispatch")
 class SlotAdminUpdate(UpdateView):
     model = TimeSlot
@@ -192,15 +344,172 @@ class SlotAdminDelete(DeleteView):
 
 
 @method_decorator(admin_required, name="dispatch")
-class ReservationAdminList(ListView):
+class ScheduleAdminList(ListView):
+    model = ScheduleTemplate
+    template_name = "admin/schedule_list.html"
+
+    def get_queryset(self):
+        return ScheduleTemplate.objects.select_related("service")
+
+
+@method_decorator(admin_required, name="dispatch")
+class ScheduleAdminCreate(CreateView):
+    model = ScheduleTemplate
+    form_class = ScheduleTemplateForm
+    template_name = "admin/schedule_form.html"
+    success_url = reverse_lazy("booking:admin_schedules")
+
+
+@method_decorator(admin_required, name="dispatch")
+class ScheduleAdminUpdate(UpdateView):
+    model = ScheduleTemplate
+    form_class = ScheduleTemplateForm
+    template_name = "admin/schedule_form.html"
+    success_url = reverse_lazy("booking:admin_schedules")
+
+
+@method_decorator(admin_required, name="dispatch")
+class ScheduleAdminDelete(DeleteView):
+    model = ScheduleTemplate
+    template_name = "admin/schedule_confirm_delete.html"
+    success_url = reverse_lazy("booking:admin_schedules")
+
+
+@require_POST
+@admin_required
+def generate_schedule_slots(request, pk=None):
+    """Expand one template (or all of them) into slots."""
+    templates = ScheduleTemplate.objects.select_related("service")
+    if pk is not None:
+        templates = templates.filter(pk=pk)
+    result = generate_slots(templates)
+    messages.success(
+        request,
+        f"✓ Utworzono {result.created} terminów "
+        f"(pominięto {result.skipped} kolidujących) w {result.seconds:.2f} s.",
+    )
+    return redirect("booking:admin_schedules")
+
+
+@method_decorator(admin_required, name="dispatch")
+class ReservationAdminList(KeysetPaginationMixin, ListView):
     model = Reservation
     template_name = "admin/reservation_list.html"
     paginate_by = 20
+    keyset_field = "created_at"
+    keyset_descending = True
 
     def get_queryset(self):
-        return Reservation.objects.select_related("user", "service", "slot").order_by(
-            "-created_at"
+        self.filter_form = ReservationFilterForm(self.request.GET or None)
+        if self.filter_form.show_archived():
+            return self.filter_form.filter_archived(
+                ArchivedReservation.objects.select_related("user", "service")
+            )
+        return self.filter_form.filter(
+            Reservation.objects.select_related("user", "service", "slot")
+        )
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["filter_form"] = self.filter_form
+        ctx["archived"] = self.filter_form.show_archived()
+        return ctx
+
+
+EXPORT_FORMATS = ("csv", "ndjson")
+
+EXPORT_COLUMNS = (
+    "id",
+    "created_at",
+    "status",
+    "user",
+    "email",
+    "service",
+    "price",
+    "start",
+    "end",
+)
+
+
+def _isoformat(value):
+    return timezone.localtime(value).isoformat() if value else None
+
+
+def _export_row(r, start, end):
+    return (
+        r.pk,
+        _isoformat(r.created_at),
+        r.status,
+        r.user.username,
+        r.user.email,
+        r.service.name,
+        r.service.price,
+        _isoformat(start),
+        _isoformat(end),
+    )
+
+
+def _export_rows(queryset, archived):
+    """
+    Export rows of live and archived reservations in ``EXPORT_COLUMNS``
+    order, merged by ``(created_at, id)`` – both come straight from DB
+    cursors sorted that way.
+    """
+    live = (
+        # anulowane/odrzucone mają termin tylko w archived_*
+        (
+            (r.created_at, r.pk),
+            _export_row(
+                r,
+                r.slot.start if r.slot else r.archived_start,
+                r.slot.end if r.slot else r.archived_end,
+            ),
         )
+        for r in queryset.iterator(chunk_size=streaming.CHUNK_SIZE)
+    )
+    old = (
+        ((r.created_at, r.pk), _export_row(r, r.start, r.end))
+        for r in archived.iterator(chunk_size=streaming.CHUNK_SIZE)
+    )
+    for _, row in heapq.merge(live, old, key=lambda item: item[0]):
+        yield row
+
+
+@require_GET
+@admin_required
+def export_reservations(request):
+    """
+    Reservations matching the list filters – live and archived – as a
+    streamed ``csv`` (default) or ``ndjson`` download; memory use does not
+    depend on the row count.
+    """
+    fmt = request.GET.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({"error": "Nieobsługiwany format eksportu."}, status=400)
+    form = ReservationFilterForm(request.GET or None)
+    if form.is_bound and not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+
+    queryset = form.filter(
+        Reservation.objects.select_related("user", "service", "slot")
+    ).order_by("created_at", "id")
+    archived = form.filter_archived(
+        ArchivedReservation.objects.select_related("user", "service")
+    ).order_by("created_at", "id")
+    rows = _export_rows(queryset, archived)
+    filename = f"rezerwacje-{timezone.localdate():%Y%m%d}.{fmt}"
+
+    if fmt == "ndjson":
+        response = streaming.streaming_json_response(
+            (dict(zip(EXPORT_COLUMNS, row)) for row in rows),
+            "ndjson",
+            request=request,
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+    return streaming.streaming_csv_response(
+        rows, EXPORT_COLUMNS, filename, request=request
+    )
 
 
 from django.utils import timezone
@@ -230,45 +539,16 @@ def get_slots_for_service(request):
             {"slots": [], "error": "Nieprawidłowy format daty"}, status=400
         )
 
-    # Twórz aware datetimes
-    start_time = timezone.make_aware(
-        datetime.combine(slot_date_obj, datetime.min.time()).replace(
-            hour=9, minute=0, second=0, microsecond=0
-        )
-    )
-    end_time = timezone.make_aware(
-        datetime.combine(slot_date_obj, datetime.min.time()).replace(
-            hour=22, minute=0, second=0, microsecond=0
-        )
-    )
-
-    # Pobierz zajęte sloty
-    occupied_slots = TimeSlot.objects.filter(
-        service=service,
-        start__date=slot_date_obj,
-        is_active=True,
-    ).values_list("start", "end")
+    # Komórki siatki dnia, które nie nachodzą na żaden aktywny slot
+    index = get_day_indexes(service, [slot_date_obj])[slot_date_obj]
 
     slots = []
-    current = start_time
-
-    while current + timedelta(minutes=service.slot_duration) <= end_time:
-        slot_end = current + timedelta(minutes=service.slot_duration)
-
-        # Sprawdź czy slot jest zajęty
-        is_occupied = any(
-            start <= current < end or start < slot_end <= end
-            for start, end in occupied_slots
+    for current, slot_end in index.free_grid():
+        slots.append(
+            {
+                "value": f"{current.isoformat()}|{slot_end.isoformat()}",
+                "label": f"{current.strftime('%H:%M')} - {slot_end.strftime('%H:%M')}",
+            }
         )
 
-        if not is_occupied:
-            slots.append(
-                {
-                    "value": f"{current.isoformat()}|{slot_end.isoformat()}",
-                    "label": f"{current.strftime('%H:%M')} - {slot_end.strftime('%H:%M')}",
-                }
-            )
-
-        current = slot_end
-
     return JsonResponse({"slots": slots})
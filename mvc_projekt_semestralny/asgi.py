@@ -2,6 +2,8 @@
 ASGI config for mvc_projekt_semestralny project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Besides regular views it serves the Server-Sent Events stream with live
+slot availability (``booking.views.slot_events``), which needs ASGI.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -14,3 +16,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mvc_projekt_semestralny.settings")
 
 application = get_asgi_application()
+
+# kilka workerów z brokerem/cache w pamięci procesu – odmawiamy startu
+from booking.checks import run_startup_checks  # noqa: E402
+
+run_startup_checks()
@@ -89,6 +89,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "booking.context_processors.roles",
             ],
         },
     },
@@ -106,6 +107,15 @@ if DEBUG:
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": {
+                # Transakcje od razu biorą blokadę zapisu – równoległe
+                # rezerwacje czekają w kolejce zamiast kończyć się
+                # "database is locked"
+                "transaction_mode": "IMMEDIATE",
+                "timeout": 20,
+            },
+            # Baza testowa w pliku – testy współbieżności używają wielu połączeń
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
         }
     }
 else:
@@ -121,6 +131,75 @@ else:
         }
     }
 
+# ─────────────────────────────────────────────────────────────
+# Cache – musi być wspólny dla wszystkich workerów (dostępność, wersje
+# katalogu i dni, role, statystyki, liczniki metryk; klucze idempotencji są
+# w bazie). W DEV jeden proces runserver i pamięć procesu; w PROD tabela
+# w Postgresie (`manage.py createcachetable`), Redis/Memcached przez ENV
+# ─────────────────────────────────────────────────────────────
+
+if DEBUG:
+    CACHE_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+    CACHE_LOCATION = "booking"
+else:
+    CACHE_BACKEND = "django.core.cache.backends.db.DatabaseCache"
+    CACHE_LOCATION = "booking_cache"
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("DJANGO_CACHE_BACKEND", CACHE_BACKEND),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", CACHE_LOCATION),
+        # Domyślne 300 wpisów to za mało: każda para (usługa, dzień) to
+        # wersja + indeks, a jedno zapytanie api/availability/ obejmuje do
+        # 50 usług × 31 dni. LocMem/DatabaseCache po przekroczeniu limitu
+        # usuwają 1/CULL_FREQUENCY wpisów – także wersje i liczniki metryk
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("DJANGO_CACHE_MAX_ENTRIES", "50000")),
+            "CULL_FREQUENCY": int(os.getenv("DJANGO_CACHE_CULL_FREQUENCY", "10")),
+        },
+    }
+}
+
+# Ile sekund trzymamy wyliczoną dostępność (usługa + dzień)
+BOOKING_AVAILABILITY_CACHE_TIMEOUT = int(
+    os.getenv("BOOKING_AVAILABILITY_CACHE_TIMEOUT", "300")
+)
+
+# Broker zdarzeń SSE – InProcessBroker dla jednego procesu (DEV),
+# PostgresBroker (LISTEN/NOTIFY) dla kilku workerów lub węzłów (PROD)
+BOOKING_EVENTS_BROKER = os.getenv(
+    "BOOKING_EVENTS_BROKER",
+    (
+        "booking.utils.events.InProcessBroker"
+        if DEBUG
+        else "booking.utils.events.PostgresBroker"
+    ),
+)
+
+# Ile sekund pamiętamy odpowiedź dla klucza idempotencji
+BOOKING_IDEMPOTENCY_TTL = int(os.getenv("BOOKING_IDEMPOTENCY_TTL", str(24 * 3600)))
+
+# Ile sekund kliknięty w kalendarzu termin jest zablokowany dla użytkownika;
+# wygasłe blokady sprzątają widoki dostępności (najwyżej co
+# BOOKING_HOLD_SWEEP_INTERVAL sekund) i `manage.py sweep_slot_holds`
+BOOKING_HOLD_TTL = int(os.getenv("BOOKING_HOLD_TTL", "300"))
+BOOKING_HOLD_SWEEP_INTERVAL = int(os.getenv("BOOKING_HOLD_SWEEP_INTERVAL", "30"))
+
+# Ile sekund trzymamy statystyki panelu admina (zmiany rezerwacji je czyszczą)
+BOOKING_DASHBOARD_CACHE_TIMEOUT = int(os.getenv("BOOKING_DASHBOARD_CACHE_TIMEOUT", "5"))
+
+# Katalog usług: obiekty i fragmenty szablonów (wersjonowane, zmiany je omijają)
+BOOKING_CATALOG_CACHE_TIMEOUT = int(os.getenv("BOOKING_CATALOG_CACHE_TIMEOUT", "600"))
+# Cache-Control max-age stron katalogu dla niezalogowanych
+BOOKING_CATALOG_MAX_AGE = int(os.getenv("BOOKING_CATALOG_MAX_AGE", "60"))
+
+# Po ilu dniach zamknięte rezerwacje i minione terminy trafiają do archiwum
+BOOKING_RETENTION_DAYS = int(os.getenv("BOOKING_RETENTION_DAYS", "90"))
+
+# Ile sekund trzymamy role (grupy) użytkownika; zmiana członkostwa czyści wpis
+# po zatwierdzeniu transakcji, krótki czas życia ogranicza ewentualny wyścig
+BOOKING_ROLES_CACHE_TIMEOUT = int(os.getenv("BOOKING_ROLES_CACHE_TIMEOUT", "60"))
+
 # ─────────────────────────────────────────────────────────────
 # Password validation
 # ─────────────────────────────────────────────────────────────
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mvc_projekt_semestralny.settings")
 
 application = get_wsgi_application()
+
+# kilka workerów z brokerem/cache w pamięci procesu – odmawiamy startu
+from booking.checks import run_startup_checks  # noqa: E402
+
+run_startup_checks()